@@ -0,0 +1,138 @@
+"""
+Garbage collection pause benchmark
+
+Each mode runs in a fresh Python process, which loads the base dictionary and a synthetic
+trigram model, applies the GC settings and tags the same sentences in micro-batches.
+GC pauses are measured by `GCMonitor` (gc.callbacks), together with the latency of each batch.
+
+Modes
+- default : GC settings of Python
+- frozen : `production_mode()`, objects alive after loading are frozen
+- frozen-threshold : `production_mode(thresholds=...)`
+- frozen-paused : `production_mode()` and `Tagger.tag_batch(pause_gc=True)`
+
+Usage
+-----
+    $ python -m benchmarks.bench_gc
+    $ python -m benchmarks.bench_gc --num-sents 1000 --batch-size 32 --thresholds 10000 50 100 --output gc.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+
+modes = ['default', 'frozen', 'frozen-threshold', 'frozen-paused']
+
+
+def run_mode(mode, num_sents=500, num_eojeols=10, batch_size=32, beam_size=5, thresholds=(10000, 50, 100),
+    num_train_sents=2000, seed=0):
+    """It runs in current process. Use `measure` to run each mode in a fresh process"""
+    import gc
+    import numpy as np
+    from lattice_tagger.dictionary import BaseMorphemeDictionary
+    from lattice_tagger.gc_tuning import GCMonitor
+    from lattice_tagger.gc_tuning import production_mode
+    from lattice_tagger.tagger import Tagger
+    from .bench_tagging import prepare_model
+    from .corpus import SyntheticCorpus
+
+    corpus = SyntheticCorpus(seed=seed)
+    encoder, score_funcs = prepare_model(corpus, num_train_sents, seed)
+    tagger = Tagger(BaseMorphemeDictionary(), encoder=encoder, score_funcs=score_funcs)
+    sents = corpus.sentences(num_sents, num_eojeols=num_eojeols)
+    tagger.tag(sents[0], beam_size=beam_size)
+
+    gc.collect()
+    tracked_objects = len(gc.get_objects())
+    if mode == 'frozen' or mode == 'frozen-paused':
+        production_mode()
+    elif mode == 'frozen-threshold':
+        production_mode(thresholds=thresholds)
+    elif mode != 'default':
+        raise ValueError('mode must be one of {}'.format(', '.join(modes)))
+    pause_gc = mode == 'frozen-paused'
+
+    latencies = []
+    monitor = GCMonitor().start()
+    t = time.perf_counter()
+    for b in range(0, len(sents), batch_size):
+        batch = sents[b: b + batch_size]
+        t_batch = time.perf_counter()
+        tagger.tag_batch(batch, beam_size=beam_size, pause_gc=pause_gc)
+        # batch latency includes GC pauses in the batch
+        latencies.append(time.perf_counter() - t_batch)
+    elapsed = time.perf_counter() - t
+    monitor.stop()
+
+    return {
+        'tracked_objects': tracked_objects,
+        'frozen_objects': gc.get_freeze_count(),
+        'num_features': len(encoder.feature_dic),
+        'sents_per_sec': len(sents) / elapsed if elapsed > 0 else 0,
+        'batch_p50_ms': float(np.percentile(latencies, 50)) * 1000,
+        'batch_p99_ms': float(np.percentile(latencies, 99)) * 1000,
+        'batch_max_ms': max(latencies) * 1000,
+        'gc': monitor.summary()
+    }
+
+def measure(mode, args):
+    command = [sys.executable, '-m', 'benchmarks.bench_gc', '--child', mode,
+        '--num-sents', str(args.num_sents), '--num-eojeols', str(args.num_eojeols),
+        '--batch-size', str(args.batch_size), '--beam-size', str(args.beam_size),
+        '--num-train-sents', str(args.num_train_sents), '--seed', str(args.seed),
+        '--thresholds'] + [str(t) for t in args.thresholds]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().split('\n')[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark GC pauses of tagging with production mode')
+    parser.add_argument('--modes', type=str, nargs='+', default=modes, choices=modes)
+    parser.add_argument('--num-sents', type=int, default=500)
+    parser.add_argument('--num-eojeols', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--beam-size', type=int, default=5)
+    parser.add_argument('--thresholds', type=int, nargs='+', default=[10000, 50, 100],
+        help='gc.set_threshold arguments of frozen-threshold mode')
+    parser.add_argument('--num-train-sents', type=int, default=2000,
+        help='number of synthetic sentences to scan features from')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None, help='JSON file path to save results')
+    parser.add_argument('--child', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        result = run_mode(args.child, args.num_sents, args.num_eojeols, args.batch_size, args.beam_size,
+            tuple(args.thresholds), args.num_train_sents, args.seed)
+        print(json.dumps(result))
+        return
+
+    results = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform()
+        },
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'child')},
+        'benchmarks': {}
+    }
+    print('{:<18} {:>10} {:>8} {:>10} {:>10} {:>8} {:>10} {:>12} {:>12}'.format(
+        'mode', 'sents/s', 'GCs', 'GC ms', 'max ms', 'gen2', 'gen2 ms', 'batch p50', 'batch p99'))
+    for mode in args.modes:
+        result = measure(mode, args)
+        results['benchmarks'][mode] = result
+        gc_summary = result['gc']
+        gen2 = gc_summary['generations']['2']
+        print('{:<18} {:>10.1f} {:>8} {:>10.2f} {:>10.2f} {:>8} {:>10.2f} {:>12.2f} {:>12.2f}'.format(
+            mode, result['sents_per_sec'], gc_summary['collections'], gc_summary['total_ms'],
+            gc_summary['max_ms'], gen2['collections'], gen2['total_ms'],
+            result['batch_p50_ms'], result['batch_p99_ms']))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Startup time benchmark
+
+Each target is imported in a fresh Python process, and the median wall time of the import
+statement is reported with the heavy dependencies (numpy, psutil, asyncio) loaded by it.
+
+Usage
+-----
+    $ python -m benchmarks.bench_import
+    $ python -m benchmarks.bench_import --repeat 20 --output result.json
+    $ python -m benchmarks.bench_import --baseline benchmarks/import_baseline.json --fail-on-regression
+    $ python -m benchmarks.bench_import --save-baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+
+default_baseline = '%s/import_baseline.json' % os.path.dirname(os.path.realpath(__file__))
+root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+default_targets = [
+    'import lattice_tagger',
+    'import lattice_tagger.dictionary',
+    'from lattice_tagger.dictionary import MorphemeLookup',
+    'from lattice_tagger.tagger import Tagger',
+    'from lattice_tagger.beam import beam_search',
+]
+
+heavy_modules = ['numpy', 'psutil', 'asyncio']
+
+# prints elapsed seconds and loaded heavy modules as JSON
+script = """
+import json, sys, time
+t = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - t
+print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {heavy} if m in sys.modules]}}))
+"""
+
+def measure(statement, repeat=10):
+    """
+    Returns
+    -------
+    result : dict
+        median_ms, min_ms and loaded heavy modules
+    """
+    times = []
+    loaded = []
+    for _ in range(repeat):
+        code = script.format(statement=statement, heavy=heavy_modules)
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, check=True,
+            capture_output=True, text=True).stdout
+        result = json.loads(output.strip().split('\n')[-1])
+        times.append(result['elapsed'] * 1000)
+        loaded = result['loaded']
+    return {
+        'median_ms': statistics.median(times),
+        'min_ms': min(times),
+        'loaded': loaded
+    }
+
+def run(targets, repeat=10, verbose=True):
+    results = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform()
+        },
+        'config': {'repeat': repeat},
+        'benchmarks': {}
+    }
+    if verbose:
+        print('{:<56} {:>10} {:>10}  {}'.format('statement', 'median ms', 'min ms', 'heavy modules'))
+    for statement in targets:
+        result = measure(statement, repeat)
+        results['benchmarks'][statement] = result
+        if verbose:
+            print('{:<56} {:>10.2f} {:>10.2f}  {}'.format(
+                statement, result['median_ms'], result['min_ms'], ', '.join(result['loaded']) or '-'))
+    return results
+
+def compare(results, baseline, tolerance=0.2, verbose=True):
+    """
+    Returns
+    -------
+    regressions : list of str
+        Statements of which median import time is longer than (1 + tolerance) times
+        of baseline, or which load a heavy module not loaded in baseline
+    """
+    regressions = []
+    if verbose:
+        print('\n{:<56} {:>10} {:>10} {:>8}'.format('statement', 'baseline', 'current', 'ratio'))
+    for name, current in results['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if base is None or base['median_ms'] == 0:
+            continue
+        ratio = current['median_ms'] / base['median_ms']
+        new_modules = set(current['loaded']) - set(base['loaded'])
+        is_regressed = (ratio > 1 + tolerance) or bool(new_modules)
+        if is_regressed:
+            regressions.append(name)
+        if verbose:
+            print('{:<56} {:>10.2f} {:>10.2f} {:>8.3f}{}{}'.format(
+                name, base['median_ms'], current['median_ms'], ratio,
+                '  REGRESSION' if is_regressed else '',
+                ' (loads {})'.format(', '.join(sorted(new_modules))) if new_modules else ''))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark import time of lattice_tagger')
+    parser.add_argument('--targets', type=str, nargs='+', default=default_targets, help='import statements')
+    parser.add_argument('--repeat', type=int, default=10, help='number of fresh processes for each statement')
+    parser.add_argument('--output', type=str, default=None, help='JSON file path to save results')
+    parser.add_argument('--baseline', type=str, default=None, help='JSON file path of stored baseline')
+    parser.add_argument('--save-baseline', action='store_true', help='overwrite benchmarks/import_baseline.json')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    results = run(args.targets, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(default_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print('\n{} regressions found'.format(len(regressions)))
+            if args.fail_on_regression:
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""
+Throughput benchmark of lookup, decoding and end-to-end tagging
+
+Usage
+-----
+    $ python -m benchmarks.bench_tagging
+    $ python -m benchmarks.bench_tagging --lengths 5 10 20 --beam-sizes 1 3 5 10 --output result.json
+    $ python -m benchmarks.bench_tagging --baseline benchmarks/baseline.json --fail-on-regression
+    $ python -m benchmarks.bench_tagging --save-baseline
+    $ python -m benchmarks.bench_tagging --lengths 30 --beam-sizes 5 --prune-threshold 2
+    $ python -m benchmarks.bench_tagging --beam-sizes 5 10 --beam-margin 2
+    $ python -m benchmarks.bench_tagging --cache-size 1000 --zipf 1.5
+
+Each measurement reports sentences/sec, chars/sec and p50/p99 latency (ms) of
+- lookup : `sentence_lookup_as_begin_index` with `MorphemeLookup`
+- decode : `beam_search` on pre-computed lattices
+- tag    : `Tagger.tag` (lookup + decoding)
+- tag-c2f: `Tagger.tag` with coarse-to-fine pruning, if --prune-threshold is given
+- tag-adaptive: `Tagger.tag` with adaptive beam, if --beam-margin is given
+- tag-cached: `Tagger.tag` with result cache, if --cache-size is given. Its inputs are
+  sampled from the sentences with Zipf distribution, so frequent sentences repeat
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from lattice_tagger.beam import beam_search
+from lattice_tagger.beam import BeamScoreFunctions
+from lattice_tagger.beam import RegularizationScore
+from lattice_tagger.beam import SimpleTrigramFeatureScore
+from lattice_tagger.dictionary import BaseMorphemeDictionary
+from lattice_tagger.dictionary import sentence_lookup_as_begin_index
+from lattice_tagger.evaluation import peak_rss_mb
+from lattice_tagger.evaluation import percentile
+from lattice_tagger.features import SimpleTrigramEncoder
+from lattice_tagger.features import scan_features
+from lattice_tagger.tagger import Tagger
+from .corpus import SyntheticCorpus
+
+
+default_baseline = '%s/baseline.json' % os.path.dirname(os.path.realpath(__file__))
+
+
+def summarize(latencies, num_chars):
+    total = sum(latencies)
+    return {
+        'num_sents': len(latencies),
+        'sents_per_sec': len(latencies) / total if total > 0 else 0,
+        'chars_per_sec': num_chars / total if total > 0 else 0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000
+    }
+
+def measure(func, inputs, repeat=1):
+    """Returns the list of per-call latency in seconds"""
+    latencies = []
+    for _ in range(repeat):
+        for x in inputs:
+            t = time.perf_counter()
+            func(x)
+            latencies.append(time.perf_counter() - t)
+    return latencies
+
+def repetitive_traffic(sents, num_sents, zipf=1.5, seed=0):
+    """Samples sentences of which rank follows Zipf distribution, like chat logs or headlines"""
+    ranks = np.random.RandomState(seed).zipf(zipf, num_sents) - 1
+    return [sents[min(rank, len(sents) - 1)] for rank in ranks]
+
+def prepare_model(corpus, num_train_sents=500, seed=0):
+    """
+    Scan trigram features from synthetic gold pairs and fill random coefficients.
+    Timing does not depend on coefficient values but on the number of features and lattice size.
+    """
+    encoder = SimpleTrigramEncoder()
+    train_pairs = corpus.pairs(num_train_sents, num_eojeols=10)
+    _, feature_to_idx, _ = scan_features(train_pairs, encoder, min_count=1)
+    encoder.set_feature_dic(feature_to_idx)
+    coefficients = np.random.RandomState(seed).normal(0, 0.1, len(feature_to_idx))
+    score_funcs = BeamScoreFunctions(
+        RegularizationScore(),
+        SimpleTrigramFeatureScore(encoder, coefficients)
+    )
+    return encoder, score_funcs
+
+def run(lengths, beam_sizes, num_sents, repeat, seed=0, verbose=True, prune_threshold=None,
+    beam_margin=None, cache_size=None, zipf=1.5):
+    corpus = SyntheticCorpus(seed=seed)
+
+    t = time.perf_counter()
+    dictionary = BaseMorphemeDictionary()
+    encoder, score_funcs = prepare_model(corpus, seed=seed)
+    tagger = Tagger(dictionary, encoder=encoder, score_funcs=score_funcs)
+    if prune_threshold is not None:
+        pruned_tagger = Tagger(dictionary, encoder=encoder, score_funcs=score_funcs,
+            prune_threshold=prune_threshold)
+    if beam_margin is not None:
+        adaptive_tagger = Tagger(dictionary, encoder=encoder, score_funcs=score_funcs)
+        adaptive_tagger.set_adaptive_beam(margin=beam_margin)
+    if cache_size is not None:
+        cached_tagger = Tagger(dictionary, encoder=encoder, score_funcs=score_funcs,
+            cache_size=cache_size)
+    eojeol_lookup = tagger.eojeol_lookup
+    load_time = time.perf_counter() - t
+
+    results = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__
+        },
+        'config': {
+            'lengths': lengths,
+            'beam_sizes': beam_sizes,
+            'num_sents': num_sents,
+            'repeat': repeat,
+            'seed': seed,
+            'prune_threshold': prune_threshold,
+            'beam_margin': beam_margin,
+            'cache_size': cache_size,
+            'zipf': zipf,
+            'num_features': len(encoder.feature_dic)
+        },
+        'load_time_sec': load_time,
+        'benchmarks': {}
+    }
+    benchmarks = results['benchmarks']
+
+    def report(name, summary):
+        benchmarks[name] = summary
+        if verbose:
+            print('{:<24} {:>10.1f} sents/s {:>12.1f} chars/s  p50 {:>8.3f} ms  p99 {:>8.3f} ms'.format(
+                name, summary['sents_per_sec'], summary['chars_per_sec'], summary['p50_ms'], summary['p99_ms']))
+
+    for length in lengths:
+        sents = corpus.sentences(num_sents, num_eojeols=length)
+        num_chars = sum(len(sent.replace(' ', '')) for sent in sents) * repeat
+
+        # lookup only
+        lookup = lambda sent: sentence_lookup_as_begin_index(sent, eojeol_lookup)
+        report('lookup/len={}'.format(length), summarize(measure(lookup, sents, repeat), num_chars))
+
+        lattices = [(sent.replace(' ', ''), lookup(sent)[1]) for sent in sents]
+        for beam_size in beam_sizes:
+            # decoding only
+            decode = lambda lattice: beam_search(lattice[1], lattice[0], score_funcs, beam_size=beam_size)
+            report('decode/len={}/beam={}'.format(length, beam_size),
+                summarize(measure(decode, lattices, repeat), num_chars))
+
+            # end-to-end
+            tag = lambda sent: tagger.tag(sent, beam_size=beam_size)
+            report('tag/len={}/beam={}'.format(length, beam_size),
+                summarize(measure(tag, sents, repeat), num_chars))
+
+            # end-to-end with coarse-to-fine pruning
+            if prune_threshold is not None:
+                tag = lambda sent: pruned_tagger.tag(sent, beam_size=beam_size)
+                report('tag-c2f/len={}/beam={}'.format(length, beam_size),
+                    summarize(measure(tag, sents, repeat), num_chars))
+
+            # end-to-end with adaptive beam of which maximum width is beam_size
+            if beam_margin is not None:
+                tag = lambda sent: adaptive_tagger.tag(sent, beam_size=beam_size)
+                report('tag-adaptive/len={}/beam={}'.format(length, beam_size),
+                    summarize(measure(tag, sents, repeat), num_chars))
+
+            # end-to-end with result cache on repetitive inputs
+            if cache_size is not None:
+                traffic = repetitive_traffic(sents, num_sents, zipf, seed)
+                traffic_chars = sum(len(sent.replace(' ', '')) for sent in traffic) * repeat
+                tag = lambda sent: cached_tagger.tag(sent, beam_size=beam_size)
+                report('tag-cached/len={}/beam={}'.format(length, beam_size),
+                    summarize(measure(tag, traffic, repeat), traffic_chars))
+
+    if prune_threshold is not None:
+        results['pruning'] = dict(pruned_tagger.pruner.stats)
+    if beam_margin is not None:
+        results['adaptive_beam'] = dict(adaptive_tagger.beam_stats)
+    if cache_size is not None:
+        results['result_cache'] = dict(cached_tagger.result_cache.stats,
+            hit_rate=cached_tagger.result_cache.hit_rate)
+    results['peak_rss_mb'] = peak_rss_mb()
+    if verbose:
+        print('peak RSS = {:.1f} MB, load time = {:.3f} sec'.format(results['peak_rss_mb'], load_time))
+    return results
+
+def compare(results, baseline, tolerance=0.1, verbose=True):
+    """
+    Compare throughput (sents/sec) and p99 latency with baseline.
+
+    Returns
+    -------
+    regressions : list of str
+        Benchmark names of which throughput is slower than (1 - tolerance) times
+        of baseline or p99 latency is longer than (1 + tolerance) times of baseline
+    """
+    regressions = []
+    if verbose:
+        print('\n{:<24} {:>12} {:>12} {:>8} {:>10}'.format('benchmark', 'baseline', 'current', 'ratio', 'p99 ratio'))
+    for name, current in results['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if base is None or base['sents_per_sec'] == 0:
+            continue
+        ratio = current['sents_per_sec'] / base['sents_per_sec']
+        p99_ratio = current['p99_ms'] / base['p99_ms'] if base['p99_ms'] > 0 else 1
+        is_regressed = (ratio < 1 - tolerance) or (p99_ratio > 1 + tolerance)
+        if is_regressed:
+            regressions.append(name)
+        if verbose:
+            print('{:<24} {:>12.1f} {:>12.1f} {:>8.3f} {:>10.3f}{}'.format(
+                name, base['sents_per_sec'], current['sents_per_sec'], ratio, p99_ratio,
+                '  REGRESSION' if is_regressed else ''))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark lookup, decoding and tagging throughput')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[5, 10, 20], help='number of eojeols in a sentence')
+    parser.add_argument('--beam-sizes', type=int, nargs='+', default=[1, 3, 5, 10])
+    parser.add_argument('--num-sents', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--prune-threshold', type=float, default=None,
+        help='also benchmark tagging with coarse-to-fine pruning of the threshold')
+    parser.add_argument('--beam-margin', type=float, default=None,
+        help='also benchmark tagging with adaptive beam of the score margin')
+    parser.add_argument('--cache-size', type=int, default=None,
+        help='also benchmark tagging with result cache of the size on repetitive inputs')
+    parser.add_argument('--zipf', type=float, default=1.5, help='Zipf exponent of repetitive inputs')
+    parser.add_argument('--output', type=str, default=None, help='JSON file path to save results')
+    parser.add_argument('--baseline', type=str, default=None, help='JSON file path of stored baseline')
+    parser.add_argument('--save-baseline', action='store_true', help='overwrite benchmarks/baseline.json')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    results = run(args.lengths, args.beam_sizes, args.num_sents, args.repeat, args.seed,
+        prune_threshold=args.prune_threshold, beam_margin=args.beam_margin,
+        cache_size=args.cache_size, zipf=args.zipf)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(default_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print('\n{} regressions found'.format(len(regressions)))
+            if args.fail_on_regression:
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
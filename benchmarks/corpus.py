@@ -0,0 +1,113 @@
+"""
+Synthetic (word_text, morph_text) corpus generated from the bundled `resources/base` dictionary.
+
+The generated pairs follow the format of `text_to_words`: eojeols are separated by two spaces,
+words in a eojeol by one space and conjugated morphemes by '+'.
+"""
+
+import random
+
+from lattice_tagger.utils import installpath
+from lattice_tagger.tagset import *
+
+
+def load_frequent_morphs(tag, topk=300, directory=None):
+    """
+    Arguments
+    ---------
+    tag : str
+        Tag name. The file `{directory}/{tag}.txt` is loaded
+    topk : int
+        Number of the most frequent morphemes to keep
+
+    Returns
+    -------
+    morphs : list of str
+        Morphemes sorted by descending frequency
+    """
+
+    if directory is None:
+        directory = '%s/resources/base' % installpath
+    morphs = []
+    with open('%s/%s.txt' % (directory, tag), encoding='utf-8') as f:
+        for line in f:
+            columns = line.split()
+            if not columns:
+                continue
+            freq = int(columns[1]) if len(columns) > 1 else 1
+            morphs.append((columns[0], freq))
+    morphs = sorted(morphs, key=lambda x:-x[1])[:topk]
+    return [morph for morph, _ in morphs]
+
+
+class SyntheticCorpus:
+    """
+    Usage
+    -----
+        >>> corpus = SyntheticCorpus(seed=0)
+        >>> word_text, morph_text = corpus.generate(num_eojeols=3)
+        >>> word_text
+        $ '그 는  하는  정말'
+        >>> morph_text
+        $ '그/Pronoun 는/Josa  하/Verb+는/Eomi  정말/Adverb'
+
+        >>> pairs = corpus.pairs(num_sents=100, num_eojeols=10)
+        >>> sents = corpus.sentences(num_sents=100, num_eojeols=10)
+    """
+
+    def __init__(self, topk=300, seed=0):
+        self.random = random.Random(seed)
+        self.morphs = {tag:load_frequent_morphs(tag, topk) for tag in
+            [Pronoun, Number, Josa, Verb, Adjective, Eomi, Adverb, Determiner, Exclamation]}
+        # Eomi beginning with jamo needs conjugation rule. They are excluded for simple concatenation.
+        self.morphs[Eomi] = [eomi for eomi in self.morphs[Eomi] if not ('ㄱ' <= eomi[0] <= 'ㅣ')]
+        self.templates = [
+            (self._noun_josa, 4),
+            (self._predicate, 4),
+            (self._single(Adverb), 2),
+            (self._single(Determiner), 1),
+            (self._single(Exclamation), 1)
+        ]
+        self.weights = [w for _, w in self.templates]
+
+    def _choice(self, tag):
+        morphs = self.morphs[tag]
+        # prefer frequent morphemes: squared uniform distribution skews to head
+        return morphs[int(len(morphs) * self.random.random() ** 2)]
+
+    def _noun_josa(self):
+        noun_tag = Pronoun if self.random.random() < 0.7 else Number
+        noun = self._choice(noun_tag)
+        josa = self._choice(Josa)
+        return '%s %s' % (noun, josa), '%s/%s %s/%s' % (noun, noun_tag, josa, Josa)
+
+    def _predicate(self):
+        tag = Verb if self.random.random() < 0.6 else Adjective
+        stem = self._choice(tag)
+        eomi = self._choice(Eomi)
+        return stem + eomi, '%s/%s+%s/%s' % (stem, tag, eomi, Eomi)
+
+    def _single(self, tag):
+        def generate():
+            morph = self._choice(tag)
+            return morph, '%s/%s' % (morph, tag)
+        return generate
+
+    def generate(self, num_eojeols=10):
+        funcs = self.random.choices([f for f, _ in self.templates], self.weights, k=num_eojeols)
+        eojeols, morphs = zip(*[func() for func in funcs])
+        return '  '.join(eojeols), '  '.join(morphs)
+
+    def pairs(self, num_sents=100, num_eojeols=10):
+        return [self.generate(num_eojeols) for _ in range(num_sents)]
+
+    def sentences(self, num_sents=100, num_eojeols=10):
+        return [pair_to_sentence(word_text) for word_text, _ in self.pairs(num_sents, num_eojeols)]
+
+
+def pair_to_sentence(word_text):
+    """
+        >>> pair_to_sentence('그 는  하는  정말')
+        $ '그는 하는 정말'
+    """
+    return ' '.join(eojeol.replace(' ', '') for eojeol in word_text.split('  '))
@@ -1,3 +1,5 @@
+import importlib
+
 from .tagset import Noun
 from .tagset import Pronoun
 from .tagset import Josa
@@ -10,13 +12,35 @@ from .tagset import Exclamation
 from .tagset import BOS
 from .tagset import EOS
 from .tagset import Unk
-from .utils import installpath
-from .utils import left_space_tag
-from .utils import get_process_memory
-from .utils import WordMorphemePairs
+# instrumentation object shares its name with the module, thus it is imported eagerly (light module)
+from .instrumentation import instrumentation
+from .instrumentation import Instrumentation
+
+# Submodules and their attributes are imported at the first access (PEP 562),
+# so `import lattice_tagger` does not load numpy or the whole package.
+_lazy_submodules = {'beam', 'dictionary', 'evaluation', 'features', 'gc_tuning', 'normalizer',
+    'profile', 'service', 'tagger', 'trainer', 'utils'}
+
+_lazy_attributes = {
+    'installpath': 'utils',
+    'left_space_tag': 'utils',
+    'get_process_memory': 'utils',
+    'WordMorphemePairs': 'utils',
+    'IndexedWordMorphemePairs': 'utils',
+    'production_mode': 'gc_tuning',
+    'gc_paused': 'gc_tuning',
+    'GCMonitor': 'gc_tuning',
+}
+
+def __getattr__(name):
+    if name in _lazy_attributes:
+        module = importlib.import_module('.' + _lazy_attributes[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    if name in _lazy_submodules:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module {} has no attribute {}'.format(__name__, name))
 
-from . import beam
-from . import dictionary
-from . import features
-from . import tagger
-from . import trainer
+def __dir__():
+    return sorted(set(globals()) | _lazy_submodules | set(_lazy_attributes))
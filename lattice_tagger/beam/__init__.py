@@ -1,9 +1,13 @@
 from .beam import beam_search
 from .beam import Beam
+from .beam import AdaptiveBeam
 from .beam import Sequence
+from .beam import Lattice
 from .score_funcs import BeamScoreFunction
 from .score_funcs import BeamScoreFunctions
+from .score_funcs import StaticNodeWeights
 from .score_funcs import RegularizationScore
 from .score_funcs import MorphemePreferenceScore
 from .score_funcs import WordPreferenceScore
 from .score_funcs import SimpleTrigramFeatureScore
+from .coarse import CoarseToFinePruner
@@ -1,9 +1,57 @@
+import heapq
+import time
+
 from ..tagset import *
-from lattice_tagger.dictionary import Word
+from lattice_tagger.dictionary import char_class
+from lattice_tagger.dictionary import Hangul
+from lattice_tagger.dictionary import BOS_WORD
+from lattice_tagger.dictionary import eos_word
+from lattice_tagger.dictionary import unknown_word
+from lattice_tagger.dictionary import weighted_word
+from lattice_tagger.instrumentation import instrumentation
+
+
+# maximum length of unknown word for each character class
+default_max_unknown_len = {Hangul: 8, Number: 20, Foreign: 20, Punctuation: 4, Symbol: 4}
 
 
-def beam_search(bindex, chars, score_functions, beam_size=5, max_len=8, debug=False):
+def beam_search(bindex, chars, score_functions, beam_size=5, max_len=8, debug=False,
+    max_unknown_len=None, lattice=None, node_weights=None, beam=None):
     """
+    Arguments
+    ---------
+    bindex : list of list of Word
+        Words grouped by begin index. See `sentence_lookup_as_begin_index`
+    chars : str
+        Sentence without white spaces
+    score_functions : BeamScoreFunctions
+    beam_size : int
+        Number of sequences kept at each end point
+    max_len : int
+        Maximum length of unknown word. Dictionary words are not bounded
+    max_unknown_len : dict or None
+        Maximum length of unknown word for each character class.
+        Default is `default_max_unknown_len`
+    lattice : Lattice or None
+        Pre-built lattice. If given, `bindex`, `max_len`, `max_unknown_len` and `node_weights` are not used
+    node_weights : StaticNodeWeights or None
+        Static weights of unknown words. Dictionary words get their weights from lookup.
+        `Word.weight` is added once for each expansion, so score_functions should not
+        include the compiled static functions. See `BeamScoreFunctions.split_static`
+    beam : Beam or None
+        Partially decoded beam to resume. beam.beam[e] must be valid for the current lattice
+        at every end point e < len(beam.beam), and decoding starts from len(beam.beam).
+        The beam is extended in place, so the caller can keep it as decoder state.
+        An empty beam such as `AdaptiveBeam(k=10, margin=3)` starts from BOS with its pruning policy.
+        If beam is given, `beam_size` is not used
+
+    Returns
+    -------
+    matures : list of Sequence
+        Sorted in descending order of score
+
+    Usage
+    -----
         >>> funcs = BeamScoreFunctions(
         >>>     RegularizationScore(unknown_penalty=-.1, known_preference=0.5),
         >>>     MorphemePreferenceScore({Noun: {'아이오아이':2.2}}),
@@ -17,38 +65,76 @@ def beam_search(bindex, chars, score_functions, beam_size=5, max_len=8, debug=Fa
         >>> matures = beam_search(bindex, chars, funcs, beam_size=3, debug=False)
     """
     len_sent = len(chars)
+    # instrumentation is checked once per sentence
+    inst = instrumentation if instrumentation.enabled else None
+    if inst is not None:
+        t = time.perf_counter()
 
-    bos = Sequence([Word(BOS, BOS, None, BOS, None, 0, 0, 0, False)], 0)
-    eos = Word(EOS, EOS, None, EOS, None, 0, len_sent, len_sent, False)
-    beam = Beam([[bos]], beam_size)
+    if lattice is None:
+        lattice = Lattice(bindex, chars, max_len, max_unknown_len, node_weights)
+    classes = lattice.classes
+    # with only static functions, the score of an expansion is its node weight
+    has_dynamic = len(score_functions.funcs) > 0
+    num_unk_pruned = 0
 
-    for e in range(1, len_sent + 1):
+    eos = eos_word(len_sent)
+    if beam is None:
+        beam = Beam([[Sequence([BOS_WORD], 0)]], beam_size)
+    elif not beam.beam:
+        beam.beam.append([Sequence([BOS_WORD], 0)])
+    beam.set_length(len_sent)
 
-        growns = []
+    if inst is not None:
+        inst.add_time('lattice', time.perf_counter() - t)
 
-        # find candidates
-        b_min = max(0, e - max_len)
-        for b in range(b_min, e):
-            immatures = beam[b]
-            expandes = [word for word in bindex[b] if word.e == e]
+    for e in range(len(beam.beam), len_sent + 1):
 
-            # prepare unknown Word
-            if not expandes:
-                sub = chars[b:e]
-                expandes = [Word(sub, sub, None, Unk, None, e - b, b, e, False)]
+        growns = []
+        if inst is not None:
+            t = time.perf_counter()
 
-            # score
-            for immature in immatures:
+        # expand dictionary words
+        for b, expandes in lattice.known[e]:
+            for immature in beam[b]:
                 for expand in expandes:
-                    # skip successive two unknown words
-                    if (immature.num_unk > 0) and (expand.tag0 == Unk) and (b_min < b):
+                    increment = expand.weight
+                    if has_dynamic:
+                        increment += score_functions(immature, expand)
+                    growns.append(immature.add(expand, increment))
+
+        # expand unknown words
+        unknowns = lattice.unknown[e]
+        if unknowns:
+            # a candidate scored lower than the threshold never enters the beam
+            threshold = beam.threshold(growns)
+            b_min = e - lattice.max_len
+            for b, expand in unknowns:
+                bound = None if threshold is None else score_functions.upper_bound(expand)
+                if bound is not None:
+                    bound += expand.weight
+                immatures = beam[b]
+                for i, immature in enumerate(immatures):
+                    # skip successive two unknown words if they can be merged into one unknown word
+                    if ((immature.num_unk > 0) and (b_min < b) and (classes[b-1] == classes[b])):
                         continue
-                    # calculate
-                    increment = score_functions(immature, expand)
+                    # immatures are sorted in descending order of score
+                    if (bound is not None) and (immature.score + bound + 1e-9 < threshold):
+                        num_unk_pruned += len(immatures) - i
+                        break
+                    increment = expand.weight
+                    if has_dynamic:
+                        increment += score_functions(immature, expand)
                     growns.append(immature.add(expand, increment))
 
         # append growns to beam
+        if inst is not None:
+            t_scored = time.perf_counter()
+            inst.add_time('scoring', t_scored - t)
         beam.append(growns)
+        if inst is not None:
+            inst.add_time('pruning', time.perf_counter() - t_scored)
+            inst.incr('grown_candidates', len(growns))
+            inst.incr('pruned_candidates', len(growns) - len(beam[-1]))
 
         if debug:
             print('\n{}\nEnd point = {}, len(growns) = {}\n'.format('-'*40, e, len(growns)))
@@ -56,11 +142,127 @@ def beam_search(bindex, chars, score_functions, beam_size=5, max_len=8, debug=Fa
             for grown in growns:
                 print(grown, end='\n\n')
 
+    if inst is not None:
+        inst.incr('unknown_words', lattice.num_unknowns)
+        inst.incr('unknown_pruned_candidates', num_unk_pruned)
+        for name, value in beam.stats.items():
+            inst.incr('beam_' + name, value)
+
     matures = beam.beam[-1]
     matures = [m.add(eos, 0) for m in matures]
     return matures
 
 
+class Lattice:
+    """
+    Candidates of beam search grouped by end point.
+    Unknown words are generated once for each sentence, for every span which has no dictionary word.
+    An unknown word consists of only one character class, and its length is bounded by
+    `max_len` and `max_unknown_len` of the character class. Characters covered by
+    pre-segmented nodes (see `sentence_lookup`) do not begin unknown words.
+
+    Attributes
+    ----------
+    known : list of list of (int, list of Word)
+        known[e] = [(b, words), ...] where words are dictionary words from b to e
+    unknown : list of list of (int, Word)
+        unknown[e] = [(b, unknown word), ...]
+    classes : list of str
+        Character class of each character
+    num_unknowns : int
+        Number of unknown words generated in the last build
+
+    Unknown words get their static weights from node_weights (StaticNodeWeights) if given.
+
+    Usage
+    -----
+        >>> words, bindex = sentence_lookup_as_begin_index('abc노래', eojeol_lookup, presegment=False)
+        >>> lattice = Lattice(bindex, 'abc노래')
+        >>> lattice.known[5]
+        $ [(3, [Word(노래, 노래/Noun, len=2, b=3, e=5)])]
+        >>> lattice.unknown[3]
+        $ [(0, Word(abc, abc/Unknown, len=3, b=0, e=3)),
+           (1, Word(bc, bc/Unknown, len=2, b=1, e=3)),
+           (2, Word(c, c/Unknown, len=1, b=2, e=3))]
+    """
+
+    def __init__(self, bindex, chars, max_len=8, max_unknown_len=None, node_weights=None):
+        if max_unknown_len is None:
+            max_unknown_len = default_max_unknown_len
+
+        self.max_len = max_len
+        self.max_unknown_len = max_unknown_len
+        self.node_weights = node_weights
+        self.classes = []
+        self.known = [[]]
+        self.unknown = [[]]
+        self._typed = []
+        self._build(bindex, chars, 0)
+
+    def rebuild(self, bindex, chars, begin):
+        """
+        Re-builds the lattice of modified sentence from `begin`.
+        chars[:begin] and bindex[:begin] must be unchanged, and no dictionary word crosses
+        `begin` (for example, begin is the first character of an eojeol).
+        Words which end at or before `begin` are kept.
+
+            >>> lattice.rebuild(new_bindex, new_chars, begin=7)
+        """
+        self._build(bindex, chars, begin)
+        return self
+
+    def _build(self, bindex, chars, begin):
+        n = len(chars)
+        max_len = self.max_len
+        max_unknown_len = self.max_unknown_len
+        node_weights = self.node_weights
+        self.classes = self.classes[:begin] + [char_class(c) for c in chars[begin:]]
+        self.known = self.known[:begin + 1] + [[] for _ in range(begin, n)]
+        self.unknown = self.unknown[:begin + 1] + [[] for _ in range(begin, n)]
+
+        # group dictionary words by (b, e)
+        for b in range(begin, len(bindex)):
+            words = bindex[b]
+            if not words:
+                continue
+            by_end = {}
+            for word in words:
+                by_end.setdefault(word.e, []).append(word)
+            for e, words_e in by_end.items():
+                self.known[e].append((b, words_e))
+        known_spans = {(b, e) for e in range(begin + 1, n + 1) for b, _ in self.known[e]}
+
+        # characters covered by pre-segmented nodes whose tag is their character class
+        classes = self.classes
+        typed = self._typed[:begin] + [False] * (n - begin)
+        for b in range(begin, len(bindex)):
+            for word in bindex[b]:
+                if word.tag1 is None and word.tag0 == classes[b]:
+                    for i in range(word.b, word.e):
+                        typed[i] = True
+        self._typed = typed
+
+        # homogeneous character class spans.
+        # unknown words which end after begin may begin before begin
+        num_unknowns = 0
+        for b in range(max(0, begin - max_len), n):
+            if typed[b]:
+                continue
+            cls = classes[b]
+            max_e = min(n, b + max_len, b + max_unknown_len.get(cls, max_len))
+            for e in range(b + 1, max_e + 1):
+                # unknown word of length 1 is always generated to guarantee a path
+                if e - b > 1 and classes[e - 1] != cls:
+                    break
+                if e <= begin or (b, e) in known_spans:
+                    continue
+                word = unknown_word(chars[b:e], b, e)
+                if node_weights is not None:
+                    word = weighted_word(word, node_weights.weight(word))
+                self.unknown[e].append((b, word))
+                num_unknowns += 1
+        self.num_unknowns = num_unknowns
+
 class Beam:
     """
         >>> word0 = Word('BOS', 'BOS', None, 'BOS', None, 0, 0, 0)
@@ -75,16 +277,125 @@ class Beam:
     def __init__(self, beam=None, k=5):
         self.k = k
         self.beam = beam if beam is not None else []
+        self.stats = {}
 
     def __getitem__(self, index):
         """index for end point"""
         return self.beam[index]
 
+    def set_length(self, len_sent):
+        """It is called by `beam_search` with the length of sentence before decoding"""
+        pass
+
+    def threshold(self, candidates):
+        """
+        Returns
+        -------
+        threshold : float or None
+            Candidates scored lower than threshold never enter the beam together with `candidates`.
+            None if every candidate may enter
+        """
+        if len(candidates) < self.k:
+            return None
+        return heapq.nlargest(self.k, [c.score for c in candidates])[-1]
+
     def append(self, candidates):
         # descending order of score
         candidates = sorted(candidates, key=lambda x:-x.score)[:self.k]
         self.beam += [candidates]
 
+class AdaptiveBeam(Beam):
+    """
+    Beam of which width varies at each end point. Candidates within `margin` from the best
+    candidate are kept, at least `min_k` and at most `k` candidates.
+    If `budget` is given, the total number of kept candidates over a sentence is bounded by it.
+    The unused budget of an end point is carried over to the following end points, and
+    at least `min_k` candidates are kept even if the budget is exhausted.
+
+    Arguments
+    ---------
+    beam : list of list of Sequence or None
+        Initial beam. If None, `beam_search` starts it from BOS
+    k : int
+        Maximum width
+    margin : float
+        Score margin from the best candidate
+    min_k : int
+        Minimum width
+    budget : int or None
+        Maximum number of kept candidates of a sentence
+
+    Attributes
+    ----------
+    stats : dict
+        'candidates' : number of candidates appended
+        'kept' : number of kept candidates
+        'margin_pruned' : candidates pruned by margin
+        'width_pruned' : candidates pruned by maximum width
+        'budget_pruned' : candidates pruned by budget
+
+    Usage
+    -----
+        >>> beam = AdaptiveBeam(k=10, margin=3, min_k=1, budget=200)
+        >>> matures = beam_search(bindex, chars, funcs, beam=beam)
+        >>> beam.stats
+        $ {'candidates': 2214, 'kept': 83, 'margin_pruned': 1911, 'width_pruned': 220, 'budget_pruned': 0}
+    """
+
+    def __init__(self, beam=None, k=10, margin=3.0, min_k=1, budget=None):
+        if not (1 <= min_k <= k):
+            raise ValueError('Must be 1 <= min_k <= k')
+        if margin < 0:
+            raise ValueError('margin must be non-negative')
+        super().__init__(beam, k)
+        self.margin = margin
+        self.min_k = min_k
+        self.budget = budget
+        self.len_sent = None
+        self.stats = {'candidates': 0, 'kept': 0, 'margin_pruned': 0,
+                      'width_pruned': 0, 'budget_pruned': 0}
+
+    def set_length(self, len_sent):
+        self.len_sent = len_sent
+
+    def _width(self):
+        if self.budget is None or self.len_sent is None:
+            return self.k
+        # end points not appended yet, including the current one
+        num_remains = max(1, self.len_sent + 1 - len(self.beam))
+        allowance = (self.budget - self.stats['kept']) // num_remains
+        return max(self.min_k, min(self.k, allowance))
+
+    def threshold(self, candidates):
+        if len(candidates) < self.min_k:
+            return None
+        scores = heapq.nlargest(self.k, [c.score for c in candidates])
+        # a candidate enters only if it is in top-k, and in top-min_k or within margin
+        threshold = min(scores[0] - self.margin, scores[self.min_k - 1])
+        if len(scores) >= self.k:
+            threshold = max(threshold, scores[-1])
+        return threshold
+
+    def append(self, candidates):
+        # descending order of score
+        candidates = sorted(candidates, key=lambda x:-x.score)
+        n = len(candidates)
+        num_top = min(n, self.k)
+        num_margin = min(n, self.min_k)
+        if n > 0:
+            cut = candidates[0].score - self.margin
+            while num_margin < num_top and candidates[num_margin].score >= cut:
+                num_margin += 1
+        num_kept = min(num_margin, self._width())
+
+        stats = self.stats
+        stats['candidates'] += n
+        stats['kept'] += num_kept
+        stats['width_pruned'] += n - num_top
+        stats['margin_pruned'] += num_top - num_margin
+        stats['budget_pruned'] += num_margin - num_kept
+        self.beam += [candidates[:num_kept]]
+
 class Sequence:
     """
         >>> word0 = Word('BOS', 'BOS', None, 'BOS', None, 0, 0, 0)
@@ -104,6 +415,8 @@ class Sequence:
           score = 1.3
     """
 
+    __slots__ = ('sequences', 'score', 'num_unk')
+
     def __init__(self, sequences, score, num_unk=0):
         self.sequences = sequences
         self.score = score
@@ -111,7 +424,7 @@ class Sequence:
 
     def add(self, node, score_increment):
         num_unk = self.num_unk + 1 if node.tag0 == Unk else 0
-        new_nodes = [n for n in self.sequences] + [node]
+        new_nodes = self.sequences + [node]
         new_score = self.score + score_increment
         return Sequence(new_nodes, new_score, num_unk)
 
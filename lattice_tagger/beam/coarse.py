@@ -0,0 +1,274 @@
+"""
+Coarse-to-fine lattice pruning
+
+The coarse model scores a path with only node-local and tag-bigram terms:
+static node weights (`Word.weight`), unigram features (classes 4, 5 and 6) and
+tag-transition features (classes 2, 3) of SimpleTrigramFeatureScore. Its best path is
+found by Viterbi over the lattice grouped by the last tag, so forward and backward passes
+cost O(#nodes x #tags) instead of scoring every (sequence, node) pair with full features.
+
+The max-marginal of a node is the score of the best coarse path through it. Nodes of which
+max-marginal is lower than `best - threshold` are removed, and the trigram decoder
+(`beam_search`) runs only over the survivors.
+
+Usage
+-----
+    >>> pruner = CoarseToFinePruner.from_score_functions(funcs, threshold=2)
+    >>> lattice = Lattice(bindex, chars, node_weights=node_weights)
+    >>> pruned = pruner.prune(lattice)
+    >>> matures = beam_search(bindex, chars, dynamic_funcs, lattice=pruned)
+    >>> pruner.stats
+    $ {'sentences': 1, 'nodes': 112, 'pruned_nodes': 87}
+"""
+
+import copy
+
+from ..tagset import *
+from .score_funcs import SimpleTrigramFeatureScore
+
+
+_NEG_INF = float('-inf')
+
+
+class CoarseToFinePruner:
+    """
+    Arguments
+    ---------
+    feature_score : SimpleTrigramFeatureScore or None
+        Source of unigram and tag-transition coefficients. If None, coarse model uses
+        only static node weights
+    threshold : float
+        Nodes whose max-marginal is lower than (best coarse path score - threshold) are pruned.
+        Larger threshold keeps more nodes
+    cache_size : int
+        Maximum number of (surface, tag) nodes of which coarse scores are cached.
+        The cache is cleared before a sentence when it is full. If 0, it is not bounded
+
+    Usage
+    -----
+        >>> pruner = CoarseToFinePruner(trigram_score, threshold=2)
+        >>> pruned = pruner.prune(lattice)
+    """
+
+    def __init__(self, feature_score=None, threshold=2.0, cache_size=100000):
+        if threshold < 0:
+            raise ValueError('threshold must be non-negative')
+        self.feature_score = feature_score
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self.stats = {'sentences': 0, 'nodes': 0, 'pruned_nodes': 0}
+        self._unary_cache = {}
+        self._transition_cache = {}
+
+    @classmethod
+    def from_score_functions(cls, score_functions, threshold=2.0, cache_size=100000):
+        """
+        It uses the first SimpleTrigramFeatureScore in score_functions (BeamScoreFunctions)
+        """
+        feature_score = None
+        for func in score_functions.funcs:
+            if isinstance(func, SimpleTrigramFeatureScore) and func.encoder is not None:
+                feature_score = func
+                break
+        return cls(feature_score, threshold, cache_size)
+
+    def reset_cache(self):
+        """Call it after modifying coefficients of feature_score"""
+        self._unary_cache = {}
+        self._transition_cache = {}
+        return self
+
+    def _coefficient(self, feature):
+        idx = self.feature_score.encoder.feature_dic.get(feature)
+        if idx is None:
+            return 0.0
+        return float(self.feature_score.coefficients[idx]) * self.feature_score.scale
+
+    def _node_scores(self, word):
+        """
+        Returns
+        -------
+        unary : float
+            Coarse score of word itself without its static weight. Unknown length feature
+            (class 6) fires when the next word is expanded, and it is charged to the unknown word
+        transitions : dict
+            Previous tag to tag-transition score (classes 2, 3). Filled on demand
+        """
+        key = (word.word, word.tag0, word.is_l, word.len)
+        scores = self._unary_cache.get(key)
+        if scores is None:
+            if self.feature_score is None:
+                unary = 0.0
+            else:
+                unary = self._coefficient((4, word.len)) + self._coefficient((5, word.word, word.tag0, word.is_l))
+                if word.tag0 == Unk:
+                    unary += self._coefficient((6, min(8, word.len)))
+            transitions = self._transition_cache.setdefault((word.word, word.tag0), {})
+            scores = (unary, transitions)
+            self._unary_cache[key] = scores
+        return scores
+
+    def _transition(self, tag_j, word_k, transitions):
+        score = transitions.get(tag_j)
+        if score is None:
+            if self.feature_score is None:
+                score = 0.0
+            else:
+                score = (self._coefficient((3, tag_j, word_k.tag0))
+                         + self._coefficient((2, tag_j, word_k.word, word_k.tag0)))
+            transitions[tag_j] = score
+        return score
+
+    def max_marginals(self, lattice):
+        """
+        Returns
+        -------
+        best : float
+            Score of the best coarse path
+        known : list of list of list of float
+            known[e][i][j] is the max-marginal of lattice.known[e][i][1][j]
+        unknown : list of list of float
+            unknown[e][i] is the max-marginal of lattice.unknown[e][i][1]
+        """
+        # transition dicts are shared by the nodes of a sentence, so cache is cleared only here.
+        # Transition cache has no more keys than unary cache
+        if self.cache_size > 0 and len(self._unary_cache) >= self.cache_size:
+            self.reset_cache()
+
+        n = len(lattice.known) - 1
+        classes = lattice.classes
+        max_len = lattice.max_len
+        node_scores = self._node_scores
+        transition = self._transition
+
+        # nodes in order of end point. Each node is (index, begin, word, unary, transitions, no_unk)
+        # where no_unk is True if the node must not follow an unknown word, because
+        # beam_search does not expand successive two unknown words of same character class
+        nodes_by_end = [[] for _ in range(n + 1)]
+        nodes_by_begin = [[] for _ in range(n + 1)]
+        num_nodes = 0
+        for e in range(1, n + 1):
+            nodes_e = nodes_by_end[e]
+            for b, words in lattice.known[e]:
+                for word in words:
+                    unary, transitions = node_scores(word)
+                    node = (num_nodes, b, word, word.weight + unary, transitions, False)
+                    nodes_e.append(node)
+                    nodes_by_begin[b].append(node)
+                    num_nodes += 1
+            for b, word in lattice.unknown[e]:
+                unary, transitions = node_scores(word)
+                no_unk = (0 < b) and (classes[b-1] == classes[b]) and (word.len < max_len)
+                node = (num_nodes, b, word, word.weight + unary, transitions, no_unk)
+                nodes_e.append(node)
+                nodes_by_begin[b].append(node)
+                num_nodes += 1
+
+        # forward[i]: best score of paths from BOS to node i (inclusive).
+        # forward_best[p][tag]: best forward score of nodes of tag ending at p
+        forward = [_NEG_INF] * num_nodes
+        forward_best = [{} for _ in range(n + 1)]
+        forward_best[0][BOS] = 0.0
+        for e in range(1, n + 1):
+            best_e = forward_best[e]
+            for i, b, word, unary, transitions, no_unk in nodes_by_end[e]:
+                score = _NEG_INF
+                for tag_j, score_j in forward_best[b].items():
+                    if no_unk and tag_j == Unk:
+                        continue
+                    s = transitions.get(tag_j)
+                    if s is None:
+                        s = transition(tag_j, word, transitions)
+                    s += score_j
+                    if s > score:
+                        score = s
+                score += unary
+                forward[i] = score
+                tag = word.tag0
+                if score > best_e.get(tag, _NEG_INF):
+                    best_e[tag] = score
+
+        # backward[i]: best score of paths from node i (exclusive) to EOS
+        # backward_best[p][tag]: best backward score after a word of tag ending at p
+        backward = [_NEG_INF] * num_nodes
+        for p in range(n, -1, -1):
+            if p == n:
+                for node in nodes_by_end[p]:
+                    backward[node[0]] = 0.0
+                continue
+            tags = {node[2].tag0 for node in nodes_by_end[p]} if p > 0 else (BOS,)
+            best_p = {}
+            for tag_j in tags:
+                score = _NEG_INF
+                for i, _, word, unary, transitions, no_unk in nodes_by_begin[p]:
+                    if no_unk and tag_j == Unk:
+                        continue
+                    s = transitions.get(tag_j)
+                    if s is None:
+                        s = transition(tag_j, word, transitions)
+                    s += unary + backward[i]
+                    if s > score:
+                        score = s
+                best_p[tag_j] = score
+            if p == 0:
+                best = best_p[BOS]
+            for node in nodes_by_end[p]:
+                backward[node[0]] = best_p[node[2].tag0]
+        if n == 0:
+            best = 0.0
+
+        known_marginals = [[] for _ in range(n + 1)]
+        unknown_marginals = [[] for _ in range(n + 1)]
+        for e in range(1, n + 1):
+            nodes = iter(nodes_by_end[e])
+            for b, words in lattice.known[e]:
+                marginals = []
+                for _ in words:
+                    i = next(nodes)[0]
+                    marginals.append(forward[i] + backward[i])
+                known_marginals[e].append(marginals)
+            for _ in lattice.unknown[e]:
+                i = next(nodes)[0]
+                unknown_marginals[e].append(forward[i] + backward[i])
+        return best, known_marginals, unknown_marginals
+
+    def prune(self, lattice):
+        """
+        Returns
+        -------
+        pruned : Lattice
+            Shallow copy of lattice which has only the nodes of which max-marginal is
+            not lower than (best - threshold). The input lattice is not modified
+        """
+        best, known_marginals, unknown_marginals = self.max_marginals(lattice)
+        cut = best - self.threshold - 1e-9
+        n = len(lattice.known) - 1
+
+        known = [[] for _ in range(n + 1)]
+        unknown = [[] for _ in range(n + 1)]
+        num_nodes = 0
+        num_survived = 0
+        for e in range(1, n + 1):
+            for (b, words), marginals in zip(lattice.known[e], known_marginals[e]):
+                survived = [word for word, m in zip(words, marginals) if m >= cut]
+                num_nodes += len(words)
+                num_survived += len(survived)
+                if survived:
+                    known[e].append((b, survived))
+            for (b, word), m in zip(lattice.unknown[e], unknown_marginals[e]):
+                num_nodes += 1
+                if m >= cut:
+                    unknown[e].append((b, word))
+                    num_survived += 1
+
+        pruned = copy.copy(lattice)
+        pruned.known = known
+        pruned.unknown = unknown
+        pruned.num_unknowns = sum(len(u) for u in unknown)
+        self.stats['sentences'] += 1
+        self.stats['nodes'] += num_nodes
+        self.stats['pruned_nodes'] += num_nodes - num_survived
+        return pruned
+
+    def __call__(self, lattice):
+        return self.prune(lattice)
@@ -1,10 +1,23 @@
-import numpy as np
-
 from ..tagset import *
+from ..utils import LazyModule
+from ..features import SimpleTrigramEncoder
+from ..features.feature import contextual_tags
 from .beam import Sequence
+from lattice_tagger.dictionary import weighted_word
+from lattice_tagger.dictionary import new_word
+from lattice_tagger.dictionary import Word
+
+# numpy is imported at the first use
+np = LazyModule('numpy')
+
+_tuple_new = tuple.__new__
 
 
 class BeamScoreFunction:
+    # If True, score(seq, word_k) depends only on word_k, and it can be compiled into
+    # static node weight. See `StaticNodeWeights`
+    static = False
+
     def __call__(self, sequence, word_k):
         return self.score(sequence, word_k)
 
@@ -14,6 +27,13 @@ class BeamScoreFunction:
     def score(self, seq, word_k):
         raise NotImplemented('Inherit and implement score function')
 
+    def upper_bound(self, word_k):
+        """
+        Upper bound of score(seq, word_k) over all sequences.
+        None means unbounded, and then beam search does not prune candidates with the bound.
+        """
+        return None
+
 
 class BeamScoreFunctions:
     """
@@ -53,7 +73,124 @@ class BeamScoreFunctions:
             score += func(sequence, word_k)
         return score
 
+    def upper_bound(self, word_k):
+        bound = 0
+        for func in self.funcs:
+            bound_ = func.upper_bound(word_k)
+            if bound_ is None:
+                return None
+            bound += bound_
+        return bound
+
+    def split_static(self):
+        """
+        It separates score functions which depend only on the node from the others.
+
+        Returns
+        -------
+        node_weights : StaticNodeWeights or None
+            Compiled static functions. None if there is no static function
+        dynamic : BeamScoreFunctions
+            The other functions. Beam search calls them for each expansion
+
+        Usage
+        -----
+            >>> node_weights, dynamic = funcs.split_static()
+            >>> eojeol_lookup.node_weights = node_weights
+            >>> matures = beam_search(bindex, chars, dynamic, node_weights=node_weights)
+        """
+        statics = [func for func in self.funcs if func.static]
+        dynamics = [func for func in self.funcs if not func.static]
+        node_weights = StaticNodeWeights(*statics) if statics else None
+        return node_weights, BeamScoreFunctions(*dynamics)
+
+
+class StaticNodeWeights:
+    """
+    Static score functions compiled into node weight.
+    Preferences are merged into (morph, tag) and (word, tag) tables, and coefficients of
+    RegularizationScore are summed, so a node weight costs two or three dict lookups.
+    Other static functions are called as they are.
+
+        >>> node_weights = StaticNodeWeights(
+        >>>     RegularizationScore(unknown_penalty=-.1, known_preference=0.5),
+        >>>     MorphemePreferenceScore({Noun: {'아이오아이':2.2}})
+        >>> )
+        >>> node_weights.weight(Word('아이오아이', '아이오아이', None, 'Noun', None, 5, 0, 5, True))
+        $ 4.7
+    """
+
+    def __init__(self, *functions):
+        self.unknown_penalty = 0
+        self.known_preference = 0
+        self.syllable_penalty = 0
+        self.morph_weights = {}
+        self.word_weights = {}
+        self.others = []
+        for func in functions:
+            if not func.static:
+                raise ValueError('{} is not static score function'.format(func.__class__.__name__))
+            if isinstance(func, RegularizationScore):
+                self.unknown_penalty += func.unknown_penalty
+                self.known_preference += func.known_preference
+                self.syllable_penalty += func.syllable_penalty
+            elif isinstance(func, MorphemePreferenceScore):
+                self._merge(self.morph_weights, func.tag_to_morph)
+            elif isinstance(func, WordPreferenceScore):
+                self._merge(self.word_weights, func.tag_to_word)
+            else:
+                self.others.append(func)
+
+    def _merge(self, table, tag_to_morph):
+        for tag, morph_to_score in tag_to_morph.items():
+            for morph, score in morph_to_score.items():
+                key = (morph, tag)
+                table[key] = table.get(key, 0) + score
+
+    def weight(self, word):
+        value = self._weight(word.word, word.morph0, word.morph1, word.tag0, word.tag1, word.len)
+        for func in self.others:
+            value += func.score(None, word)
+        return value
+
+    def _weight(self, surface, morph0, morph1, tag0, tag1, length):
+        """Weight of compiled functions, without `others`"""
+        if tag0 == Unk:
+            value = self.unknown_penalty * (length + 0.1)
+        else:
+            value = self.known_preference * length
+        if length == 1 and tag0 == Noun:
+            value += self.syllable_penalty
+        morph_weights = self.morph_weights
+        if morph_weights:
+            value += morph_weights.get((morph0, tag0), 0)
+            if tag1 is not None:
+                value += morph_weights.get((morph1, tag1), 0)
+        if self.word_weights:
+            value += self.word_weights.get((surface, tag0), 0)
+        return value
+
+    def new_word(self, surface, morph0, morph1, tag0, tag1, length, b, e, is_l=False):
+        """
+        It creates Word with its static weight. Lookups call it instead of weighting
+        created words, so each lattice node is allocated once
+        """
+        value = self._weight(surface, morph0, morph1, tag0, tag1, length)
+        if self.others:
+            word = new_word(surface, morph0, morph1, tag0, tag1, length, b, e, is_l)
+            for func in self.others:
+                value += func.score(None, word)
+        return _tuple_new(Word, (surface, morph0, morph1, tag0, tag1, length, b, e, is_l, value))
+
+    def apply(self, words):
+        """It returns copies of words with their static weights"""
+        weight = self.weight
+        return [weighted_word(word, weight(word)) for word in words]
+
+
 class RegularizationScore(BeamScoreFunction):
+    static = True
+
     def __init__(self, unknown_penalty=-0.1, known_preference=0.2, syllable_penalty=-0.2):
         self.unknown_penalty = unknown_penalty
         self.known_preference = known_preference
@@ -72,7 +209,13 @@ class RegularizationScore(BeamScoreFunction):
             value += self.syllable_penalty
         return value
 
+    def upper_bound(self, word_k):
+        # score depends only on word_k
+        return self.score(None, word_k)
+
 class MorphemePreferenceScore(BeamScoreFunction):
+    static = True
+
     def __init__(self, tag_to_morph=None):
         if tag_to_morph is None:
             tag_to_morph = {}
@@ -87,7 +230,13 @@ class MorphemePreferenceScore(BeamScoreFunction):
             score += self.tag_to_morph.get(word_k.tag1, {}).get(word_k.morph1, 0)
         return score
 
+    def upper_bound(self, word_k):
+        # score depends only on word_k
+        return self.score(None, word_k)
+
 class WordPreferenceScore(BeamScoreFunction):
+    static = True
+
     def __init__(self, tag_to_word=None):
         if tag_to_word is None:
             tag_to_word = {}
@@ -99,15 +248,26 @@ class WordPreferenceScore(BeamScoreFunction):
     def score(self, seq, word_k):
         return self.tag_to_word.get(word_k.tag0, {}).get(word_k.word, 0)
 
+    def upper_bound(self, word_k):
+        # score depends only on word_k
+        return self.score(None, word_k)
+
 class SimpleTrigramFeatureScore(BeamScoreFunction):
-    def __init__(self, encoder=None, coefficients=None):
-        self.set_encoder(encoder, coefficients)
+    """
+    scale : float
+        Multiplier of coefficients. Quantized (int8) coefficients are stored with their scale
+    """
+
+    def __init__(self, encoder=None, coefficients=None, scale=1.0):
+        self.set_encoder(encoder, coefficients, scale)
 
-    def set_encoder(self, encoder, coefficients=None):
+    def set_encoder(self, encoder, coefficients=None, scale=1.0):
+        self.scale = scale
         if encoder is None:
             self.num_features = 0
             self.coefficients = None
             self.encoder = encoder
+            self._class_max = None
             return self
 
         if not encoder.is_trained():
@@ -122,6 +282,7 @@ class SimpleTrigramFeatureScore(BeamScoreFunction):
 
         self.coefficients = coefficients
         self.encoder = encoder
+        self._class_max = None
         return self
 
     def evaluate(self, seq):
@@ -140,5 +301,52 @@ class SimpleTrigramFeatureScore(BeamScoreFunction):
         feature_idxs = self.encoder.encode_word(word_i, word_j, word_k)
         if not feature_idxs:
             return 0
-        feature_idxs = np.asarray(feature_idxs, dtype=np.int)
-        return self.coefficients[feature_idxs].sum()
+        feature_idxs = np.asarray(feature_idxs, dtype=np.int64)
+        return self.coefficients[feature_idxs].sum(dtype=np.float64) * self.scale
+
+    def upper_bound(self, word_k):
+        """
+        Feature classes 4 and 5 depend only on word_k, so their coefficients are added exactly.
+        The other classes fire at most one feature for each, and their maximum positive
+        coefficients are added. Class 8 fires only when word_k.tag0 is contextual tag.
+        """
+        if (self.encoder is None) or not isinstance(self.encoder, SimpleTrigramEncoder):
+            return None
+        if self._class_max is None:
+            self._class_max = self._find_class_max()
+        feature_dic = self.encoder.feature_dic
+        bound = self._class_max[0]
+        if word_k.tag0 in contextual_tags:
+            bound += self._class_max[8]
+        idx = feature_dic.get((4, word_k.len))
+        if idx is not None:
+            bound += float(self.coefficients[idx]) * self.scale
+        idx = feature_dic.get((5, word_k.word, word_k.tag0, word_k.is_l))
+        if idx is not None:
+            bound += float(self.coefficients[idx]) * self.scale
+        return bound
+
+    def _find_class_max(self):
+        """
+        Returns
+        -------
+        class_max : dict
+            class_max[0] is the sum of maximum positive coefficients of classes 0, 1, 2, 3, 6, 7
+            class_max[8] is maximum positive coefficient of class 8
+        """
+        maxs = {}
+        feature_dic = self.encoder.feature_dic
+        # HashedFeatureDic of stored model keeps feature classes aligned with coefficients
+        classes = getattr(feature_dic, 'classes', None)
+        if classes is not None:
+            coefficients = np.asarray(self.coefficients, dtype=np.float64)
+            for c in np.unique(classes):
+                maxs[int(c)] = max(0, float(coefficients[classes == c].max()))
+        else:
+            for feature, idx in feature_dic.items():
+                c = feature[0]
+                maxs[c] = max(maxs.get(c, 0), float(self.coefficients[idx]))
+        return {
+            0: sum(maxs.get(c, 0) for c in (0, 1, 2, 3, 6, 7)) * self.scale,
+            8: maxs.get(8, 0) * self.scale
+        }
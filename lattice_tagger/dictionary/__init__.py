@@ -2,15 +2,33 @@ from .dictionary import BaseMorphemeDictionary
 from .dictionary import DemoMorphemeDictionary
 from .dictionary import DemoWordDictionary
 from .dictionary import Word
+from .dictionary import BOS_WORD
+from .dictionary import eos_word
+from .dictionary import unknown_word
+from .dictionary import new_word
+from .dictionary import weighted_word
 from .dictionary import WordDictionary
 from .dictionary import MorphemeDictionary
 from .dictionary import str_to_morphtag
 from .dictionary import text_to_words
 from .dictionary import flatten_words
+from .overlay import LayeredMorphs
+from .overlay import OverlayWordDictionary
+from .overlay import OverlayMorphemeDictionary
+from .overlay import overlay_dictionary
 from .lemmatizer import analyze_morphology
+from .conjugation import ConjugationTable
+from .conjugation import build_conjugation_table
+from .suffix_index import SuffixIndex
+from .suffix_index import EomiIndex
 from .lookup import sentence_lookup
+from .lookup import presegmented_lookup
+from .lookup import split_eojeols
 from .lookup import sentence_lookup_as_graph
 from .lookup import sentence_lookup_as_begin_index
 from .lookup import LRLookup
 from .lookup import WordLookup
 from .lookup import MorphemeLookup
+from .lookup import char_class
+from .lookup import split_by_char_class
+from .lookup import Hangul
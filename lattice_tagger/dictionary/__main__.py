@@ -0,0 +1,5 @@
+from .conjugation import main
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""
+Pre-computed table of conjugated surface forms
+
+`MorphemeDictionary.lemmatize` runs `analyze_morphology` for every substring looked up.
+The builder expands frequent (stem, eomi) pairs of Verb / Adjective through the inverse of
+lemmatization rules, and stores the analyses of each generated surface. The analyses are
+computed by `analyze_morphology` itself, so a table hit returns the same result as runtime
+lemmatization. Surfaces not in the table fall back to runtime lemmatization.
+
+Usage
+-----
+    >>> dictionary = BaseMorphemeDictionary()
+    >>> table = build_conjugation_table(dictionary, min_count=5)
+    >>> table['했다']
+    $ ((('하', 'Verb'), ('았다', 'Eomi')),)
+    >>> table.save('conjugations.txt')
+
+    >>> dictionary.set_conjugation_table(ConjugationTable.load('conjugations.txt'))
+    >>> dictionary.lemmatize('했다')  # one dictionary lookup
+
+Command line
+------------
+    $ python -m lattice_tagger.dictionary --output conjugations.txt --min-count 5
+"""
+
+import argparse
+from collections import defaultdict
+import zlib
+
+from .lemmatizer import analyze_morphology
+from ..tagset import *
+
+
+def dictionary_signature(dictionary):
+    """
+    crc32 of Verb, Adjective, Eomi morphemes and rules. A table is valid only for
+    the dictionary which has the same signature
+    """
+    crc = 0
+    for morphs in [dictionary.verbs, dictionary.adjectives, dictionary.eomis]:
+        crc = zlib.crc32('\n'.join(sorted(morphs)).encode('utf-8'), crc)
+        crc = zlib.crc32(b'\x00', crc)
+    rules = ['{} {} {}'.format(surface, l, r) for surface, canons in dictionary.rules.items() for l, r in canons]
+    crc = zlib.crc32('\n'.join(sorted(rules)).encode('utf-8'), crc)
+    return '{:08x}'.format(crc)
+
+def inverse_rules(rules):
+    """
+    It returns dict of stem ending to [(conjugated substring, eomi beginning), ...]
+
+        >>> inverse_rules({'했': (('하', '았'),)})
+        $ {'하': [('했', '았')]}
+    """
+    inverse = defaultdict(list)
+    for surface, canons in rules.items():
+        for stem_end, eomi_begin in canons:
+            inverse[stem_end].append((surface, eomi_begin))
+    return dict(inverse)
+
+def conjugate(stem, eomi, inverse):
+    """
+    It returns surface candidates of stem + eomi. It inverts `get_lemma_candidates`;
+    a conjugated substring of one syllable replaces the end of stem and the beginning of eomi,
+    and that of two or three syllables is followed by the rest of eomi.
+
+        >>> inverse = inverse_rules({'했': (('하', '았'),)})
+        >>> conjugate('하', '았다', inverse)
+        $ {'했다'}
+    """
+    surfaces = set()
+    # plain concatenation. Eomi beginning with jamo always conjugates
+    if eomi and not ('ㄱ' <= eomi[0] <= 'ㅎ'):
+        surfaces.add(stem + eomi)
+    for i in range(1, min(3, len(stem)) + 1):
+        stem_end = stem[-i:]
+        for surface, eomi_begin in inverse.get(stem_end, ()):
+            if not eomi.startswith(eomi_begin):
+                continue
+            rest = eomi[len(eomi_begin):]
+            if len(surface) == 3:
+                if not rest.startswith(surface[2]):
+                    continue
+                surface = surface[:2]
+            surfaces.add(stem[:-i] + surface + rest)
+    return surfaces
+
+
+class ConjugationTable:
+    """
+    Surface to analyses of conjugated predicates
+
+    Arguments
+    ---------
+    table : dict
+        surface to tuple of ((stem, tag), (eomi, Eomi))
+    signature : str
+        `dictionary_signature` of the dictionary which built the table
+    meta : dict or None
+        Build options
+    """
+
+    def __init__(self, table, signature, meta=None):
+        self.table = table
+        self.signature = signature
+        self.meta = meta if meta is not None else {}
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, surface):
+        return surface in self.table
+
+    def __getitem__(self, surface):
+        return self.table[surface]
+
+    def get(self, surface, default=None):
+        return self.table.get(surface, default)
+
+    def save(self, path):
+        """
+        Text format. The first line is header, and each line is
+        surface and its analyses such as `했다\t하/Verb+았다/Eomi`
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            meta = ' '.join('{}={}'.format(k, v) for k, v in sorted(self.meta.items()))
+            f.write('# signature={} {}\n'.format(self.signature, meta).rstrip() + '\n')
+            for surface, morphs in self.table.items():
+                analyses = ['{}/{}+{}/{}'.format(m0, t0, m1, t1) for (m0, t0), (m1, t1) in morphs]
+                f.write('{}\t{}\n'.format(surface, '\t'.join(analyses)))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            header = f.readline().split()
+            if not header or header[0] != '#':
+                raise ValueError('{} is not conjugation table file'.format(path))
+            meta = dict(column.split('=', 1) for column in header[1:])
+            signature = meta.pop('signature', None)
+            interned = {}
+            table = {}
+            for line in f:
+                columns = line.rstrip('\n').split('\t')
+                morphs = []
+                for analysis in columns[1:]:
+                    (m0, t0), (m1, t1) = (morphtag.rsplit('/', 1) for morphtag in analysis.split('+'))
+                    morphs.append(((interned.setdefault(m0, m0), interned.setdefault(t0, t0)),
+                                   (interned.setdefault(m1, m1), interned.setdefault(t1, t1))))
+                table[columns[0]] = tuple(morphs)
+        return cls(table, signature, meta)
+
+
+def expected_pairs(stem_counts, eomi_counts, min_count=5):
+    """
+    Pairs of (stem, eomi) of which expected co-occurrence count
+    count(stem) * count(eomi) / sum of eomi counts is not less than min_count
+
+    Returns
+    -------
+    pairs : list of (str, str)
+    """
+    total = sum(eomi_counts.values())
+    if total == 0:
+        return []
+    eomis = sorted(eomi_counts.items(), key=lambda x:-x[1])
+    pairs = []
+    for stem, count in stem_counts.items():
+        for eomi, eomi_count in eomis:
+            if count * eomi_count / total < min_count:
+                break
+            pairs.append((stem, eomi))
+    return pairs
+
+def build_conjugation_table(dictionary, stem_counts=None, eomi_counts=None, min_count=5,
+    surfaces=None, max_size=-1, verbose=False):
+    """
+    Arguments
+    ---------
+    dictionary : MorphemeDictionary
+    stem_counts : dict or None
+        Frequency of Verb and Adjective stems. If None, every stem has count 1
+    eomi_counts : dict or None
+        Frequency of eomis. If None, every eomi has count 1
+    min_count : float
+        Cutoff of expected count of (stem, eomi) pair. See `expected_pairs`
+    surfaces : iterable of str or None
+        Additional surface forms, for example surfaces of `base_word`
+    max_size : int
+        Maximum number of surfaces. If positive, surfaces of frequent pairs are kept first
+    verbose : Boolean
+
+    Returns
+    -------
+    table : ConjugationTable
+        Surfaces of which analyses are not empty
+    """
+    if stem_counts is None:
+        stem_counts = {stem: 1 for stem in set(dictionary.verbs) | set(dictionary.adjectives)}
+    if eomi_counts is None:
+        eomi_counts = {eomi: 1 for eomi in dictionary.eomis}
+    stem_counts = {stem: count for stem, count in stem_counts.items()
+                   if stem in dictionary.verbs or stem in dictionary.adjectives}
+    eomi_counts = {eomi: count for eomi, count in eomi_counts.items() if eomi in dictionary.eomis}
+
+    pairs = expected_pairs(stem_counts, eomi_counts, min_count)
+    if max_size > 0:
+        pairs = sorted(pairs, key=lambda pair: -stem_counts[pair[0]] * eomi_counts[pair[1]])
+    if verbose:
+        print('expanding {} (stem, eomi) pairs'.format(len(pairs)))
+
+    inverse = inverse_rules(dictionary.rules)
+    candidates = {}
+    for stem, eomi in pairs:
+        for surface in conjugate(stem, eomi, inverse):
+            candidates[surface] = None
+        if max_size > 0 and len(candidates) >= max_size:
+            break
+    if surfaces is not None:
+        for surface in surfaces:
+            candidates[surface] = None
+    if verbose:
+        print('analyzing {} surfaces'.format(len(candidates)))
+
+    table = {}
+    for surface in candidates:
+        morphs = analyze_morphology(surface, dictionary.verbs, dictionary.adjectives,
+            dictionary.eomis, dictionary.rules)
+        if morphs:
+            table[surface] = tuple(morphs)
+        if max_size > 0 and len(table) >= max_size:
+            break
+    if verbose:
+        print('built table of {} surfaces'.format(len(table)))
+
+    meta = {'min_count': min_count, 'pairs': len(pairs)}
+    return ConjugationTable(table, dictionary_signature(dictionary), meta)
+
+def load_counts(path):
+    """
+    It loads `morpheme count` lines of dictionary file. Morphemes without count have count 1
+    """
+    counts = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            columns = line.split()
+            if not columns:
+                continue
+            counts[columns[0]] = int(columns[1]) if len(columns) > 1 else 1
+    return counts
+
+def main():
+    from .dictionary import BaseMorphemeDictionary
+    from ..utils import installpath
+
+    parser = argparse.ArgumentParser(description='Build conjugated surface table of base dictionary')
+    parser.add_argument('--output', type=str, required=True, help='table file path')
+    parser.add_argument('--min-count', type=float, default=5, help='cutoff of expected (stem, eomi) count')
+    parser.add_argument('--max-size', type=int, default=-1)
+    parser.add_argument('--with-base-word', action='store_true',
+        help='also add surfaces of resources/base_word/Adjective.txt')
+    args = parser.parse_args()
+
+    directory = '%s/resources/base' % installpath
+    stem_counts = load_counts('%s/Verb.txt' % directory)
+    for stem, count in load_counts('%s/Adjective.txt' % directory).items():
+        stem_counts[stem] = stem_counts.get(stem, 0) + count
+    eomi_counts = load_counts('%s/Eomi.txt' % directory)
+    surfaces = None
+    if args.with_base_word:
+        surfaces = list(load_counts('%s/resources/base_word/Adjective.txt' % installpath))
+
+    dictionary = BaseMorphemeDictionary()
+    table = build_conjugation_table(dictionary, stem_counts, eomi_counts, args.min_count,
+        surfaces, args.max_size, verbose=True)
+    table.save(args.output)
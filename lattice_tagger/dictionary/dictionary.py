@@ -1,9 +1,14 @@
 from collections import defaultdict
 from collections import namedtuple
 from glob import glob
+from sys import intern
+import time
 
-from .lemmatizer import analyze_morphology
+from .suffix_index import EomiIndex
+from .suffix_index import SuffixIndex
+from ..instrumentation import instrumentation
 from ..utils import installpath
+from ..utils import IdentityKey
 from ..utils import left_space_tag
 from ..tagset import *
 
@@ -92,7 +97,7 @@ def text_to_words(word_text, morph_text, sent=None):
     chars, ltags = left_space_tag(sent)
 
     b = 0
-    words = [Word(BOS, BOS, None, BOS, None, 0, 0, 0, False)]
+    words = [BOS_WORD]
     for eojeols, morphs in zip(word_text, morph_text):
         for word, morph in zip(eojeols.split(), morphs.split()):
             morphtags = str_to_morphtag(morph)
@@ -108,7 +113,7 @@ def text_to_words(word_text, morph_text, sent=None):
                 raise ValueError('Word (%s) consists of three or more morphemes' % word)
             b += n
             words.append(word)
-    words.append(Word(EOS, EOS, None, EOS, None, 0, b, b, False))
+    words.append(eos_word(b))
     return words
 
 def flatten_words(words):
@@ -166,8 +171,12 @@ def flatten_words(words):
         words_.append(word1)
     return words_
 
-class Word(namedtuple('Word', 'word morph0 morph1 tag0 tag1 len b e is_l')):
+class Word(namedtuple('Word', 'word morph0 morph1 tag0 tag1 len b e is_l weight', defaults=(0,))):
     """
+    `weight` is static score of the node which depends only on the node itself.
+    Lookup attaches it when the node weights are compiled (see `StaticNodeWeights`),
+    and beam search adds it once for each expansion. Default is 0.
+
     Usage
     -----
         >>> word = Word('아이오아이', '아이오아이', None, 'Noun', None, 5, 0, 5, True)
@@ -188,6 +197,9 @@ class Word(namedtuple('Word', 'word morph0 morph1 tag0 tag1 len b e is_l')):
         $ Word(간, 가/Verb + ㄴ/Eomi, len=1, b=3, e=4)
     """
 
+    # no per-instance __dict__. Lattice allocates many Word instances for each sentence.
+    __slots__ = ()
+
     def __repr__(self):
         return self.__str__()
 
@@ -198,6 +210,57 @@ class Word(namedtuple('Word', 'word morph0 morph1 tag0 tag1 len b e is_l')):
         args = (self.word, self.morph0, self.tag0, self.len, self.b, self.e, ', L' if self.is_l else '')
         return 'Word(%s, %s/%s, len=%d, b=%d, e=%d%s)' % args
 
+# Shared constant nodes. Word is immutable, so the same instance is reused in every lattice.
+BOS_WORD = Word(BOS, BOS, None, BOS, None, 0, 0, 0, False)
+_eos_words = {}
+_max_cached_eos = 4096
+_tuple_new = tuple.__new__
+
+def eos_word(n):
+    """
+    It returns shared EOS Word which begins and ends at `n`
+
+        >>> eos_word(18)
+        $ Word(EOS, EOS/EOS, len=0, b=18, e=18)
+    """
+    word = _eos_words.get(n)
+    if word is None:
+        word = Word(EOS, EOS, None, EOS, None, 0, n, n, False)
+        if n < _max_cached_eos:
+            _eos_words[n] = word
+    return word
+
+def unknown_word(sub, b, e, weight=0):
+    """
+    Factory of unknown Word. It skips argument parsing of namedtuple constructor.
+
+        >>> unknown_word('아이', 3, 5)
+        $ Word(아이, 아이/Unknown, len=2, b=3, e=5)
+    """
+    return _tuple_new(Word, (sub, sub, None, Unk, None, e - b, b, e, False, weight))
+
+def new_word(word, morph0, morph1, tag0, tag1, length, b, e, is_l=False):
+    """
+    Factory of Word without static weight. It skips argument parsing of namedtuple constructor.
+    Lookups use it, or `StaticNodeWeights.new_word` which creates Word with its weight
+
+        >>> new_word('아이오아이', '아이오아이', None, 'Noun', None, 5, 0, 5, True)
+        $ Word(아이오아이, 아이오아이/Noun, len=5, b=0, e=5, L)
+    """
+    return _tuple_new(Word, (word, morph0, morph1, tag0, tag1, length, b, e, is_l, 0))
+
+def weighted_word(word, weight):
+    """
+    It returns copy of word with static weight. Faster than `word._replace(weight=weight)`
+
+        >>> weighted_word(word, 1.2).weight
+        $ 1.2
+    """
+    return _tuple_new(Word, (word[0], word[1], word[2], word[3], word[4], word[5], word[6], word[7], word[8], weight))
+
+
+_empty = frozenset()
+
 
 class WordDictionary:
     """
@@ -226,12 +289,28 @@ class WordDictionary:
 
     def __init__(self, tag_to_morphs):
         self.tag_to_morphs = tag_to_morphs
-
-    def lookup(self, morph, b=0, is_l=False):
+        # increased whenever morphemes are added or removed. Caches built from dictionary compare it
+        self._version = 0
+        # tag to the number of changes of the morphemes of the tag
+        self._tag_versions = {}
+        self._max_len_cache = {}
+        self._suffix_indices = {}
+
+    @property
+    def version(self):
+        return self._version
+
+    def tag_version(self, tag):
+        """Version of the morphemes of tag. Caches built from one tag compare it"""
+        return self._tag_versions.get(tag, 0)
+
+    def lookup(self, morph, b=0, is_l=False, node_weights=None):
+        """If node_weights (StaticNodeWeights) is given, words are created with their weights"""
         n = len(morph)
         e = b + n
+        make = new_word if node_weights is None else node_weights.new_word
         words = [
-            Word(morph, morph, None, tag, None, n, b, e, is_l)
+            make(morph, morph, None, tag, None, n, b, e, is_l)
             for tag in self.get_tags(morph)]
         return words
 
@@ -249,6 +328,8 @@ class WordDictionary:
         if not (tag in self.tag_to_morphs):
             self.tag_to_morphs[tag] = set(morphs)
         self.tag_to_morphs[tag].update(morphs)
+        self._version += 1
+        self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
 
     def remove_words(self, morphs, tag):
         if isinstance(morphs, str):
@@ -257,9 +338,43 @@ class WordDictionary:
             morphs = set(morphs)
         if not (tag in self.tag_to_morphs):
             raise ValueError('{} tag does not exist in dictioanry')
-        before = self.tag_to_morphs[tag]
-        before = {morph for morph in before if not (morph in morphs)}
-        self.tag_to_morphs[tag] = before
+        # in place. Overlays and the predicate sets of MorphemeDictionary refer to the set
+        self.tag_to_morphs[tag].difference_update(morphs)
+        self._version += 1
+        self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+
+    def suffix_index(self, tag):
+        """
+        SuffixIndex of morphemes of tag. It is cached until morphemes of the tag change
+
+            >>> dictionary.suffix_index(Josa).matches('아이오아이의')
+            $ [5]
+        """
+        cached = self._suffix_indices.get(tag)
+        version = self.tag_version(tag)
+        if cached is None or cached[0] != version:
+            cached = (version, SuffixIndex(self.tag_to_morphs.get(tag, ())))
+            self._suffix_indices[tag] = cached
+        return cached[1]
+
+    def max_morph_len(self, tags):
+        """
+        Length of the longest morpheme of given tags. It is cached until dictionary changes
+
+            >>> dictionary.max_morph_len([Noun, Adverb])
+            $ 6
+        """
+        key = tuple(sorted(tags))
+        cached = self._max_len_cache.get(key)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        max_len = 0
+        for tag in key:
+            morphs = self.tag_to_morphs.get(tag)
+            if morphs:
+                max_len = max(max_len, max(len(morph) for morph in morphs))
+        self._max_len_cache[key] = (self.version, max_len)
+        return max_len
 
 
 class MorphemeDictionary(WordDictionary):
@@ -297,22 +412,120 @@ class MorphemeDictionary(WordDictionary):
             rules = {}
         self.rules = rules
 
-        self.verbs = tag_to_morph.get(Verb, {})
-        self.adjectives = tag_to_morph.get(Adjective, {})
-        self.eomis = tag_to_morph.get(Eomi, {})
 
-    def lookup(self, word, b=0, is_l=False):
+        # ConjugationTable. It is used while Verb, Adjective, Eomi and rules are those when it is set
+        self.conjugations = None
+        self._conjugation_version = None
+        # results of runtime lemmatization of surfaces not in table
+        self._fallback_cache = {}
+        self.fallback_cache_size = 0
+        # ((Eomi version, id of rules), EomiIndex)
+        self._eomi_index = None
+
+    # predicate morphemes are resolved at each access, so they follow the sets of tag_to_morphs
+    @property
+    def verbs(self):
+        return self.tag_to_morphs.get(Verb, _empty)
+
+    @property
+    def adjectives(self):
+        return self.tag_to_morphs.get(Adjective, _empty)
+
+    @property
+    def eomis(self):
+        return self.tag_to_morphs.get(Eomi, _empty)
+
+    def set_conjugation_table(self, table, check_signature=True, fallback_cache_size=100000):
+        """
+        Predicate analyses of surfaces in table are answered with one lookup, and the others
+        are lemmatized at runtime. Results of the runtime fallback, including surfaces which
+        have no analysis, are cached up to `fallback_cache_size` surfaces.
+        After Verb, Adjective or Eomi morphemes are added or removed, the table and the cache
+        are not used until it is set again. Other tags do not affect them. Set None to remove the table.
+
+            >>> table = build_conjugation_table(dictionary, min_count=5)
+            >>> dictionary.set_conjugation_table(table)
+        """
+        if table is not None and check_signature:
+            from .conjugation import dictionary_signature
+            if table.signature != dictionary_signature(self):
+                raise ValueError('Conjugation table was built from different Verb, Adjective, Eomi or rules')
+        self.conjugations = table
+        self._conjugation_version = self._conjugation_state()
+        self._fallback_cache = {}
+        self.fallback_cache_size = fallback_cache_size if table is not None else 0
+        return self
+
+    def load_conjugation_table(self, path, check_signature=True, fallback_cache_size=100000):
+        """It loads table saved by `ConjugationTable.save` and sets it"""
+        from .conjugation import ConjugationTable
+        return self.set_conjugation_table(ConjugationTable.load(path), check_signature, fallback_cache_size)
+
+    def lookup(self, word, b=0, is_l=False, lemmatize=True, node_weights=None):
+        """
+        If lemmatize is False, only morphemes are looked up. Callers set it False when they
+        already know that word has no stem + eomi analysis (see `EomiIndex.max_begin`).
+        If node_weights (StaticNodeWeights) is given, words are created with their weights
+        """
         n = len(word)
         e = b + n
+        make = new_word if node_weights is None else node_weights.new_word
         words = [
-            Word(word, word, None, tag, None, n, b, e, is_l)
+            make(word, word, None, tag, None, n, b, e, is_l)
             for tag in self.get_tags(word)]
+        if not lemmatize:
+            return words
         for (m0, t0), (m1, t1) in self.lemmatize(word):
-            words.append(Word(word, m0, m1, t0, t1, n, b, e, is_l))
+            words.append(make(word, m0, m1, t0, t1, n, b, e, is_l))
         return words
 
     def lemmatize(self, word):
-        return analyze_morphology(word, self.verbs, self.adjectives, self.eomis, self.rules)
+        table = self.conjugations
+        if table is None or self._conjugation_version != self._conjugation_state():
+            return self._lemmatize(word)
+
+        morphs = table.table.get(word)
+        if morphs is None:
+            morphs = self._fallback_cache.get(word)
+        if morphs is not None:
+            if instrumentation.enabled:
+                instrumentation.incr('conjugation_table_hits')
+            return list(morphs)
+
+        morphs = self._lemmatize(word)
+        if self.fallback_cache_size > 0:
+            if len(self._fallback_cache) >= self.fallback_cache_size:
+                self._fallback_cache.clear()
+            self._fallback_cache[word] = tuple(morphs)
+        return morphs
+
+    def _conjugation_state(self):
+        """Versions of everything which lemmatization depends on"""
+        return (self.tag_version(Verb), self.tag_version(Adjective), self.tag_version(Eomi),
+            IdentityKey(self.rules))
+
+    def eomi_index(self):
+        """EomiIndex of Eomi and rules. It is cached until Eomi or rules change"""
+        cached = self._eomi_index
+        version = (self.tag_version(Eomi), IdentityKey(self.rules))
+        if cached is None or cached[0] != version:
+            cached = (version, EomiIndex(self.eomis, self.rules))
+            self._eomi_index = cached
+        return cached[1]
+
+    def _lemmatize(self, word):
+        if not instrumentation.enabled:
+            # words of which no suffix can be an eomi are not analyzed
+            if not self.eomi_index()(word):
+                return []
+            return self.eomi_index().analyze(word, self.verbs, self.adjectives)
+        t = time.perf_counter()
+        if not self.eomi_index()(word):
+            morphs = []
+        else:
+            morphs = self.eomi_index().analyze(word, self.verbs, self.adjectives)
+        instrumentation.add_time('lemmatization', time.perf_counter() - t)
+        return morphs
 
 
 class DemoWordDictionary(WordDictionary):
@@ -347,13 +560,15 @@ class BaseMorphemeDictionary(MorphemeDictionary):
         super().__init__(tag_to_morphs, rules)
 
 def load_dictionary(directory):
+    # morphemes and tags are interned, so dictionary lookups and feature lookups
+    # with them compare strings by identity
     def load(path):
         with open(path, encoding='utf-8') as f:
-            words = {word.split()[0] for word in f}
+            words = {intern(word.split()[0]) for word in f}
         return words
 
     def parse_tag(path):
-        return path.split('/')[-1][:-4]
+        return intern(path.split('/')[-1][:-4])
 
     paths = glob('%s/*.txt' % directory)
     tag_to_morphs = {parse_tag(path):load(path) for path in paths}
@@ -372,7 +587,7 @@ def load_rules(path):
             if len(columns) != 3:
                 print('Exception (%d line) : %s' % (i, line))
                 continue
-            surface, l, r = columns
+            surface, l, r = map(intern, columns)
             rules[surface].add((l, r))
     rules = {surface:tuple(canons) for surface, canons in rules.items()}
     return rules
@@ -1,16 +1,23 @@
 from collections import namedtuple
-from lattice_tagger.dictionary import Word
+import unicodedata
+from lattice_tagger.dictionary import BOS_WORD
+from lattice_tagger.dictionary import eos_word
 from lattice_tagger.dictionary import flatten_words
+from lattice_tagger.dictionary import new_word
 from lattice_tagger.tagset import *
 
 
-def sentence_lookup(sent, eojeol_lookup):
+def sentence_lookup(sent, eojeol_lookup, presegment=True):
     """
     Arguments
     ---------
     sent : str
         String type sentence
     eojeol_lookup : Lookup function
+    presegment : Boolean
+        If True, eojeols are split into character class runs first.
+        Only Hangul runs are looked up in dictionary, and the other runs become
+        a single node of which tag is character class (Number, Foreign, Punctuation or Symbol)
 
     Returns
     -------
@@ -47,56 +54,175 @@ def sentence_lookup(sent, eojeol_lookup):
            Word(노래, 노래/Noun, len=2, b=13, e=15, L),
            Word(입니다, 이/Adjective + ㅂ니다/Eomi, len=3, b=15, e=18),
            Word(EOS, EOS/EOS, len=0, b=18, e=18)]
+
+        >>> sentence_lookup('우와!노래를 1000번', eojeol_lookup)
+        $ [Word(BOS, BOS/BOS, len=0, b=0, e=0),
+           Word(우와, 우와/Exclamation, len=2, b=0, e=2, L),
+           Word(!, !/Punctuation, len=1, b=2, e=3),
+           Word(노래, 노래/Noun, len=2, b=3, e=5),
+           Word(를, 를/Josa, len=1, b=5, e=6),
+           Word(1000, 1000/Number, len=4, b=6, e=10, L),
+           Word(EOS, EOS/EOS, len=0, b=11, e=11)]
     """
 
     n = len(sent.replace(' ', ''))
-    BOS_word = Word(BOS, BOS, None, BOS, None, 0, 0, 0, False)
-    EOS_word = Word(EOS, EOS, None, EOS, None, 0, n, n, False)
 
     offset = 0
-    nodes = [BOS_word]
-    for eojeol in sent.split():
-        nodes += eojeol_lookup(eojeol, offset)
+    nodes = [BOS_WORD]
+    for eojeol in split_eojeols(sent):
+        if presegment:
+            nodes += presegmented_lookup(eojeol, eojeol_lookup, offset)
+        else:
+            nodes += eojeol_lookup(eojeol, offset)
         offset += len(eojeol)
-    nodes.append(EOS_word)
+    nodes.append(eos_word(n))
     return nodes
 
 
+def split_eojeols(sent):
+    """
+    It splits sent by ' ' and drops empty pieces, consistent with `sent.replace(' ', '')`.
+    Other white spaces such as tab and newline are characters of eojeol
+
+        >>> split_eojeols('노래\t입니다  아이오아이')
+        $ ['노래\t입니다', '아이오아이']
+    """
+    return [eojeol for eojeol in sent.split(' ') if eojeol]
+
+def presegmented_lookup(eojeol, eojeol_lookup, offset=0):
+    """
+    Only Hangul runs of eojeol are looked up with eojeol_lookup.
+    The other character class runs are returned as a single node.
+
+        >>> presegmented_lookup('우와!노래를', eojeol_lookup)
+        $ [Word(우와, 우와/Exclamation, len=2, b=0, e=2, L),
+           Word(!, !/Punctuation, len=1, b=2, e=3),
+           Word(노래, 노래/Noun, len=2, b=3, e=5),
+           Word(를, 를/Josa, len=1, b=5, e=6)]
+    """
+    runs = split_by_char_class(eojeol)
+    if len(runs) == 1 and runs[0][1] == Hangul:
+        return eojeol_lookup(eojeol, offset)
+
+    nodes = []
+    for sub, cls, b in runs:
+        if cls == Hangul:
+            words = eojeol_lookup(sub, offset + b)
+            # sub is not the first part of eojeol
+            if b > 0:
+                words = [word._replace(is_l=False) if word.is_l else word for word in words]
+            nodes += words
+        else:
+            n = len(sub)
+            node_weights = getattr(eojeol_lookup, 'node_weights', None)
+            make = new_word if node_weights is None else node_weights.new_word
+            nodes.append(make(sub, sub, None, cls, None, n, offset + b, offset + b + n, b == 0))
+    return nodes
+
+def split_by_char_class(eojeol):
+    """
+        >>> split_by_char_class('우와!노래를1000번')
+        $ [('우와', 'Hangul', 0), ('!', 'Punctuation', 2), ('노래를', 'Hangul', 3),
+           ('1000', 'Number', 6), ('번', 'Hangul', 10)]
+    """
+    runs = []
+    b = 0
+    prev = None
+    for i, c in enumerate(eojeol):
+        cls = char_class(c)
+        if cls != prev:
+            if prev is not None:
+                runs.append((eojeol[b:i], prev, b))
+            b = i
+            prev = cls
+    if prev is not None:
+        runs.append((eojeol[b:], prev, b))
+    return runs
+
+# character class of non-tag string
+Hangul = 'Hangul'
+_char_class_cache = {}
+
+def char_class(c):
+    """
+    It returns character class of a character; one of Hangul, Number, Foreign, Punctuation and Symbol.
+    Hangul includes complete syllables and jamo.
+
+        >>> [char_class(c) for c in '아ㅋ3a!♥']
+        $ ['Hangul', 'Hangul', 'Number', 'Foreign', 'Punctuation', 'Symbol']
+    """
+    cls = _char_class_cache.get(c)
+    if cls is not None:
+        return cls
+    if ('가' <= c <= '힣') or ('ㄱ' <= c <= 'ㅣ') or ('ᄀ' <= c <= 'ᇿ'):
+        cls = Hangul
+    elif c.isdigit():
+        cls = Number
+    elif c.isalpha():
+        cls = Foreign
+    elif unicodedata.category(c)[0] == 'P':
+        cls = Punctuation
+    else:
+        cls = Symbol
+    _char_class_cache[c] = cls
+    return cls
+
 class EojeolLookup:
+    # StaticNodeWeights. If not None, words are returned with their static weights
+    node_weights = None
+
     def __init__(self, flatten=False):
         self.flatten = flatten
 
     def __call__(self, eojeol, offset=0):
-        return self.lookup(eojeol, offset)
+        words = self.lookup(eojeol, offset)
+        if self.node_weights is not None:
+            words = self.node_weights.apply(words)
+        return words
 
     def lookup(self, eojeol, offset):
-        raise NotImplemented
+        raise NotImplementedError
 
-class LRLookup(EojeolLookup):
-    def __init__(self, dictionary, prefer_exact_match=True, flatten=False):
-        self.dictionary = dictionary
-        self.prefer_exact_match = prefer_exact_match
-        self.flatten = flatten
+class DictionaryLookup(EojeolLookup):
+    """
+    Lookup of which words are created with their static weights, so that each lattice node
+    is allocated once. Subclasses implement `_lookup(eojeol, offset, node_weights)`.
+    Flattened words are new objects, thus they are weighted after flattening
+    """
+
+    def __call__(self, eojeol, offset=0):
+        if self.flatten:
+            return super().__call__(eojeol, offset)
+        return self._lookup(eojeol, offset, self.node_weights)
 
     def lookup(self, eojeol, offset=0):
-        words = lr_lookup(eojeol, self.dictionary, offset, self.prefer_exact_match)
+        words = self._lookup(eojeol, offset, None)
         if self.flatten:
             words = flatten_words(words)
         return words
 
-class WordLookup(EojeolLookup):
+    def _lookup(self, eojeol, offset, node_weights):
+        raise NotImplementedError
+
+class LRLookup(DictionaryLookup):
     def __init__(self, dictionary, prefer_exact_match=True, flatten=False):
         self.dictionary = dictionary
         self.prefer_exact_match = prefer_exact_match
         self.flatten = flatten
 
-    def lookup(self, eojeol, offset=0):
-        words = word_lookup(eojeol, self.dictionary, offset, self.prefer_exact_match)
-        if self.flatten:
-            words = flatten_words(words)
-        return words
+    def _lookup(self, eojeol, offset, node_weights):
+        return lr_lookup(eojeol, self.dictionary, offset, self.prefer_exact_match, node_weights)
+
+class WordLookup(DictionaryLookup):
+    def __init__(self, dictionary, prefer_exact_match=True, flatten=False):
+        self.dictionary = dictionary
+        self.prefer_exact_match = prefer_exact_match
+        self.flatten = flatten
+
+    def _lookup(self, eojeol, offset, node_weights):
+        return word_lookup(eojeol, self.dictionary, offset, self.prefer_exact_match, node_weights)
 
-class MorphemeLookup(EojeolLookup):
+class MorphemeLookup(DictionaryLookup):
     def __init__(self, dictionary, prefer_exact_match=True, standalones=None, max_len=-1, flatten=False):
         if not hasattr(dictionary, 'rules'):
             raise ValueError('dictionary must be MorphemeDictionary')
@@ -107,31 +233,29 @@ class MorphemeLookup(EojeolLookup):
         self.dictionary = dictionary
         self.prefer_exact_match = prefer_exact_match
         self.standalones = standalones
+        # if max_len is not given, it follows the changes of dictionary
+        self.fixed_max_len = max_len > 0
         if max_len <= 0:
             self.max_len = self._find_max_len(dictionary, standalones)
         else:
             self.max_len = max_len
+        self._version = dictionary.version
         self.flatten = flatten
 
-    def lookup(self, eojeol, offset=0):
-        words = morpheme_lookup(eojeol, self.dictionary, offset,
-            self.prefer_exact_match, self.standalones, self.max_len)
-        if self.flatten:
-            words = flatten_words(words)
-        return words
+    def _lookup(self, eojeol, offset, node_weights):
+        if (not self.fixed_max_len) and (self._version != self.dictionary.version):
+            self.max_len = self._find_max_len(self.dictionary, self.standalones)
+            self._version = self.dictionary.version
+        return morpheme_lookup(eojeol, self.dictionary, offset,
+            self.prefer_exact_match, self.standalones, self.max_len, node_weights)
 
     def _find_max_len(self, dictionary, standalones):
         standalones_ = set(standalones)
         standalones_.add(Verb)
         standalones_.add(Adjective)
-        max_len = 0
-        for tag, morphs in dictionary.tag_to_morphs.items():
-            if not tag in standalones_:
-                continue
-            max_len = max(max_len, max(len(morph) for morph in morphs))
-        return max_len
-
-def word_lookup(eojeol, dictionary, offset=0, prefer_exact_match=True):
+        return dictionary.max_morph_len(standalones_)
+
+def word_lookup(eojeol, dictionary, offset=0, prefer_exact_match=True, node_weights=None):
     """
     >>> from lattice_tagger.utils import DemoMorphemeDictionary
     >>> dictionary = DemoMorphemeDictionary()
@@ -156,7 +280,7 @@ def word_lookup(eojeol, dictionary, offset=0, prefer_exact_match=True):
        Word(이, 이/Josa, len=1, b=4, e=5)]
     """
 
-    words = dictionary.lookup(eojeol, offset, is_l=True)
+    words = dictionary.lookup(eojeol, offset, is_l=True, node_weights=node_weights)
     if prefer_exact_match and words:
         return words
 
@@ -165,10 +289,10 @@ def word_lookup(eojeol, dictionary, offset=0, prefer_exact_match=True):
         is_l = (b == 0)
         for e in range(b+1, n+1):
             sub = eojeol[b:e]
-            words += dictionary.lookup(sub, offset + b, is_l)
+            words += dictionary.lookup(sub, offset + b, is_l, node_weights=node_weights)
     return words
 
-def lr_lookup(eojeol, dictionary, offset=0, prefer_exact_match=True):
+def lr_lookup(eojeol, dictionary, offset=0, prefer_exact_match=True, node_weights=None):
     """
     >>> from lattice_tagger.utils import DemoMorphemeDictionary
     >>> dictionary = DemoMorphemeDictionary()
@@ -188,28 +312,42 @@ def lr_lookup(eojeol, dictionary, offset=0, prefer_exact_match=True):
     $ [Word(아이오아이의, 아이오아이/Noun + 의/Josa, len=6, b=0, e=6, L)]
     """
 
-    words = dictionary.lookup(eojeol, offset, is_l=True)
+    words = dictionary.lookup(eojeol, offset, is_l=True, node_weights=node_weights)
     if prefer_exact_match and words:
         return words
 
+    make = new_word if node_weights is None else node_weights.new_word
     n = len(eojeol)
     e = offset + n
+    # begin indices of Josa suffixes, and the largest begin index of suffixes which may be
+    # stem + eomi. Both are found in right-to-left walks over suffix indices
+    josa_begins = set(dictionary.suffix_index(Josa).matches(eojeol, min_begin=1))
+    is_morpheme_dictionary = hasattr(dictionary, 'eomi_index')
+    if is_morpheme_dictionary:
+        eomi_begin = dictionary.eomi_index().max_begin(eojeol)
     for i in range(1, n):
         # special case : Noun + Josa
         l, r = eojeol[:i], eojeol[i:]
-        if dictionary.check(l, Noun) and dictionary.check(r, Josa):
-            words.append(Word(l, l, None, Noun, None, n, offset, offset + i, is_l=True))
-            words.append(Word(r, r, None, Josa, None, n, offset + i, offset + n, is_l=False))
+        if (i in josa_begins) and dictionary.check(l, Noun):
+            words.append(make(l, l, None, Noun, None, n, offset, offset + i, True))
+            words.append(make(r, r, None, Josa, None, n, offset + i, offset + n, False))
+            continue
+        # right part first. Left part is looked up only if right part exists
+        if is_morpheme_dictionary:
+            rset = dictionary.lookup(r, offset + i, False, i <= eomi_begin, node_weights)
+        else:
+            rset = dictionary.lookup(r, offset + i, is_l=False, node_weights=node_weights)
+        if not rset:
             continue
-        lset = dictionary.lookup(eojeol[:i], offset, is_l=True)
-        rset = dictionary.lookup(eojeol[i:], offset + i, is_l=False)
-        if not lset or not rset:
+        lset = dictionary.lookup(l, offset, is_l=True, node_weights=node_weights)
+        if not lset:
             continue
         words += lset
         words += rset
     return words
 
-def morpheme_lookup(eojeol, dictionary, offset=0, prefer_exact_match=True, standalones=None, max_len=-1):
+def morpheme_lookup(eojeol, dictionary, offset=0, prefer_exact_match=True, standalones=None, max_len=-1,
+    node_weights=None):
     """
     >>> word_lookup('아이오아이', dictionary)
     $ [Word(아이오아이, 아이오아이/Noun, len=5, b=0, e=5, L)]
@@ -232,7 +370,8 @@ def morpheme_lookup(eojeol, dictionary, offset=0, prefer_exact_match=True, stand
         max_len = n
 
     # eojeol exact match
-    words = lr_lookup(eojeol, dictionary, offset, prefer_exact_match=False)
+    words = lr_lookup(eojeol, dictionary, offset, False, node_weights)
+    make = new_word if node_weights is None else node_weights.new_word
 
     if prefer_exact_match and words:
         return words
@@ -244,16 +383,13 @@ def morpheme_lookup(eojeol, dictionary, offset=0, prefer_exact_match=True, stand
         # Noun + Josa, Adjective / Verb + Eomi
         standalones = [Noun, Adverb, Exclamation, Determiner, Number]
 
-    # check L + R
-    for i in range(1, n):
+    # check L + R. Josa suffixes are found in one right-to-left walk,
+    # and only their left parts are checked
+    for i in reversed(dictionary.suffix_index(Josa).matches(eojeol, min_begin=1)):
         l, r = eojeol[:i], eojeol[i:]
-        if dictionary.check(l, Noun) and dictionary.check(r, Josa):
-            words.append(Word(l, l, None, Noun, None, i, offset, offset + i, True))
-            words.append(Word(r, r, None, Josa, None, i, offset + i, offset + n, False))
-            continue
-        if dictionary.check(l, Noun) and dictionary.check(r, Josa):
-            words.append(Word(l, l, None, Noun, None, i, offset, offset + i, True))
-            words.append(Word(r, r, None, Josa, None, i, offset + i, offset + n, False))
+        if dictionary.check(l, Noun):
+            words.append(make(l, l, None, Noun, None, i, offset, offset + i, True))
+            words.append(make(r, r, None, Josa, None, i, offset + i, offset + n, False))
 
     # check loop
     for b in range(1, n):
@@ -264,21 +400,21 @@ def morpheme_lookup(eojeol, dictionary, offset=0, prefer_exact_match=True, stand
             # Check stand-alone tags
             for tag in standalones:
                 if dictionary.check(sub, tag):
-                    words.append(Word(sub, sub, None, tag, None, e-b, offset + b, offset + e, is_l))
+                    words.append(make(sub, sub, None, tag, None, e-b, offset + b, offset + e, is_l))
                     if tag == Noun:
                         noun_end[e] = 1
 
             # Check Noun + Josa
             if noun_end[b] > 0 and dictionary.check(sub, Josa):
-                words.append(Word(sub, sub, None, Josa, None, e-b, offset + b, offset + e, is_l))
+                words.append(make(sub, sub, None, Josa, None, e-b, offset + b, offset + e, is_l))
 
             # Check predicators
             for (m0, t0), (m1, t1) in dictionary.lemmatize(sub):
-                words.append(Word(sub, m0, m1, t0, t1, e-b, offset + b, offset + e, is_l))
+                words.append(make(sub, m0, m1, t0, t1, e-b, offset + b, offset + e, is_l))
 
     return words
 
-def sentence_lookup_as_graph(sent, eojeol_lookup):
+def sentence_lookup_as_graph(sent, eojeol_lookup, presegment=True):
     """
     Arguments
     ---------
@@ -322,7 +458,7 @@ def sentence_lookup_as_graph(sent, eojeol_lookup):
         return -1
 
     n = len(sent.replace(' ',''))
-    words, bindex = sentence_lookup_as_begin_index(sent, eojeol_lookup)
+    words, bindex = sentence_lookup_as_begin_index(sent, eojeol_lookup, presegment)
 
     BOS_word = words[0]
     EOS_word = words[-1]
@@ -341,7 +477,7 @@ def sentence_lookup_as_graph(sent, eojeol_lookup):
 
     return words, edges # (words, edges)
 
-def sentence_lookup_as_begin_index(sent, eojeol_lookup):
+def sentence_lookup_as_begin_index(sent, eojeol_lookup, presegment=True):
     """
         >>> eojeol_lookup = WordLookup(dictionary)
         >>> words, bindex = sentence_lookup_as_begin_index('공연을했다', eojeol_lookup)
@@ -356,7 +492,7 @@ def sentence_lookup_as_begin_index(sent, eojeol_lookup):
     """
 
     n = len(sent.replace(' ',''))
-    words = sentence_lookup(sent, eojeol_lookup)
+    words = sentence_lookup(sent, eojeol_lookup, presegment)
 
     # if there exist no word in dictionary
     if len(words) <= 2:
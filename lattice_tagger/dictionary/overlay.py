@@ -0,0 +1,193 @@
+from .dictionary import WordDictionary
+from .dictionary import MorphemeDictionary
+from ..tagset import Eomi
+
+
+class LayeredMorphs:
+    """
+    Copy-on-write set view of `(base | added) - removed`.
+    The base set is never modified, and membership test checks layers in one pass.
+
+        >>> morphs = LayeredMorphs({'아이', '노래'})
+        >>> morphs.update({'아이오아이'})
+        >>> morphs.difference_update({'노래'})
+        >>> '아이오아이' in morphs, '노래' in morphs, '아이' in morphs
+        $ (True, False, True)
+    """
+
+    __slots__ = ('base', 'added', 'removed')
+
+    def __init__(self, base, added=None, removed=None):
+        self.base = base
+        self.added = set() if added is None else added
+        self.removed = set() if removed is None else removed
+
+    def __contains__(self, morph):
+        if morph in self.added:
+            return True
+        return (morph in self.base) and not (morph in self.removed)
+
+    def __iter__(self):
+        added = self.added
+        removed = self.removed
+        yield from added
+        for morph in self.base:
+            if not (morph in removed or morph in added):
+                yield morph
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __bool__(self):
+        # removed is a subset of base
+        return bool(self.added) or len(self.base) > len(self.removed)
+
+    def update(self, morphs):
+        self.added.update(morphs)
+        self.removed.difference_update(morphs)
+
+    def difference_update(self, morphs):
+        self.added.difference_update(morphs)
+        self.removed.update(morph for morph in morphs if morph in self.base)
+
+    def max_len(self):
+        return max((len(morph) for morph in self.added), default=0)
+
+
+class _OverlayMixin:
+
+    def _init_layers(self, base):
+        self.base = base
+        self._layer_version = 0
+        self._layer_tag_versions = {}
+        self._max_len_cache = {}
+        return {tag:LayeredMorphs(morphs) for tag, morphs in base.tag_to_morphs.items()}
+
+    @property
+    def version(self):
+        # changes of base (shared) layer are also visible to this layer. Layers refer to the sets
+        # of base, which base modifies in place. Tags created in base after this layer are not visible
+        return (self.base.version, self._layer_version)
+
+    def tag_version(self, tag):
+        return (self.base.tag_version(tag), self._layer_tag_versions.get(tag, 0))
+
+    def _layer_touches(self, tag):
+        """True if this layer has added or removed morphemes of tag"""
+        morphs = self.tag_to_morphs.get(tag)
+        if morphs is None:
+            return False
+        return bool(morphs.added) or bool(morphs.removed) or not (tag in self.base.tag_to_morphs)
+
+    def suffix_index(self, tag):
+        """SuffixIndex of base dictionary is shared while this layer does not change the tag"""
+        if not self._layer_touches(tag):
+            return self.base.suffix_index(tag)
+        return super().suffix_index(tag)
+
+    def add(self, morphs, tag, force=False):
+        if isinstance(morphs, str):
+            morphs = {morphs}
+        if (not force) and not (tag in self.tag_to_morphs):
+            raise ValueError('{} tag does not exist in dictionary'.format(tag))
+        if not (tag in self.tag_to_morphs):
+            self.tag_to_morphs[tag] = LayeredMorphs(frozenset())
+        self.tag_to_morphs[tag].update(morphs)
+        self._layer_version += 1
+        self._layer_tag_versions[tag] = self._layer_tag_versions.get(tag, 0) + 1
+
+    def remove_words(self, morphs, tag):
+        if isinstance(morphs, str):
+            morphs = {morphs}
+        if not (tag in self.tag_to_morphs):
+            raise ValueError('{} tag does not exist in dictionary'.format(tag))
+        self.tag_to_morphs[tag].difference_update(set(morphs))
+        self._layer_version += 1
+        self._layer_tag_versions[tag] = self._layer_tag_versions.get(tag, 0) + 1
+
+    def max_morph_len(self, tags):
+        """
+        Maximum of cached base value and the longest added morpheme of this layer.
+        Removed morphemes are ignored, so it is an upper bound.
+        """
+        key = tuple(sorted(tags))
+        cached = self._max_len_cache.get(key)
+        if cached is None or cached[0] != self._layer_version:
+            layer_len = 0
+            for tag in key:
+                morphs = self.tag_to_morphs.get(tag)
+                if morphs is not None:
+                    layer_len = max(layer_len, morphs.max_len())
+            cached = (self._layer_version, layer_len)
+            self._max_len_cache[key] = cached
+        return max(self.base.max_morph_len(key), cached[1])
+
+    def added_morphs(self):
+        return {tag:set(morphs.added) for tag, morphs in self.tag_to_morphs.items() if morphs.added}
+
+    def removed_morphs(self):
+        return {tag:set(morphs.removed) for tag, morphs in self.tag_to_morphs.items() if morphs.removed}
+
+
+class OverlayWordDictionary(_OverlayMixin, WordDictionary):
+    """
+    Per-user layer of added and removed words over shared WordDictionary.
+    See `overlay_dictionary`
+    """
+
+    def __init__(self, base):
+        WordDictionary.__init__(self, self._init_layers(base))
+
+
+class OverlayMorphemeDictionary(_OverlayMixin, MorphemeDictionary):
+    """
+    Per-user layer of added and removed morphemes over shared MorphemeDictionary.
+    It shares lemmatization rules of base dictionary. See `overlay_dictionary`
+    """
+
+    def __init__(self, base):
+        MorphemeDictionary.__init__(self, self._init_layers(base), base.rules)
+        # conjugation table of base is valid until Verb, Adjective, Eomi of either base or this layer change
+        if base.conjugations is not None and base._conjugation_version == base._conjugation_state():
+            self.conjugations = base.conjugations
+            self._conjugation_version = self._conjugation_state()
+
+    def eomi_index(self):
+        """EomiIndex of base dictionary is shared while this layer does not change Eomi or rules"""
+        if not self._layer_touches(Eomi) and self.rules is self.base.rules:
+            return self.base.eomi_index()
+        return super().eomi_index()
+
+
+def overlay_dictionary(base):
+    """
+    Creates copy-on-write dictionary over base dictionary.
+    Adding or removing morphemes changes only the overlay, and base dictionary is shared
+    with other overlays. Overlay can be stacked over another overlay.
+
+    Arguments
+    ---------
+    base : WordDictionary or MorphemeDictionary
+
+    Returns
+    -------
+    overlay : OverlayWordDictionary or OverlayMorphemeDictionary
+
+    Usage
+    -----
+        >>> base = BaseMorphemeDictionary()
+        >>> tenant_a = overlay_dictionary(base)
+        >>> tenant_a.add({'아이오아이', '너무너무너무'}, Noun, force=True)
+        >>> tenant_a.check('아이오아이', Noun), base.check('아이오아이', Noun)
+        $ (True, False)
+
+        >>> tenant_b = overlay_dictionary(base)
+        >>> tenant_b.remove_words('하', Verb)
+        >>> tenant_b.check('하', Verb), base.check('하', Verb)
+        $ (False, True)
+
+        >>> tagger = Tagger(tenant_a, score_funcs=funcs)
+    """
+    if isinstance(base, MorphemeDictionary):
+        return OverlayMorphemeDictionary(base)
+    return OverlayWordDictionary(base)
@@ -0,0 +1,231 @@
+"""
+Right-to-left suffix index of morphemes
+
+Josa and Eomi are attached at the end of eojeol. A trie of reversed morphemes enumerates
+every morpheme which is a suffix of an eojeol in one right-to-left walk, instead of
+probing a set with each suffix.
+
+Usage
+-----
+    >>> index = SuffixIndex({'는', '은', '이는', '의'})
+    >>> index.matches('아이는')
+    $ [2, 1]    # '는' = eojeol[2:], '이는' = eojeol[1:]
+"""
+
+from ..tagset import Adjective, Verb, Eomi
+
+
+# key of terminal mark in trie node. Morphemes are not empty, so no character equals it
+_END = ''
+
+
+class SuffixIndex:
+    """
+    Trie of reversed morphemes
+
+    Arguments
+    ---------
+    morphs : iterable of str
+    """
+
+    def __init__(self, morphs):
+        root = {}
+        num_morphs = 0
+        for morph in morphs:
+            if not morph:
+                continue
+            node = root
+            for c in reversed(morph):
+                child = node.get(c)
+                if child is None:
+                    child = {}
+                    node[c] = child
+                node = child
+            if _END not in node:
+                node[_END] = True
+                num_morphs += 1
+        self.root = root
+        self.num_morphs = num_morphs
+
+    def __len__(self):
+        return self.num_morphs
+
+    def matches(self, text, end=None, min_begin=0):
+        """
+        Returns
+        -------
+        begins : list of int
+            Begin indices b (min_begin <= b < end) such that text[b:end] is a morpheme,
+            in descending order (shorter suffix first)
+        """
+        if end is None:
+            end = len(text)
+        node = self.root
+        begins = []
+        for b in range(end - 1, min_begin - 1, -1):
+            node = node.get(text[b])
+            if node is None:
+                break
+            if _END in node:
+                begins.append(b)
+        return begins
+
+    def node(self, suffix):
+        """
+        It returns trie node of morphemes which end with suffix, or None if there is no such morpheme
+        """
+        return self.extend(self.root, suffix)
+
+    def extend(self, node, prefix):
+        """
+        From trie node of morphemes ending with s, it returns that of morphemes ending with
+        prefix + s, or None
+        """
+        for i in range(len(prefix) - 1, -1, -1):
+            node = node.get(prefix[i])
+            if node is None:
+                return None
+        return node
+
+    def is_terminal(self, node):
+        return (node is not None) and (_END in node)
+
+
+class EomiIndex:
+    """
+    Suffix index of Eomi combined with lemmatization rules.
+
+    `analyze` returns the same list with `analyze_morphology`. Candidate eomis of
+    `get_lemma_candidates` are suffixes of word, or rule eomi + suffix. They are checked
+    in one right-to-left walk over the suffix index, and only the (stem, eomi) candidates of
+    which eomi exists are generated and checked with Verb / Adjective dictionary.
+
+    Arguments
+    ---------
+    eomis : iterable of str
+    rules : dict of tuple
+        Lemmatization rules
+
+    Usage
+    -----
+        >>> eomi_index = EomiIndex({'았다', '다'}, {'했': (('하', '았'),)})
+        >>> eomi_index.analyze('노래했다', verbs={'노래하'}, adjectives={})
+        $ [(('노래하', 'Verb'), ('았다', 'Eomi'))]
+        >>> eomi_index.max_begin('노래했다'), eomi_index.max_begin('노래')
+        $ (2, -1)
+    """
+
+    def __init__(self, eomis, rules):
+        self.index = SuffixIndex(eomis)
+        self.rules = rules
+        # conjugated substring to eomi beginnings
+        self.eomi_begins = {}
+        for surface, canons in rules.items():
+            self.eomi_begins[surface] = tuple({eomi_begin for _, eomi_begin in canons})
+        # conjugated substring to ((stem ending, eomi beginning, reversed eomi beginning), ...)
+        self.reversed_rules = {
+            surface: tuple((stem, eomi, eomi[::-1]) for stem, eomi in canons)
+            for surface, canons in rules.items() if canons}
+
+    def _walk(self, word):
+        """
+        nodes[d] is the trie node of eomis ending with word[n-d:]. The walk stops
+        at the first depth which no eomi ends with
+        """
+        node = self.index.root
+        nodes = [node]
+        for i in range(len(word) - 1, 0, -1):
+            node = node.get(word[i])
+            if node is None:
+                break
+            nodes.append(node)
+        return nodes
+
+    def max_begin(self, word):
+        """
+        Returns
+        -------
+        begin : int
+            The largest i such that word[i:] may be analyzed into stem + eomi, or -1.
+            Every longer suffix word[j:] (j < i) also may be analyzed, so one walk
+            from the end of eojeol filters all of its suffixes
+        """
+        n = len(word)
+        index = self.index
+        eomi_begins = self.eomi_begins
+        # depth d : rest = word[n-d:]. Candidate eomis are rest (plain split at n-d-1),
+        # begin + rest (one syllable conjugation at n-d-1) and begin + rest
+        # (two or three syllables conjugation at n-d-2)
+        for d, node in enumerate(self._walk(word)):
+            i = n - d - 1
+            if d > 0 and _END in node:
+                return i
+            for begin in eomi_begins.get(word[i], ()):
+                if index.is_terminal(index.extend(node, begin)):
+                    return i
+            i -= 1
+            if i >= 0:
+                for conj in {word[i:i+2], word[i:i+3]}:
+                    for begin in eomi_begins.get(conj, ()):
+                        if index.is_terminal(index.extend(node, begin)):
+                            return i
+        return -1
+
+    def __call__(self, word):
+        return self.max_begin(word) >= 0
+
+    def analyze(self, word, verbs, adjectives):
+        """
+        Same with `analyze_morphology(word, verbs, adjectives, eomis, rules)`,
+        including the order and duplicates of analyses
+        """
+        n = len(word)
+        nodes = self._walk(word)
+        num_nodes = len(nodes)
+        reversed_rules = self.reversed_rules
+
+        # candidates in the order of get_lemma_candidates
+        candidates = []
+        for i in range(max(0, n - num_nodes - 1), n):
+            d = n - i - 1
+            if d < num_nodes:
+                node = nodes[d]
+                # plain split
+                if d > 0 and _END in node:
+                    candidates.append((word[:i+1], word[i+1:]))
+                # one syllable conjugation. get_lemma_candidates repeats the rules of c
+                canons = reversed_rules.get(word[i])
+                if canons is not None:
+                    valid = [(word[:i] + stem, eomi + word[i+1:])
+                             for stem, eomi, reversed_eomi in canons
+                             if _ends_with(node, reversed_eomi)]
+                    if valid:
+                        candidates += valid * len(canons)
+            # two or three syllables conjugation. At the last syllable, the set has only one syllable
+            if d > num_nodes:
+                continue
+            node = nodes[max(0, d - 1)]
+            for conj in {word[i:i+2], word[i:i+3]}:
+                canons = reversed_rules.get(conj)
+                if canons is None:
+                    continue
+                for stem, eomi, reversed_eomi in canons:
+                    if _ends_with(node, reversed_eomi):
+                        candidates.append((word[:i] + stem, eomi + word[i+2:]))
+
+        morphs = []
+        for stem, eomi in candidates:
+            if stem in adjectives:
+                morphs.append(((stem, Adjective), (eomi, Eomi)))
+            if stem in verbs:
+                morphs.append(((stem, Verb), (eomi, Eomi)))
+        return morphs
+
+
+def _ends_with(node, reversed_prefix):
+    """It returns True if prefix + (suffix of node) is a morpheme"""
+    for c in reversed_prefix:
+        node = node.get(c)
+        if node is None:
+            return False
+    return _END in node
@@ -0,0 +1,290 @@
+"""
+Accuracy and speed evaluation on held-out data
+
+    $ python -m lattice_tagger.evaluation --data ../data/test.txt --workers 4 --beam-size 5
+    $ python -m lattice_tagger.evaluation --data ../data/test.txt --model model_int8/ --output report.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .dictionary import text_to_words
+from .dictionary import flatten_words
+from .tagset import BOS, EOS
+
+
+def pair_to_sentence(word_text):
+    """
+        >>> pair_to_sentence('너무너무너무 는  아이오아이 의  노래  입니다')
+        $ '너무너무너무는 아이오아이의 노래 입니다'
+    """
+    return ' '.join(eojeol.replace(' ', '') for eojeol in word_text.split('  '))
+
+def to_morphemes(words):
+    """
+    It returns set of (b, e, morph, tag) of flatten words except BOS and EOS
+    """
+    return {(w.b, w.e, w.morph0, w.tag0) for w in flatten_words(words) if not (w.tag0 == BOS or w.tag0 == EOS)}
+
+def eojeol_spans(sent):
+    """
+        >>> eojeol_spans('너무너무너무는 아이오아이의 노래')
+        $ [(0, 7), (7, 13), (13, 15)]
+    """
+    spans = []
+    b = 0
+    for eojeol in sent.split():
+        spans.append((b, b + len(eojeol)))
+        b += len(eojeol)
+    return spans
+
+class AccuracyCounter:
+    """
+    Morpheme-level precision, recall, F1 and eojeol accuracy
+
+        >>> counter = AccuracyCounter()
+        >>> counter.add(sent, gold_words, pred_words)
+        >>> counter.scores()
+        $ {'precision': 0.93, 'recall': 0.91, 'f1': 0.92, 'eojeol_accuracy': 0.87, 'num_sents': 100}
+    """
+
+    def __init__(self):
+        self.num_sents = 0
+        self.num_gold = 0
+        self.num_pred = 0
+        self.num_correct = 0
+        self.num_eojeols = 0
+        self.num_correct_eojeols = 0
+
+    def add(self, sent, gold_words, pred_words):
+        gold = to_morphemes(gold_words)
+        pred = to_morphemes(pred_words)
+        self.num_sents += 1
+        self.num_gold += len(gold)
+        self.num_pred += len(pred)
+        self.num_correct += len(gold & pred)
+        for b, e in eojeol_spans(sent):
+            gold_e = {m for m in gold if b <= m[0] < e}
+            pred_e = {m for m in pred if b <= m[0] < e}
+            self.num_eojeols += 1
+            self.num_correct_eojeols += int(gold_e == pred_e)
+        return self
+
+    def merge(self, other):
+        for attr in ['num_sents', 'num_gold', 'num_pred', 'num_correct', 'num_eojeols', 'num_correct_eojeols']:
+            setattr(self, attr, getattr(self, attr) + getattr(other, attr))
+        return self
+
+    def scores(self):
+        precision = self.num_correct / self.num_pred if self.num_pred > 0 else 0
+        recall = self.num_correct / self.num_gold if self.num_gold > 0 else 0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0
+        eojeol_accuracy = self.num_correct_eojeols / self.num_eojeols if self.num_eojeols > 0 else 0
+        return {
+            'precision': precision,
+            'recall': recall,
+            'f1': f1,
+            'eojeol_accuracy': eojeol_accuracy,
+            'num_sents': self.num_sents
+        }
+
+def percentile(values, p):
+    """
+    Linear interpolated percentile
+
+        >>> percentile([1, 2, 3, 4], 50)
+        $ 2.5
+    """
+    if not values:
+        return 0
+    values = sorted(values)
+    position = (len(values) - 1) * p / 100
+    b = int(position)
+    e = min(b + 1, len(values) - 1)
+    return values[b] + (values[e] - values[b]) * (position - b)
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size in MB of current process (or its terminated children)"""
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    if sys.platform == 'darwin':
+        return peak / (1024 ** 2)
+    return peak / 1024
+
+def evaluate_pairs(tagger, word_morph_pairs, beam_size=5):
+    """
+    Returns
+    -------
+    counter : AccuracyCounter
+    latencies : list of float
+        Tagging time (seconds) of each sentence
+    """
+    counter = AccuracyCounter()
+    latencies = []
+    for word_text, morph_text in word_morph_pairs:
+        try:
+            gold = text_to_words(word_text, morph_text)
+        except ValueError:
+            continue
+        sent = pair_to_sentence(word_text)
+        t = time.perf_counter()
+        pred = tagger.tag(sent, beam_size=beam_size).sequences
+        latencies.append(time.perf_counter() - t)
+        counter.add(sent, gold, pred)
+    return counter, latencies
+
+def evaluate(tagger, word_morph_pairs, beam_size=5):
+    """
+    Arguments
+    ---------
+    tagger : Tagger
+    word_morph_pairs : iterable of (word_text, morph_text)
+        For example, WordMorphemePairs
+
+    Returns
+    -------
+    scores : dict
+        precision, recall, f1, eojeol_accuracy and num_sents
+
+    Usage
+    -----
+        >>> evaluate(tagger, WordMorphemePairs('../data/test.txt'))
+    """
+    counter, _ = evaluate_pairs(tagger, word_morph_pairs, beam_size)
+    return counter.scores()
+
+# tagger of worker process
+_worker_tagger = None
+
+def _init_worker(tagger_factory):
+    global _worker_tagger
+    _worker_tagger = tagger_factory()
+
+def _evaluate_chunk(chunk, beam_size):
+    # chunk is list of pairs, or (reader, begin, end) for random access reader
+    if isinstance(chunk, tuple):
+        reader, begin, end = chunk
+        chunk = reader.iter_range(begin, end)
+    t = time.perf_counter()
+    counter, latencies = evaluate_pairs(_worker_tagger, chunk, beam_size)
+    return counter, latencies, time.perf_counter() - t, peak_rss_mb(), os.getpid()
+
+def _chunks(word_morph_pairs, num_chunks, chunk_size):
+    if hasattr(word_morph_pairs, 'shard_ranges'):
+        # IndexedWordMorphemePairs; workers read their ranges from file
+        for begin, end in word_morph_pairs.shard_ranges(num_chunks):
+            if end > begin:
+                yield (word_morph_pairs, begin, end)
+        return
+    chunk = []
+    for pair in word_morph_pairs:
+        chunk.append(pair)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def evaluate_parallel(tagger_factory, word_morph_pairs, num_workers=2, beam_size=5, chunk_size=200):
+    """
+    Tags gold data in worker processes, and reports accuracy and speed together
+
+    Arguments
+    ---------
+    tagger_factory : callable
+        Picklable function which returns Tagger. It is called once in each worker process
+    word_morph_pairs : iterable of (word_text, morph_text)
+        WordMorphemePairs or IndexedWordMorphemePairs. The latter is split into
+        byte-balanced ranges which workers read by themselves
+    num_workers : int
+    beam_size : int
+    chunk_size : int
+        Number of pairs sent to a worker at once
+
+    Returns
+    -------
+    report : dict
+        precision, recall, f1, eojeol_accuracy, num_sents,
+        sents_per_sec (wall time including worker startup), worker_sents_per_sec (tagging time only),
+        p50_ms, p99_ms (tagging latency of a sentence), peak_rss_mb (max of workers), main_peak_rss_mb
+
+    Usage
+    -----
+        >>> evaluate_parallel(default_tagger_factory, IndexedWordMorphemePairs('../data/test.txt'), num_workers=4)
+        $ {'precision': 0.93, 'recall': 0.91, 'f1': 0.92, 'eojeol_accuracy': 0.87, 'num_sents': 10000,
+           'sents_per_sec': 812.3, 'worker_sents_per_sec': 231.0, 'p50_ms': 3.9, 'p99_ms': 11.2, ...}
+    """
+    t = time.perf_counter()
+    counter = AccuracyCounter()
+    latencies = []
+    busy = 0
+    peaks = {}
+    with ProcessPoolExecutor(num_workers, initializer=_init_worker, initargs=(tagger_factory,)) as executor:
+        futures = [executor.submit(_evaluate_chunk, chunk, beam_size)
+                   for chunk in _chunks(word_morph_pairs, num_workers * 4, chunk_size)]
+        for future in futures:
+            counter_, latencies_, busy_, peak, pid = future.result()
+            counter.merge(counter_)
+            latencies += latencies_
+            busy += busy_
+            peaks[pid] = max(peaks.get(pid, 0), peak)
+    elapsed = time.perf_counter() - t
+
+    report = counter.scores()
+    report.update({
+        'num_workers': num_workers,
+        'beam_size': beam_size,
+        'elapsed_sec': elapsed,
+        'sents_per_sec': len(latencies) / elapsed if elapsed > 0 else 0,
+        'worker_sents_per_sec': len(latencies) / busy if busy > 0 else 0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'peak_rss_mb': max(peaks.values()) if peaks else 0,
+        'main_peak_rss_mb': peak_rss_mb()
+    })
+    return report
+
+class TaggerFactory:
+    """
+    Picklable factory of Tagger with base dictionary, regularization and optional stored model
+    """
+
+    def __init__(self, model_path=None):
+        self.model_path = model_path
+
+    def __call__(self):
+        from .beam import BeamScoreFunctions
+        from .beam import RegularizationScore
+        from .tagger import Tagger
+        funcs = [RegularizationScore()]
+        if self.model_path is not None:
+            from .features import load_model
+            funcs.append(load_model(self.model_path).score_function())
+        return Tagger('base', score_funcs=BeamScoreFunctions(*funcs))
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate tagging accuracy and speed on gold data')
+    parser.add_argument('--data', type=str, required=True, help='word-morpheme pairs file')
+    parser.add_argument('--model', type=str, default=None, help='model directory of save_model')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--beam-size', type=int, default=5)
+    parser.add_argument('--num-sents', type=int, default=-1)
+    parser.add_argument('--output', type=str, default=None, help='JSON file path to save report')
+    args = parser.parse_args()
+
+    from .utils import IndexedWordMorphemePairs
+    pairs = IndexedWordMorphemePairs(args.data, num_sents=args.num_sents)
+    report = evaluate_parallel(TaggerFactory(args.model), pairs, args.workers, args.beam_size)
+    for key, value in report.items():
+        print('{:<22} {}'.format(key, round(value, 4) if isinstance(value, float) else value))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,34 @@
+import importlib
+
 from .feature import WordsEncoder
 from .feature import SimpleTrigramEncoder
 from .utils import scan_dictionary
 from .utils import scan_features
+from .template import FeatureTemplate
+from .template import compile_templates
+
+# model files, compaction and Na features are imported at the first access
+_lazy_attributes = {
+    'feature_hash': ('model', 'feature_hash'),
+    'HashedFeatureDic': ('model', 'HashedFeatureDic'),
+    'TrainedModel': ('model', 'TrainedModel'),
+    'save_model': ('model', 'save_model'),
+    'load_model': ('model', 'load_model'),
+    'quantize_coefficients': ('model', 'quantize_coefficients'),
+    'prune_features': ('compaction', 'prune_features'),
+    'compact_model': ('compaction', 'compact_model'),
+    'compaction_report': ('compaction', 'compaction_report'),
+    'morph_to_feature_na': ('na', 'morph_to_feature'),
+    'NaFeatureTransformer': ('na', 'NaFeatureTransformer'),
+}
+
+def __getattr__(name):
+    if name in _lazy_attributes:
+        module_name, attr = _lazy_attributes[name]
+        value = getattr(importlib.import_module('.' + module_name, __name__), attr)
+        globals()[name] = value
+        return value
+    raise AttributeError('module {} has no attribute {}'.format(__name__, name))
 
-#from .na import morph_to_feature as morph_to_feature_na
-#from .na import NaFeatureTransformer
\ No newline at end of file
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes))
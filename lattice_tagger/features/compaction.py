@@ -0,0 +1,130 @@
+"""
+Post-training compaction of trained model: sparsity pruning and coefficient quantization
+"""
+
+from ..utils import LazyModule
+from .model import TrainedModel
+from .model import quantize_coefficients
+
+# numpy is imported at the first use
+np = LazyModule('numpy')
+
+
+def prune_features(classes, coefficients, threshold=0.0, topk_per_class=None):
+    """
+    Arguments
+    ---------
+    classes : numpy.ndarray
+        Feature class of each feature
+    coefficients : numpy.ndarray
+        Coefficient of each feature
+    threshold : float
+        Features of which |coefficient| <= threshold are removed
+    topk_per_class : int or None
+        If not None, only top-k features of largest |coefficient| are kept for each feature class
+
+    Returns
+    -------
+    mask : numpy.ndarray of bool
+        True if the feature is kept
+    """
+    weights = np.abs(np.asarray(coefficients, dtype=np.float64))
+    mask = weights > threshold
+    if topk_per_class is not None:
+        for c in np.unique(classes):
+            idxs = np.where((classes == c) & mask)[0]
+            if len(idxs) <= topk_per_class:
+                continue
+            drop = idxs[np.argsort(-weights[idxs], kind='stable')[topk_per_class:]]
+            mask[drop] = False
+    return mask
+
+def compact_model(model, threshold=0.0, topk_per_class=None, dtype=None):
+    """
+    Arguments
+    ---------
+    model : TrainedModel
+    threshold : float
+        Features of which |coefficient| <= threshold are removed
+    topk_per_class : int or None
+        Number of features kept for each feature class
+    dtype : str or None
+        Quantization dtype of coefficients. None keeps the dtype of model
+
+    Returns
+    -------
+    compacted : TrainedModel
+        In-memory model. Save it with `compacted.save(path)`
+
+    Usage
+    -----
+        >>> model = load_model('model/')
+        >>> compacted = compact_model(model, threshold=0.001, dtype='int8')
+        >>> report = compaction_report(model, compacted, held_out_pairs, dictionary)
+        >>> compacted.save('model_int8/')
+    """
+    coefficients = np.asarray(model.coefficients, dtype=np.float64) * model.scale
+    mask = prune_features(model.classes, coefficients, threshold, topk_per_class)
+    keys = np.asarray(model.keys)[mask]
+    classes = np.asarray(model.classes)[mask]
+    coefficients = coefficients[mask]
+    if dtype is None:
+        dtype = str(model.coefficients.dtype)
+    coefficients, scale = quantize_coefficients(coefficients, dtype)
+
+    meta = dict(model.meta)
+    meta['num_features'] = int(len(keys))
+    meta['coefficient_dtype'] = str(coefficients.dtype)
+    meta['scale'] = scale
+    meta['compaction'] = {
+        'threshold': threshold,
+        'topk_per_class': topk_per_class,
+        'num_features_before': int(len(model))
+    }
+    return TrainedModel(keys, classes, coefficients, meta)
+
+def compaction_report(model, compacted, word_morph_pairs, dictionary, regularization=None, beam_size=5):
+    """
+    Evaluates two models on held-out data and reports size and accuracy delta
+
+    Arguments
+    ---------
+    model : TrainedModel
+        Original model
+    compacted : TrainedModel
+        Model returned by `compact_model`
+    word_morph_pairs : list of (word_text, morph_text)
+        Held-out data. It is iterated twice
+    dictionary : MorphemeDictionary
+    regularization : BeamScoreFunction or None
+        Score function used with trigram feature score. Default is RegularizationScore()
+
+    Returns
+    -------
+    report : dict
+    """
+    from ..beam import BeamScoreFunctions
+    from ..beam import RegularizationScore
+    from ..evaluation import evaluate
+    from ..tagger import Tagger
+
+    if regularization is None:
+        regularization = RegularizationScore()
+
+    def run(model_):
+        funcs = BeamScoreFunctions(regularization, model_.score_function())
+        tagger = Tagger(dictionary, score_funcs=funcs)
+        return evaluate(tagger, word_morph_pairs, beam_size)
+
+    def nbytes(model_):
+        return int(model_.keys.nbytes + model_.classes.nbytes + model_.coefficients.nbytes)
+
+    before = run(model)
+    after = run(compacted)
+    return {
+        'num_features': (len(model), len(compacted)),
+        'nbytes': (nbytes(model), nbytes(compacted)),
+        'before': before,
+        'after': after,
+        'delta': {key:after[key] - before[key] for key in ['precision', 'recall', 'f1', 'eojeol_accuracy']}
+    }
@@ -1,6 +1,12 @@
 from ..tagset import *
+from ..dictionary import Word
+from .template import FeatureTemplate
+from .template import compile_templates
 
 
+# tags of contextual feature (class 8) of trigram_encoder
+contextual_tags = frozenset({Noun, Adverb, Adjective, Verb})
+
 class WordsEncoder:
     def __init__(self, feature_dic=None):
         self.feature_dic = feature_dic
@@ -50,17 +56,15 @@ class SimpleTrigramEncoder(WordsEncoder):
     def encode_sequence(self, words):
         if not self.is_trained():
             raise ValueError('Insert feature_dic first')
-        feature_seq = self.transform_sequence(words)
-        idx_seq = [[self.feature_dic[f] for f in features] for features in feature_seq]
-        return idx_seq
+        words_ = [None] + words
+        encode = trigram_templates.encode
+        return [encode(self.feature_dic, word_i, word_j, word_k)
+                for word_i, word_j, word_k in zip(words_, words, words[1:-1])]
 
     def encode_word(self, word_i, word_j, word_k):
-        features = self.transform_word(word_i, word_j, word_k)
-        idxs = [self.feature_dic[f] for f in features]
-        return idxs
+        return trigram_templates.encode(self.feature_dic, word_i, word_j, word_k)
 
     def transform_sequence(self, words):
-        n = len(words) - 2 # include BOS, EOS
         words_ = [None] + words
         feature_seq = []
         for word_i, word_j, word_k in zip(words_, words, words[1:-1]):
@@ -68,54 +72,58 @@ class SimpleTrigramEncoder(WordsEncoder):
         return feature_seq
 
     def transform_word(self, word_i, word_j, word_k):
-        features = trigram_encoder(word_i, word_j, word_k)
+        features = trigram_templates.transform(word_i, word_j, word_k)
         if self.is_trained():
             features = self._filter(features)
         return features
 
-def trigram_encoder(word_i, word_j, word_k):
-    """
-    trigram : (wi, ti), (wj, tj), (wk, tk)
-    current positiion : k
-
-    0 : (wj, wk, tk) # disambiguate wk with tk (이/Josa, 이/Adjective)
-    1 : (wj, tk)
-    2 : (tj, wk, tk)
-    3 : (tj, tk)
-    4 : (len(wk))
-    5 : (wk morph, tk, wk is L-part of eojeol)
-    6 : unknown length between (wj, wk)
-    7 : (wi, wj, wk)
-    8 : (wi or wj, wk) if all ti, tj, tk in {Noun, Adjective, Adverb, Verb} # contextual feature
-    """
-
-    contextual_tags = {Noun, Adverb, Adjective, Verb}
-
+"""
+trigram : (wi, ti), (wj, tj), (wk, tk)
+current positiion : k
+
+0 : (wj, wk, tk) # disambiguate wk with tk (이/Josa, 이/Adjective)
+1 : (wj, tk)
+2 : (tj, wk, tk)
+3 : (tj, tk)
+4 : (len(wk))
+5 : (wk morph, tk, wk is L-part of eojeol)
+6 : unknown length between (wj, wk)
+7 : (wi, wj, wk)
+8 : (wi or wj, wk) if all ti, tj, tk in {Noun, Adjective, Adverb, Verb} # contextual feature
+"""
+trigram_feature_templates = [
     # bigram feature
-    features = [
-        (0, word_j.word, word_k.word, word_k.tag0),
-        (1, word_j.word, word_k.tag0),
-        (2, word_j.tag0, word_k.word, word_k.tag0),
-        (3, word_j.tag0, word_k.tag0),
-        (4, word_k.len)
-    ]
-
+    FeatureTemplate(0, 'j.word', 'k.word', 'k.tag0'),
+    FeatureTemplate(1, 'j.word', 'k.tag0'),
+    FeatureTemplate(2, 'j.tag0', 'k.word', 'k.tag0'),
+    FeatureTemplate(3, 'j.tag0', 'k.tag0'),
+    FeatureTemplate(4, 'k.len'),
     # unigram, word is L feature
-    features.append((5, word_k.word, word_k.tag0, word_k.is_l))
-
+    FeatureTemplate(5, 'k.word', 'k.tag0', 'k.is_l'),
     # unknown length feature
-    if word_j.tag0 == Unk:
-        features.append((6, min(8, word_j.len)))
-
+    FeatureTemplate(6, 'min(8, j.len)', when='j.tag0 == Unk'),
     # trigram feature
-    if word_i is not None:
-        features.append((7, word_i.word, word_j.word, word_k.word))
-
+    FeatureTemplate(7, 'i.word', 'j.word', 'k.word', when='i is not None'),
     # contextual feature
-    if word_k.tag0 in contextual_tags:
-        if word_j.tag0 in contextual_tags:
-            features.append((8, word_j.morph0, word_k.morph0))
-        elif (word_i is not None) and (word_i.tag0 in contextual_tags):
-            features.append((8, word_i.morph0, word_k.morph0))
+    FeatureTemplate(8, 'j.morph0', 'k.morph0',
+        when='k.tag0 in contextual_tags and j.tag0 in contextual_tags'),
+    FeatureTemplate(8, 'i.morph0', 'k.morph0',
+        when='k.tag0 in contextual_tags and not (j.tag0 in contextual_tags) '
+             'and i is not None and i.tag0 in contextual_tags')
+]
+
+trigram_templates = compile_templates(
+    trigram_feature_templates,
+    args={'i': Word._fields, 'j': Word._fields, 'k': Word._fields},
+    namespace={'Unk': Unk, 'contextual_tags': contextual_tags},
+    name='trigram'
+)
 
-    return features
+def trigram_encoder(word_i, word_j, word_k):
+    """
+    It returns features of word_k. See `trigram_feature_templates`
+
+        >>> trigram_encoder(word_i, word_j, word_k)
+        $ [(0, '는', '아이오아이', 'Noun'), (1, '는', 'Noun'), (2, 'Josa', '아이오아이', 'Noun'), ...]
+    """
+    return trigram_templates.transform(word_i, word_j, word_k)
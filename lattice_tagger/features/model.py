@@ -0,0 +1,243 @@
+"""
+Compact model file of trained parameters
+
+A model is a directory of aligned NumPy arrays and a metadata file.
+
+    model/
+        keys.npy            # uint64, sorted hash value of features
+        classes.npy         # int16, feature class (the first element of feature tuple)
+        coefficients.npy    # float, coefficient of features
+        meta.json           # format version, encoder name, hash function, etc
+
+Arrays are sorted by the hash value of features, so the index of a feature is found by
+binary search. Arrays are opened with mmap, thus opening a model does not depend on the
+number of features, and worker processes share the same pages of OS page cache.
+"""
+
+import hashlib
+import json
+import os
+
+from ..utils import LazyModule
+
+# numpy is imported at the first use
+np = LazyModule('numpy')
+
+
+format_version = 1
+hash_name = 'blake2b-64'
+
+
+def feature_hash(feature):
+    """
+    Process-independent 64 bit hash value of a feature tuple.
+    Built-in hash() of str is randomized for each process, so it cannot be stored.
+
+        >>> feature_hash((3, 'Noun', 'Josa'))
+        $ 16326113455946049282
+    """
+    digest = hashlib.blake2b(repr(feature).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+class HashedFeatureDic:
+    """
+    Read-only feature to index mapping over sorted hash array.
+    It supports `in`, `[]`, `get` and `len` which `WordsEncoder` uses for `feature_dic`.
+    Looked-up features are memorized in a bounded cache, since the working set of features
+    in traffic is much smaller than the number of features in model.
+
+        >>> feature_dic = HashedFeatureDic(keys, classes)
+        >>> (3, 'Noun', 'Josa') in feature_dic
+        $ True
+        >>> feature_dic[(3, 'Noun', 'Josa')]
+        $ 1738
+    """
+
+    def __init__(self, keys, classes=None, max_cache_size=1000000):
+        self.keys = keys
+        self.classes = classes
+        self.max_cache_size = max_cache_size
+        self._cache = {}
+        self._n = len(keys)
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, feature):
+        return self._find(feature) >= 0
+
+    def __getitem__(self, feature):
+        idx = self._find(feature)
+        if idx < 0:
+            raise KeyError(feature)
+        return idx
+
+    def get(self, feature, default=None):
+        idx = self._find(feature)
+        return default if idx < 0 else idx
+
+    def _find(self, feature):
+        idx = self._cache.get(feature)
+        if idx is not None:
+            return idx
+        key = np.uint64(feature_hash(feature))
+        i = int(np.searchsorted(self.keys, key))
+        idx = i if (i < self._n and self.keys[i] == key) else -1
+        if len(self._cache) >= self.max_cache_size:
+            self._cache.clear()
+        self._cache[feature] = idx
+        return idx
+
+
+class TrainedModel:
+    """
+    Usage
+    -----
+        >>> params = train(word_morph_pairs, dictionary, encoder, score_func, regularity_func)
+        >>> save_model('model/', params['idx_to_feature'], params['coefficient'])
+
+        >>> model = load_model('model/')
+        >>> encoder = model.encoder()
+        >>> score_func = model.score_function()
+        >>> funcs = BeamScoreFunctions(RegularizationScore(), score_func)
+    """
+
+    def __init__(self, keys, classes, coefficients, meta):
+        self.keys = keys
+        self.classes = classes
+        self.coefficients = coefficients
+        self.meta = meta
+        self.feature_dic = HashedFeatureDic(keys, classes)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def scale(self):
+        return self.meta.get('scale', 1.0)
+
+    def encoder(self):
+        from .feature import SimpleTrigramEncoder
+        if self.meta.get('encoder', 'SimpleTrigramEncoder') != 'SimpleTrigramEncoder':
+            raise ValueError('Model is trained with {} encoder'.format(self.meta['encoder']))
+        return SimpleTrigramEncoder(self.feature_dic)
+
+    def score_function(self, encoder=None):
+        from ..beam import SimpleTrigramFeatureScore
+        if encoder is None:
+            encoder = self.encoder()
+        return SimpleTrigramFeatureScore(encoder, self.coefficients, self.scale)
+
+    def save(self, path):
+        write_arrays(path, self.keys, self.classes, self.coefficients, self.meta)
+
+
+def save_model(path, idx_to_feature, coefficients, encoder='SimpleTrigramEncoder', dtype=None):
+    """
+    Arguments
+    ---------
+    path : str
+        Model directory path. It is created if not exists
+    idx_to_feature : list of tuple
+        Feature list. `train` returns it as params['idx_to_feature']
+    coefficients : list or numpy.ndarray
+        Coefficients aligned with idx_to_feature
+    encoder : str
+        Encoder class name
+    dtype : str or None
+        Coefficient dtype; one of 'float64', 'float32', 'float16' and 'int8'.
+        int8 coefficients are stored with scale. Default is float64
+
+    Returns
+    -------
+    feature_to_idx : dict
+        Mapping of feature to index in saved model. Features are re-ordered by their hash values
+    """
+    if len(idx_to_feature) != len(coefficients):
+        raise ValueError('idx_to_feature and coefficients have different length')
+
+    keys = np.fromiter((feature_hash(f) for f in idx_to_feature), dtype=np.uint64, count=len(idx_to_feature))
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    if len(keys) > 1 and (keys[1:] == keys[:-1]).any():
+        raise ValueError('Hash collision exists between features')
+
+    classes = np.asarray([f[0] for f in idx_to_feature], dtype=np.int16)[order]
+    coefficients, scale = quantize_coefficients(np.asarray(coefficients)[order], dtype or 'float64')
+
+    meta = {
+        'format_version': format_version,
+        'hash': hash_name,
+        'encoder': encoder,
+        'num_features': int(len(keys)),
+        'coefficient_dtype': str(coefficients.dtype),
+        'scale': scale
+    }
+    write_arrays(path, keys, classes, coefficients, meta)
+    return {idx_to_feature[i]:idx for idx, i in enumerate(order)}
+
+def quantize_coefficients(coefficients, dtype='int8'):
+    """
+    Arguments
+    ---------
+    coefficients : numpy.ndarray
+    dtype : str
+        One of 'float64', 'float32', 'float16' and 'int8'
+
+    Returns
+    -------
+    quantized : numpy.ndarray
+    scale : float
+        coefficients ~= quantized * scale
+
+    Usage
+    -----
+        >>> quantize_coefficients(np.asarray([0.5, -1.27, 0.01]), 'int8')
+        $ (array([  50, -127,    1], dtype=int8), 0.01)
+    """
+    coefficients = np.asarray(coefficients, dtype=np.float64)
+    if dtype in ('float64', 'float32', 'float16'):
+        return coefficients.astype(dtype), 1.0
+    if dtype != 'int8':
+        raise ValueError('Unsupported dtype {}'.format(dtype))
+    max_abs = float(np.abs(coefficients).max()) if len(coefficients) > 0 else 0
+    scale = max_abs / 127 if max_abs > 0 else 1.0
+    quantized = np.clip(np.round(coefficients / scale), -127, 127).astype(np.int8)
+    return quantized, scale
+
+def write_arrays(path, keys, classes, coefficients, meta):
+    os.makedirs(path, exist_ok=True)
+    np.save('%s/keys.npy' % path, keys)
+    np.save('%s/classes.npy' % path, classes)
+    np.save('%s/coefficients.npy' % path, coefficients)
+    with open('%s/meta.json' % path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+def load_model(path, mmap=True):
+    """
+    Arguments
+    ---------
+    path : str
+        Model directory path
+    mmap : Boolean
+        If True, arrays are memory-mapped in read-only mode
+
+    Returns
+    -------
+    model : TrainedModel
+    """
+    with open('%s/meta.json' % path, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format_version', 0) > format_version:
+        raise ValueError('Model format version {} is not supported'.format(meta['format_version']))
+    if meta.get('hash') != hash_name:
+        raise ValueError('Unknown feature hash function {}'.format(meta.get('hash')))
+
+    mmap_mode = 'r' if mmap else None
+    keys = np.load('%s/keys.npy' % path, mmap_mode=mmap_mode)
+    classes = np.load('%s/classes.npy' % path, mmap_mode=mmap_mode)
+    coefficients = np.load('%s/coefficients.npy' % path, mmap_mode=mmap_mode)
+    if not (len(keys) == len(classes) == len(coefficients)):
+        raise ValueError('Arrays of model have different length')
+    return TrainedModel(keys, classes, coefficients, meta)
@@ -4,38 +4,84 @@ Seoung-Hoon Na, Chang-Hyun Kim, and Young-Kil Kim (2014)
 """
 
 from collections import namedtuple
-from lattice_tagger.utils import text_to_words
+from lattice_tagger.dictionary import text_to_words
 from .feature import WordsEncoder
+from .template import FeatureTemplate
+from .template import compile_templates
 
 
 class NaFeatureTransformer(WordsEncoder):
-    def encode(self, words):
-        morphs, morph_features = self._to_morph_features(words)
-        features = []
-        n = len(words)
-        for i in range(1, n):
-            features_ = first_order_feature(
-                morph_features[i-1],
-                morph_features[i]
-            )
-            features_ += second_order_feature(
-                morph_features[i-1],
-                morph_features[i],
-                morph_features[i+1]
-            )
-            features.append(features_)
-        return morphs[1:-1], features
-
-    def _to_morph_features(self, words):
+    """
+    Morpheme-level first and second order features of Na et al. (2014).
+    The features of a morpheme use its previous and next morphemes, so they are generated
+    when the word which contains the next morpheme is appended.
+
+        >>> words = text_to_words('너무너무너무/Noun 는/Josa  아이오아이/Noun 의/Josa')
+        >>> transformer = NaFeatureTransformer()
+        >>> transformer.transform_sequence(words)
+        $ [[(0, 'Noun', 6), (1, 'Noun', 3, 6), ...], ...]
+
+        >>> transformer.set_feature_dic(feature_to_idx)
+        >>> transformer.encode_word(word_i, word_j, word_k)
+        $ [3, 57, 1021, ...]
+    """
+
+    def __init__(self, feature_dic=None):
+        self.feature_dic = feature_dic
+
+    def encode_sequence(self, words):
+        if not self.is_trained():
+            raise ValueError('Insert feature_dic first')
+        words_ = [None] + words
+        return [self.encode_word(word_i, word_j, word_k)
+                for word_i, word_j, word_k in zip(words_, words, words[1:])]
+
+    def encode_word(self, word_i, word_j, word_k):
+        encode = na_templates.encode
+        feature_dic = self.feature_dic
+        idxs = []
+        for fi, fj, fk in self._windows(word_i, word_j, word_k):
+            idxs += encode(feature_dic, fi, fj, fk)
+        return idxs
+
+    def transform_sequence(self, words):
+        """
+        It returns features of each word except BOS. Features of the last morpheme
+        of a word are included in those of the next word.
+        """
+        words_ = [None] + words
+        return [self.transform_word(word_i, word_j, word_k)
+                for word_i, word_j, word_k in zip(words_, words, words[1:])]
+
+    def transform_word(self, word_i, word_j, word_k):
+        transform = na_templates.transform
         features = []
-        morphs = []
-        for word in words:
-            features.append(morph_to_feature(word, is_L=True))
-            morphs.append((word.morph0, word.tag0))
-            if word.tag1 is not None:
-                features.append(morph_to_feature(word, is_L=False))
-                morphs.append((word.morph1, word.tag1))
-        return morphs, features
+        for fi, fj, fk in self._windows(word_i, word_j, word_k):
+            features += transform(fi, fj, fk)
+        if self.is_trained():
+            features = self._filter(features)
+        return features
+
+    def _windows(self, word_i, word_j, word_k):
+        """
+        (previous, current, next) morpheme features of which next morpheme belongs to word_k.
+        Current morphemes are the last morpheme of word_j and the morphemes of word_k except the last.
+        """
+        morphs = word_to_features(word_k)
+        morphs_j = word_to_features(word_j)
+        if len(morphs_j) == 2:
+            prev = morphs_j[0]
+        elif word_i is not None:
+            prev = word_to_features(word_i)[-1]
+        else:
+            # word_j is BOS
+            prev = None
+        windows = []
+        if prev is not None:
+            windows.append((prev, morphs_j[-1], morphs[0]))
+        if len(morphs) == 2:
+            windows.append((morphs_j[-1], morphs[0], morphs[1]))
+        return windows
 
 
 class Feature(namedtuple('Feature', 'ls rs lo ro w t n n_ w_')):
@@ -68,14 +114,14 @@ def morph_to_feature(word, is_L=True):
 
     Usage
     -----
-        >>> from lattice_tagger.utils import Word
-        >>> from lattice_tagger.feature import morph_to_feature_na
+        >>> from lattice_tagger.dictionary import Word
+        >>> from lattice_tagger.features import morph_to_feature_na
         >>> word = Word('입니다', '이', 'ㅂ니다', 'Adjective', 'Eomi', 3)
         >>> morph_to_feature_na(word, is_L=True)
         >>> morph_to_feature_na(word, is_L=False)
 
         $ (ls=True, rs=False, lo=True, ro=False, w=입, t=Adjective, n=1, n_=4, w_=이)
-        $ (ls=False, rs=True, lo=False, ro=True, w=입니다, t=Adjective, n=3, n_=4, w_=ㅂ니다)
+        $ (ls=False, rs=True, lo=False, ro=True, w=입니다, t=Eomi, n=3, n_=4, w_=ㅂ니다)
 
         >>> word = Word('아이오아이', '아이오아이', None, 'Noun', None, 5)
         >>> morph_to_feature_na(word, is_L=True)
@@ -108,7 +154,7 @@ def R_to_feature(word):
     lo = False
     ro = True if ((word.morph1) and (word.word[n-1] != word.morph0[-1])) else False
     w = word.word[-n:]
-    t = word.tag0
+    t = word.tag1
     n_ = n + len(word.morph0)
     w_ = word.morph1
     return Feature(ls, rs, lo, ro, w, t, n, n_, w_)
@@ -161,31 +207,7 @@ def first_order_feature(fi, fj):
            (21, 'Noun', 'Josa', '너무너무너무', '는')]
     """
 
-    features = [
-        (0, fj.t, fj.n_),
-        (1, fj.t, fi.n_, fj.n_),
-        (2, fi.t, fj.t, fi.n_, fj.n_),
-        (3, fi.t, fj.t, fi.ro),
-        (4, fj.t, fi.ro),
-        (5, fj.t, fj.ro),
-        (6, fj.t, fj.ls),
-        (7, fj.t, fj.ls, fj.lo),
-        (8, fj.t, fj.rs, fj.ro),
-        (9, fj.t, fj.w),
-        (10, fj.t, fj.w_),
-        (11, fi.w, fj.w),
-        (12, fi.w_, fj.w),
-        (13, fi.t, fj.t, fj.w),
-        (14, fi.t, fj.t, fj.w_),
-        (15, fj.t, fi.w_, fj.w_),
-        (16, fi.t, fi.w, fj.w),
-        (17, fi.t, fi.w_, fj.w_),
-        (18, fi.t, fj.t, fi.w),
-        (19, fi.t, fj.t, fi.w_),
-        (20, fi.t, fj.t, fi.w, fj.w),
-        (21, fi.t, fj.t, fi.w_, fj.w_)
-    ]
-    return features
+    return first_order_templates.transform(fi, fj)
 
 def second_order_feature(fi, fj, fk):
     """
@@ -219,15 +241,76 @@ def second_order_feature(fi, fj, fk):
            (30, 'Noun', 'Josa', 'Noun', '너무너무너무', '아이오아이')]
     """
 
-    features = [
-        (22, fi.t, fk.t, fj.w),
-        (23, fk.t, fi.w, fj.w),
-        (24, fi.t, fj.t, fk.w),
-        (25, fi.t, fj.t, fk.t, fk.w),
-        (26, fi.t, fj.t, fk.t, fj.w, fk.w),
-        (27, fi.t, fj.t, fk.t, fi.w, fj.w, fk.w),
-        (28, fi.t, fj.t, fk.t, fj.w),
-        (29, fi.t, fj.t, fk.t, fi.w),
-        (30, fi.t, fj.t, fk.t, fi.w, fk.w)
-    ]
+    return second_order_templates.transform(fi, fj, fk)
+
+
+feature_fields = Feature._fields
+
+first_order_feature_templates = [
+    FeatureTemplate(0, 'fj.t', 'fj.n_'),
+    FeatureTemplate(1, 'fj.t', 'fi.n_', 'fj.n_'),
+    FeatureTemplate(2, 'fi.t', 'fj.t', 'fi.n_', 'fj.n_'),
+    FeatureTemplate(3, 'fi.t', 'fj.t', 'fi.ro'),
+    FeatureTemplate(4, 'fj.t', 'fi.ro'),
+    FeatureTemplate(5, 'fj.t', 'fj.ro'),
+    FeatureTemplate(6, 'fj.t', 'fj.ls'),
+    FeatureTemplate(7, 'fj.t', 'fj.ls', 'fj.lo'),
+    FeatureTemplate(8, 'fj.t', 'fj.rs', 'fj.ro'),
+    FeatureTemplate(9, 'fj.t', 'fj.w'),
+    FeatureTemplate(10, 'fj.t', 'fj.w_'),
+    FeatureTemplate(11, 'fi.w', 'fj.w'),
+    FeatureTemplate(12, 'fi.w_', 'fj.w'),
+    FeatureTemplate(13, 'fi.t', 'fj.t', 'fj.w'),
+    FeatureTemplate(14, 'fi.t', 'fj.t', 'fj.w_'),
+    FeatureTemplate(15, 'fj.t', 'fi.w_', 'fj.w_'),
+    FeatureTemplate(16, 'fi.t', 'fi.w', 'fj.w'),
+    FeatureTemplate(17, 'fi.t', 'fi.w_', 'fj.w_'),
+    FeatureTemplate(18, 'fi.t', 'fj.t', 'fi.w'),
+    FeatureTemplate(19, 'fi.t', 'fj.t', 'fi.w_'),
+    FeatureTemplate(20, 'fi.t', 'fj.t', 'fi.w', 'fj.w'),
+    FeatureTemplate(21, 'fi.t', 'fj.t', 'fi.w_', 'fj.w_')
+]
+
+second_order_feature_templates = [
+    FeatureTemplate(22, 'fi.t', 'fk.t', 'fj.w'),
+    FeatureTemplate(23, 'fk.t', 'fi.w', 'fj.w'),
+    FeatureTemplate(24, 'fi.t', 'fj.t', 'fk.w'),
+    FeatureTemplate(25, 'fi.t', 'fj.t', 'fk.t', 'fk.w'),
+    FeatureTemplate(26, 'fi.t', 'fj.t', 'fk.t', 'fj.w', 'fk.w'),
+    FeatureTemplate(27, 'fi.t', 'fj.t', 'fk.t', 'fi.w', 'fj.w', 'fk.w'),
+    FeatureTemplate(28, 'fi.t', 'fj.t', 'fk.t', 'fj.w'),
+    FeatureTemplate(29, 'fi.t', 'fj.t', 'fk.t', 'fi.w'),
+    FeatureTemplate(30, 'fi.t', 'fj.t', 'fk.t', 'fi.w', 'fk.w')
+]
+
+first_order_templates = compile_templates(first_order_feature_templates,
+    args={'fi': feature_fields, 'fj': feature_fields}, name='na_first_order')
+second_order_templates = compile_templates(second_order_feature_templates,
+    args={'fi': feature_fields, 'fj': feature_fields, 'fk': feature_fields}, name='na_second_order')
+# features of morpheme j; 31 templates
+na_templates = compile_templates(first_order_feature_templates + second_order_feature_templates,
+    args={'fi': feature_fields, 'fj': feature_fields, 'fk': feature_fields}, name='na')
+
+_word_features = {}
+_max_cached_word_features = 100000
+
+def word_to_features(word):
+    """
+    It returns tuple of morpheme features (Feature) of word; one or two features.
+    Features are cached, since the same word appears in many sequences of beam.
+
+        >>> word_to_features(Word('입니다', '이', 'ㅂ니다', 'Adjective', 'Eomi', 3, 0, 3, True))
+        $ ((ls=True, rs=False, lo=True, ro=False, w=입, t=Adjective, n=1, n_=4, w_=이),
+           (ls=False, rs=True, lo=False, ro=True, w=입니다, t=Eomi, n=3, n_=4, w_=ㅂ니다))
+    """
+    key = (word.word, word.morph0, word.morph1, word.tag0, word.tag1)
+    features = _word_features.get(key)
+    if features is None:
+        if word.tag1 is None:
+            features = (L_to_feature(word),)
+        else:
+            features = (L_to_feature(word), R_to_feature(word))
+        if len(_word_features) >= _max_cached_word_features:
+            _word_features.clear()
+        _word_features[key] = features
     return features
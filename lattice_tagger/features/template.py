@@ -0,0 +1,124 @@
+"""
+Declarative feature templates
+
+A feature template is a feature class and a list of field expressions over nodes, optionally
+with a condition. Template lists are compiled once into specialized Python functions, so
+extracting features of a node does not interpret templates at runtime.
+
+    >>> templates = [
+    >>>     FeatureTemplate(3, 'j.tag0', 'k.tag0'),
+    >>>     FeatureTemplate(6, 'min(8, j.len)', when='j.tag0 == Unk')
+    >>> ]
+    >>> extractor = compile_templates(templates, args={'i': Word._fields, 'j': Word._fields, 'k': Word._fields})
+
+    >>> extractor.transform(word_i, word_j, word_k)
+    $ [(3, 'Noun', 'Josa')]
+    >>> extractor.encode(feature_dic, word_i, word_j, word_k)
+    $ [1738]
+
+Attributes of nodes are compiled into tuple index access (`k.tag0` -> `k[3]`), and `encode`
+looks up feature_dic with each feature tuple as soon as it is built, so it emits feature
+indices directly without intermediate feature list.
+"""
+
+import re
+
+
+class FeatureTemplate:
+    """
+    Arguments
+    ---------
+    feature_class : int
+        The first element of feature tuple
+    fields : str
+        Python expressions over node arguments. For example 'k.word', 'min(8, j.len)'
+    when : str or None
+        Python condition expression. If not None, feature is generated only when it is True
+    """
+
+    def __init__(self, feature_class, *fields, when=None):
+        self.feature_class = feature_class
+        self.fields = fields
+        self.when = when
+
+    def __repr__(self):
+        when = '' if self.when is None else ', when={}'.format(self.when)
+        return 'FeatureTemplate({}, {}{})'.format(self.feature_class, ', '.join(self.fields), when)
+
+
+class CompiledTemplates:
+    """
+    Functions compiled from templates. `source` is the generated code
+    """
+
+    def __init__(self, templates, transform, encode, source):
+        self.templates = templates
+        self.transform = transform
+        self.encode = encode
+        self.source = source
+
+
+def _index_attributes(expression, args):
+    """
+        >>> _index_attributes('min(8, j.len)', {'j': Word._fields})
+        $ 'min(8, j[5])'
+    """
+    def replace(m):
+        arg, attr = m.group(1), m.group(2)
+        fields = args[arg]
+        if fields is None or attr not in fields:
+            return m.group()
+        return '{}[{}]'.format(arg, fields.index(attr))
+
+    pattern = r'\b({})\.(\w+)\b'.format('|'.join(re.escape(arg) for arg in args))
+    return re.sub(pattern, replace, expression)
+
+def compile_templates(templates, args, namespace=None, name='extract'):
+    """
+    Arguments
+    ---------
+    templates : list of FeatureTemplate
+    args : dict
+        Argument name to field names of namedtuple (or None to keep attribute access).
+        Its order is the order of arguments of compiled functions
+    namespace : dict or None
+        Global names used in expressions, such as tags
+    name : str
+        Name prefix of compiled functions
+
+    Returns
+    -------
+    compiled : CompiledTemplates
+        compiled.transform(*args) returns list of feature tuples
+        compiled.encode(feature_dic, *args) returns list of indices of features in feature_dic
+    """
+    arg_names = ', '.join(args)
+    transform_lines = ['def {}_transform({}):'.format(name, arg_names),
+                       '    features = []',
+                       '    append = features.append']
+    encode_lines = ['def {}_encode(feature_dic, {}):'.format(name, arg_names),
+                    '    get = feature_dic.get',
+                    '    idxs = []',
+                    '    append = idxs.append']
+
+    for template in templates:
+        values = [repr(template.feature_class)] + [_index_attributes(f, args) for f in template.fields]
+        feature = '({},)'.format(', '.join(values)) if len(values) == 1 else '({})'.format(', '.join(values))
+        indent = '    '
+        if template.when is not None:
+            condition = 'if {}:'.format(_index_attributes(template.when, args))
+            transform_lines.append(indent + condition)
+            encode_lines.append(indent + condition)
+            indent += '    '
+        transform_lines.append('{}append({})'.format(indent, feature))
+        encode_lines.append('{}idx = get({})'.format(indent, feature))
+        encode_lines.append('{}if idx is not None:'.format(indent))
+        encode_lines.append('{}    append(idx)'.format(indent))
+
+    transform_lines.append('    return features')
+    encode_lines.append('    return idxs')
+    source = '\n'.join(transform_lines) + '\n\n' + '\n'.join(encode_lines) + '\n'
+
+    namespace_ = dict(namespace) if namespace is not None else {}
+    exec(compile(source, '<feature templates {}>'.format(name), 'exec'), namespace_)
+    return CompiledTemplates(templates, namespace_[name + '_transform'], namespace_[name + '_encode'], source)
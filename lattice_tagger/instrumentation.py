@@ -0,0 +1,105 @@
+import time
+from collections import defaultdict
+
+
+class Instrumentation:
+    """
+    Per-process timers and counters of the tagging hot path.
+    It is disabled by default, and then the hot path checks only one boolean flag.
+
+    Stages (seconds)
+        normalization, sentence_lookup, lemmatization, lattice, scoring, pruning
+        `lemmatization` is a part of `sentence_lookup`
+    Counters
+        sentences, lattice_nodes, unknown_words, unknown_pruned_candidates,
+        grown_candidates, pruned_candidates
+
+    Usage
+    -----
+        >>> from lattice_tagger import instrumentation
+        >>> instrumentation.enable()
+        >>> tagger.tag('너무너무너무는 아이오아이의 노래입니다')
+        >>> instrumentation.as_dict()
+        $ {'timers': {'sentence_lookup': {'seconds': 0.0011, 'calls': 1}, ...},
+           'counters': {'lattice_nodes': 83, 'unknown_words': 21, ...}}
+
+        >>> print(instrumentation.to_prometheus())
+        $ # TYPE lattice_tagger_stage_seconds_total counter
+          lattice_tagger_stage_seconds_total{stage="sentence_lookup"} 0.0011
+          ...
+
+        >>> with instrumentation.timer('sentence_lookup'):
+        >>>     # do something
+        >>> instrumentation.disable()
+        >>> instrumentation.reset()
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.reset()
+
+    def enable(self):
+        self.enabled = True
+        return self
+
+    def disable(self):
+        self.enabled = False
+        return self
+
+    def reset(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        return self
+
+    def add_time(self, stage, seconds):
+        self.seconds[stage] += seconds
+        self.calls[stage] += 1
+
+    def incr(self, name, value=1):
+        self.counters[name] += value
+
+    def timer(self, stage):
+        return StageTimer(self, stage)
+
+    def as_dict(self):
+        return {
+            'timers': {stage:{'seconds':seconds, 'calls':self.calls[stage]}
+                       for stage, seconds in self.seconds.items()},
+            'counters': dict(self.counters)
+        }
+
+    def to_prometheus(self, prefix='lattice_tagger'):
+        lines = [
+            '# HELP {}_stage_seconds_total Cumulative elapsed time of each tagging stage'.format(prefix),
+            '# TYPE {}_stage_seconds_total counter'.format(prefix)
+        ]
+        for stage, seconds in sorted(self.seconds.items()):
+            lines.append('{}_stage_seconds_total{{stage="{}"}} {}'.format(prefix, stage, seconds))
+        lines += [
+            '# HELP {}_stage_calls_total Number of calls of each tagging stage'.format(prefix),
+            '# TYPE {}_stage_calls_total counter'.format(prefix)
+        ]
+        for stage, calls in sorted(self.calls.items()):
+            lines.append('{}_stage_calls_total{{stage="{}"}} {}'.format(prefix, stage, calls))
+        for name, value in sorted(self.counters.items()):
+            lines.append('# TYPE {}_{}_total counter'.format(prefix, name))
+            lines.append('{}_{}_total {}'.format(prefix, name, value))
+        return '\n'.join(lines) + '\n'
+
+
+class StageTimer:
+    def __init__(self, instrumentation, stage):
+        self.instrumentation = instrumentation
+        self.stage = stage
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.instrumentation.add_time(self.stage, time.perf_counter() - self.begin)
+
+
+# process-wide instance
+instrumentation = Instrumentation()
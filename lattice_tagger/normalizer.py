@@ -0,0 +1,155 @@
+"""
+Text normalization before tagging
+
+Character-level substitutions are done in a single `str.translate` pass with a precompiled
+table, which keeps the length of string. Deleted characters are translated into a sentinel
+first, and then one compiled regex removes sentinels, collapses white spaces and repeated
+jamo / emoticon characters. Thus the offset of each normalized character in the original
+string is tracked without per-character Python loop.
+
+Usage
+-----
+    >>> normalize('  ‘아이오아이’의​   노래 ㅋㅋㅋㅋㅋ  ')
+    $ "'아이오아이'의 노래 ㅋㅋ"
+
+    >>> text, offsets = normalize_with_offsets('아이  ㅋㅋㅋ')
+    >>> text, offsets
+    $ ('아이 ㅋㅋ', [0, 1, 2, 4, 5])
+"""
+
+import re
+
+
+# sentinel of deleted characters. It is also deleted from the input
+_deleted = '\x00'
+
+def _build_table():
+    table = {}
+    # control characters, zero-width characters and BOM are deleted
+    for c in list(range(0x00, 0x20)) + list(range(0x7f, 0xa0)):
+        table[c] = _deleted
+    for c in [0x200b, 0x200c, 0x200d, 0x2060, 0xfeff, 0x00ad]:
+        table[c] = _deleted
+    # white space variants
+    for c in ['\t', '\n', '\r', '\x0b', '\x0c', '\u00a0', '\u1680', '\u2028', '\u2029',
+              '\u202f', '\u205f', '\u3000'] + [chr(c) for c in range(0x2000, 0x200b)]:
+        table[ord(c)] = ' '
+    # quotes and dashes
+    for c in '‘’‚‛′`´':
+        table[ord(c)] = "'"
+    for c in '“”„‟″«»':
+        table[ord(c)] = '"'
+    for c in '‐‑‒–—―−﹘﹣':
+        table[ord(c)] = '-'
+    for c in '…':
+        table[ord(c)] = '.'
+    # full-width ASCII
+    for c in range(0xff01, 0xff5f):
+        table[c] = chr(c - 0xfee0)
+    return str.maketrans(table)
+
+translate_table = _build_table()
+
+# characters of which long repetition is collapsed; jamo and emoticon characters
+repeat_chars = 'ㄱ-ㅣ~^!?.;ㅡ♥♡*'
+
+_patterns = {}
+
+def _pattern(collapse_repeats, max_repeat):
+    key = (collapse_repeats, max_repeat)
+    pattern = _patterns.get(key)
+    if pattern is None:
+        # white spaces which contain a sentinel or two spaces, or are at the begin or end of string
+        ws = r'(?P<ws>\x00[ \x00]*| [ \x00]+|^ +| +$)'
+        if collapse_repeats:
+            rep = r'|(?P<rep>([{}])\3{{{},}})'.format(repeat_chars, max_repeat)
+        else:
+            rep = ''
+        pattern = re.compile(ws + rep)
+        _patterns[key] = pattern
+    return pattern
+
+
+class Normalizer:
+    """
+    Arguments
+    ---------
+    collapse_repeats : Boolean
+        If True, repetitions of jamo and emoticon characters longer than max_repeat are collapsed
+    max_repeat : int
+        Number of characters kept from repetition
+
+    Usage
+    -----
+        >>> normalizer = Normalizer(max_repeat=3)
+        >>> normalizer('ㅋㅋㅋㅋㅋㅋ 아이오아이 ㅠㅠㅠㅠ!!!!!')
+        $ 'ㅋㅋㅋ 아이오아이 ㅠㅠㅠ!!!'
+    """
+
+    def __init__(self, collapse_repeats=True, max_repeat=2):
+        if max_repeat < 1:
+            raise ValueError('max_repeat must be positive integer')
+        self.collapse_repeats = collapse_repeats
+        self.max_repeat = max_repeat
+        self.pattern = _pattern(collapse_repeats, max_repeat)
+
+    def __call__(self, sent):
+        return self.normalize(sent)
+
+    def _replace(self, m):
+        if m.lastgroup == 'rep':
+            return m.group()[:self.max_repeat]
+        ws = m.group()
+        if (' ' in ws) and (0 < m.start()) and (m.end() < len(m.string)):
+            return ' '
+        return ''
+
+    def normalize(self, sent):
+        text = sent.translate(translate_table)
+        return self.pattern.sub(self._replace, text)
+
+    def normalize_with_offsets(self, sent):
+        """
+        Returns
+        -------
+        text : str
+            Normalized string
+        offsets : list of int
+            offsets[i] is the index of text[i] in sent
+        """
+        text = sent.translate(translate_table)
+        chunks = []
+        offsets = []
+        b = 0
+        for m in self.pattern.finditer(text):
+            chunks.append(text[b:m.start()])
+            offsets += range(b, m.start())
+            replaced = self._replace(m)
+            chunks.append(replaced)
+            if m.lastgroup == 'rep':
+                offsets += range(m.start(), m.start() + len(replaced))
+            elif replaced:
+                offsets.append(m.start() + m.group().index(' '))
+            b = m.end()
+        chunks.append(text[b:])
+        offsets += range(b, len(text))
+        return ''.join(chunks), offsets
+
+
+default_normalizer = Normalizer()
+
+def normalize(sent, collapse_repeats=True, max_repeat=2):
+    """
+    It returns normalized sentence. See `Normalizer`
+    """
+    if collapse_repeats and max_repeat == 2:
+        return default_normalizer.normalize(sent)
+    return Normalizer(collapse_repeats, max_repeat).normalize(sent)
+
+def normalize_with_offsets(sent, collapse_repeats=True, max_repeat=2):
+    """
+    It returns normalized sentence and offsets of its characters in sent. See `Normalizer`
+    """
+    if collapse_repeats and max_repeat == 2:
+        return default_normalizer.normalize_with_offsets(sent)
+    return Normalizer(collapse_repeats, max_repeat).normalize_with_offsets(sent)
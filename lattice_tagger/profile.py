@@ -0,0 +1,349 @@
+"""
+Profiling entry point of tagging workloads
+
+It tags sentences of a file (or the bundled sample `resources/sample/sentences.txt`) and
+reports as JSON
+- profile : cProfile statistics of `Tagger.tag`, the top functions sorted by `--sort`
+- memory : tracemalloc summary of the working set of a sentence (lattice, beam and
+  Words alive at the end of decoding) and of memory retained after tagging, grouped by module
+- lattice : breakdown of lattice sizes by sentence length and by tag
+
+    $ python -m lattice_tagger.profile
+    $ python -m lattice_tagger.profile --input sents.txt --beam-size 10 --decoder c2f --output profile.json
+    $ python -m lattice_tagger.profile --dictionary demo --model model_int8/ --pstats tag.pstats --top 50
+
+The raw cProfile statistics saved with `--pstats` can be browsed with `python -m pstats tag.pstats`.
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import platform
+import pstats
+import time
+import tracemalloc
+
+from .evaluation import percentile
+from .evaluation import peak_rss_mb
+from .tagset import Unk
+from .utils import installpath
+
+
+default_sample = '%s/resources/sample/sentences.txt' % installpath
+decoders = ('beam', 'c2f', 'adaptive')
+package_root = os.path.dirname(installpath)
+
+
+def load_sentences(path=None, num_sents=-1):
+    """It loads non-empty lines of file. If path is None, it loads the bundled sample"""
+    if path is None:
+        path = default_sample
+    sents = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            sents.append(line)
+            if num_sents > 0 and len(sents) >= num_sents:
+                break
+    return sents
+
+def build_tagger(dictionary='base', model_path=None, decoder='beam', prune_threshold=2.0, beam_margin=3.0):
+    """
+    Arguments
+    ---------
+    dictionary : str
+        'base' or 'demo'
+    model_path : str or None
+        Model directory of `save_model`. If None, only RegularizationScore is used
+    decoder : str
+        'beam' (fixed beam), 'c2f' (coarse-to-fine pruning) or 'adaptive' (adaptive beam)
+    """
+    from .beam import BeamScoreFunctions
+    from .beam import RegularizationScore
+    from .dictionary import BaseMorphemeDictionary
+    from .dictionary import DemoMorphemeDictionary
+    from .tagger import Tagger
+
+    if dictionary == 'base':
+        dictionary = BaseMorphemeDictionary()
+    elif dictionary == 'demo':
+        dictionary = DemoMorphemeDictionary()
+    else:
+        raise ValueError('dictionary must be base or demo')
+    if decoder not in decoders:
+        raise ValueError('decoder must be one of {}'.format(', '.join(decoders)))
+
+    funcs = [RegularizationScore()]
+    if model_path is not None:
+        from .features import load_model
+        funcs.append(load_model(model_path).score_function())
+    tagger = Tagger(dictionary, score_funcs=BeamScoreFunctions(*funcs))
+    if decoder == 'c2f':
+        tagger.set_pruning(prune_threshold)
+    elif decoder == 'adaptive':
+        tagger.set_adaptive_beam(margin=beam_margin)
+    return tagger
+
+def module_name(filename):
+    """Path relative to the directory of lattice_tagger, or the file name of other modules"""
+    if filename.startswith(package_root + os.sep):
+        return os.path.relpath(filename, package_root).replace(os.sep, '/')
+    if filename.startswith('<') or filename == '~':
+        return filename
+    return os.path.basename(filename)
+
+def profile_calls(tagger, sents, beam_size=5, repeat=1, top=30, sort='tottime', pstats_path=None):
+    """
+    Returns
+    -------
+    report : dict
+        Elapsed time, throughput, and the top functions of cProfile statistics.
+        Each function has its module, line, name, ncalls, primcalls, tottime and cumtime
+    """
+    # warm up lazily built caches (suffix indices, max lengths) outside of the profile
+    tagger.tag(sents[0], beam_size=beam_size)
+
+    profiler = cProfile.Profile()
+    t = time.perf_counter()
+    profiler.enable()
+    for _ in range(repeat):
+        for sent in sents:
+            tagger.tag(sent, beam_size=beam_size)
+    profiler.disable()
+    elapsed = time.perf_counter() - t
+
+    if pstats_path is not None:
+        profiler.dump_stats(pstats_path)
+
+    stats = pstats.Stats(profiler)
+    sort_index = {'tottime': 2, 'cumtime': 3, 'ncalls': 1}[sort]
+    rows = sorted(stats.stats.items(), key=lambda item: -item[1][sort_index])
+    functions = []
+    for (filename, line, name), (primcalls, ncalls, tottime, cumtime, _) in rows[:top]:
+        functions.append({
+            'module': module_name(filename),
+            'line': line,
+            'function': name,
+            'ncalls': ncalls,
+            'primcalls': primcalls,
+            'tottime': tottime,
+            'cumtime': cumtime
+        })
+
+    num_sents = len(sents) * repeat
+    return {
+        'num_sents': num_sents,
+        'elapsed_sec': elapsed,
+        'sents_per_sec': num_sents / elapsed if elapsed > 0 else 0,
+        'total_calls': stats.total_calls,
+        'total_tt': stats.total_tt,
+        'sort': sort,
+        'functions': functions
+    }
+
+def _group_by_module(statistics, top=None):
+    modules = {}
+    for stat in statistics:
+        name = module_name(stat.traceback[0].filename)
+        size, count = modules.get(name, (0, 0))
+        modules[name] = (size + stat.size_diff, count + stat.count_diff)
+    rows = sorted(modules.items(), key=lambda item: -item[1][0])
+    return [{'module': name, 'kb': size / 1024, 'blocks': count}
+            for name, (size, count) in rows[:top] if size != 0 or count != 0]
+
+def _snapshot():
+    # allocations of tracemalloc and of this module are not of tagging
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__)])
+
+def allocation_summary(tagger, sents, beam_size=5, top=20):
+    """
+    Tracemalloc summary grouped by the module which allocated memory blocks.
+    It runs separately from `profile_calls` because tracing slows down tagging.
+
+    Returns
+    -------
+    report : dict
+        working_set : blocks alive at the end of decoding, which are the lookup results,
+            lattice and beam of a sentence. `kb` and `blocks` are the average over sentences
+        retained : blocks allocated while tagging all sentences and alive after it,
+            such as dictionary and result caches
+        peak_kb : peak traced memory while tagging all sentences
+    """
+    tagger.tag(sents[0], beam_size=beam_size)
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        working_set = {}
+        for sent in sents:
+            before = _snapshot()
+            sequence, lattice, beam = tagger.tag_lattice(sent, beam_size)
+            after = _snapshot()
+            for row in _group_by_module(after.compare_to(before, 'filename')):
+                kb, blocks = working_set.get(row['module'], (0, 0))
+                working_set[row['module']] = (kb + row['kb'], blocks + row['blocks'])
+            del sequence, lattice, beam
+
+        tracemalloc.reset_peak()
+        before = _snapshot()
+        base_memory = tracemalloc.get_traced_memory()[0]
+        for sent in sents:
+            tagger.tag(sent, beam_size=beam_size)
+        peak = tracemalloc.get_traced_memory()[1] - base_memory
+        retained = _group_by_module(_snapshot().compare_to(before, 'filename'), top)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    num_sents = len(sents)
+    rows = sorted(working_set.items(), key=lambda item: -item[1][0])
+    return {
+        'num_sents': num_sents,
+        'working_set': [{'module': name, 'kb': kb / num_sents, 'blocks': blocks / num_sents}
+                        for name, (kb, blocks) in rows[:top]],
+        'retained': retained,
+        'peak_kb': peak / 1024
+    }
+
+def _distribution(values):
+    return {
+        'mean': sum(values) / len(values) if values else 0,
+        'p50': percentile(values, 50),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else 0
+    }
+
+def _bin_order(name):
+    return (name[0] == '>', int(name.lstrip('<=>')))
+
+def lattice_sizes(tagger, sents, length_bins=(10, 20, 40, 80)):
+    """
+    Returns
+    -------
+    report : dict
+        Distributions of the number of characters and lattice nodes of a sentence,
+        the number of nodes by tag, and the average number of nodes of sentences binned by
+        the number of characters. If tagger has coarse-to-fine pruner, the nodes survived
+        pruning are also counted
+    """
+    from .beam import Lattice
+    from .dictionary import sentence_lookup_as_begin_index
+
+    chars_list, known_list, unknown_list, survived_list = [], [], [], []
+    by_tag = {}
+    bins = {}
+    for sent in sents:
+        chars = sent.replace(' ', '')
+        _, bindex = sentence_lookup_as_begin_index(sent, tagger.eojeol_lookup)
+        lattice = Lattice(bindex, chars, node_weights=tagger.node_weights)
+        num_known = 0
+        for nodes in lattice.known:
+            for _, words in nodes:
+                num_known += len(words)
+                for word in words:
+                    by_tag[word.tag0] = by_tag.get(word.tag0, 0) + 1
+        num_unknown = lattice.num_unknowns
+        by_tag[Unk] = by_tag.get(Unk, 0) + num_unknown
+        if tagger.pruner is not None:
+            pruned = tagger.pruner.prune(lattice)
+            survived_list.append(sum(len(words) for nodes in pruned.known for _, words in nodes)
+                                 + pruned.num_unknowns)
+
+        n = len(chars)
+        chars_list.append(n)
+        known_list.append(num_known)
+        unknown_list.append(num_unknown)
+        upper = next((b for b in length_bins if n <= b), None)
+        name = '<={}'.format(upper) if upper is not None else '>{}'.format(length_bins[-1])
+        count, nodes = bins.get(name, (0, 0))
+        bins[name] = (count + 1, nodes + num_known + num_unknown)
+
+    totals = [k + u for k, u in zip(known_list, unknown_list)]
+    report = {
+        'num_sents': len(sents),
+        'chars': _distribution(chars_list),
+        'nodes': _distribution(totals),
+        'known_nodes': _distribution(known_list),
+        'unknown_nodes': _distribution(unknown_list),
+        'nodes_per_char': sum(totals) / max(1, sum(chars_list)),
+        'by_tag': dict(sorted(by_tag.items(), key=lambda item: -item[1])),
+        'by_length': {name: {'num_sents': bins[name][0], 'mean_nodes': bins[name][1] / bins[name][0]}
+                      for name in sorted(bins, key=_bin_order)}
+    }
+    if survived_list:
+        report['survived_nodes'] = _distribution(survived_list)
+    return report
+
+def run(sents, tagger, beam_size=5, repeat=1, top=30, sort='tottime', pstats_path=None,
+    memory=True, memory_sents=20, verbose=False):
+
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform()
+        },
+        'config': {
+            'num_sents': len(sents),
+            'beam_size': beam_size,
+            'repeat': repeat,
+            'pruning': tagger.pruner is not None,
+            'adaptive_beam': tagger.beam_policy is not None
+        }
+    }
+    if verbose:
+        print('profiling {} sentences ...'.format(len(sents) * repeat))
+    report['profile'] = profile_calls(tagger, sents, beam_size, repeat, top, sort, pstats_path)
+    if verbose:
+        print('counting lattice nodes ...')
+    report['lattice'] = lattice_sizes(tagger, sents)
+    if memory:
+        if verbose:
+            print('tracing memory allocations ...')
+        memory_sents = sents[:memory_sents] if memory_sents > 0 else sents
+        report['memory'] = allocation_summary(tagger, memory_sents, beam_size, top)
+    report['peak_rss_mb'] = peak_rss_mb()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile tagging time, memory allocation and lattice sizes')
+    parser.add_argument('--input', type=str, default=None,
+        help='sentence file, one sentence per line. Default is the bundled sample')
+    parser.add_argument('--num-sents', type=int, default=-1)
+    parser.add_argument('--dictionary', type=str, default='base', choices=['base', 'demo'])
+    parser.add_argument('--model', type=str, default=None, help='model directory of save_model')
+    parser.add_argument('--beam-size', type=int, default=5)
+    parser.add_argument('--decoder', type=str, default='beam', choices=decoders)
+    parser.add_argument('--prune-threshold', type=float, default=2.0, help='threshold of c2f decoder')
+    parser.add_argument('--beam-margin', type=float, default=3.0, help='margin of adaptive decoder')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--top', type=int, default=30, help='number of reported functions and modules')
+    parser.add_argument('--sort', type=str, default='tottime', choices=['tottime', 'cumtime', 'ncalls'])
+    parser.add_argument('--pstats', type=str, default=None, help='file path to dump raw cProfile statistics')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='skip tracemalloc')
+    parser.add_argument('--memory-sents', type=int, default=20,
+        help='number of sentences traced by tracemalloc. Non-positive means all')
+    parser.add_argument('--output', type=str, default=None, help='JSON file path. Default is stdout')
+    args = parser.parse_args()
+
+    sents = load_sentences(args.input, args.num_sents)
+    if not sents:
+        raise ValueError('No sentence in {}'.format(args.input or default_sample))
+    tagger = build_tagger(args.dictionary, args.model, args.decoder, args.prune_threshold, args.beam_margin)
+    report = run(sents, tagger, args.beam_size, args.repeat, args.top, args.sort, args.pstats,
+        args.memory, args.memory_sents, verbose=args.output is not None)
+    report['config'].update({'input': args.input or default_sample, 'dictionary': args.dictionary,
+        'model': args.model, 'decoder': args.decoder})
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,419 @@
+"""
+Asyncio tagging service with micro-batching
+
+Concurrent requests are coalesced into micro-batches and dispatched to a process pool of taggers.
+The pending queue is bounded (backpressure), and each request has its own timeout.
+
+Usage
+-----
+    >>> async with AsyncBatchTagger(num_workers=2) as tagger:
+    >>>     sequence = await tagger.atag('너무너무너무는 아이오아이의 노래입니다')
+
+Run HTTP server on TCP port or Unix domain socket
+
+    $ python -m lattice_tagger.service --port 8080 --workers 2
+    $ python -m lattice_tagger.service --unix /tmp/lattice_tagger.sock
+
+    $ curl -X POST localhost:8080/tag -d '{"sentence": "너무너무너무는 아이오아이의 노래입니다"}'
+    $ curl --unix-socket /tmp/lattice_tagger.sock localhost/tag -d '{"sentences": ["...", "..."]}'
+    $ curl localhost:8080/health
+    $ curl localhost:8080/metrics
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+class Overloaded(Exception):
+    """Raised when pending queue is full until the request timeout"""
+
+
+def default_tagger_factory():
+    """Tagger with base morpheme dictionary and regularization score"""
+    from .beam import BeamScoreFunctions
+    from .beam import RegularizationScore
+    from .tagger import Tagger
+    return Tagger('base', score_funcs=BeamScoreFunctions(RegularizationScore()))
+
+# tagger of worker process
+_worker_tagger = None
+
+# if True, cyclic GC is paused while worker tags a micro-batch
+_worker_pause_gc = False
+
+def _init_worker(tagger_factory, production=False):
+    global _worker_tagger, _worker_pause_gc
+    _worker_tagger = tagger_factory()
+    if production:
+        from .gc_tuning import production_mode
+        production_mode()
+        _worker_pause_gc = True
+
+def _tag_batch(sents, beam_size):
+    if _worker_pause_gc:
+        from .gc_tuning import gc_paused
+        with gc_paused():
+            return _tag_sents(sents, beam_size)
+    return _tag_sents(sents, beam_size)
+
+def _tag_sents(sents, beam_size):
+    results = []
+    for sent in sents:
+        try:
+            results.append(_worker_tagger.tag(sent, beam_size=beam_size))
+        except Exception as e:
+            results.append(e)
+    return results
+
+def sequence_to_dict(sequence):
+    """
+    JSON serializable form of Sequence except BOS and EOS
+
+        >>> sequence_to_dict(tagger.tag('아이오아이의'))
+        $ {'score': 2.3,
+           'words': [{'word': '아이오아이', 'morphs': [['아이오아이', 'Noun']], 'b': 0, 'e': 5}, ...]}
+    """
+    words = []
+    for w in sequence.sequences[1:-1]:
+        morphs = [[w.morph0, w.tag0]]
+        if w.tag1 is not None:
+            morphs.append([w.morph1, w.tag1])
+        words.append({'word': w.word, 'morphs': morphs, 'b': w.b, 'e': w.e})
+    return {'score': float(sequence.score), 'words': words}
+
+
+class AsyncBatchTagger:
+    """
+    Arguments
+    ---------
+    tagger_factory : callable
+        Picklable function which returns Tagger. It is called once in each worker process
+    num_workers : int
+        Number of worker processes
+    max_batch_size : int
+        Maximum number of sentences in a micro-batch
+    max_delay : float
+        Maximum seconds to wait for coalescing a micro-batch after the first request arrives
+    max_pending : int
+        Maximum number of requests waiting for dispatch. Callers wait when it is full
+    timeout : float
+        Default per-request timeout in seconds, including queueing time
+    beam_size : int
+        Default beam size
+    max_beam_size : int
+        Maximum beam size which a request can ask for
+    production : Boolean
+        If True, each worker freezes the objects of loaded tagger (`production_mode`)
+        and pauses cyclic GC while tagging a micro-batch
+    """
+
+    def __init__(self, tagger_factory=None, num_workers=2, max_batch_size=32, max_delay=0.005,
+        max_pending=1024, timeout=5.0, beam_size=5, max_beam_size=50, production=False):
+
+        if tagger_factory is None:
+            tagger_factory = default_tagger_factory
+        self.tagger_factory = tagger_factory
+        self.num_workers = num_workers
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.beam_size = beam_size
+        self.max_beam_size = max_beam_size
+        self.production = production
+
+        self.executor = None
+        self.queue = None
+        self._batcher = None
+        self._inflight = None
+        self.metrics = defaultdict(int)
+
+    async def start(self):
+        if self.executor is not None:
+            return self
+        self.executor = self._new_executor()
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        # two batches for each worker; one is running and the other is waiting
+        self._inflight = asyncio.Semaphore(self.num_workers * 2)
+        self._batcher = asyncio.ensure_future(self._batch_loop())
+        return self
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(self.num_workers,
+            initializer=_init_worker, initargs=(self.tagger_factory, self.production))
+
+    async def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+        if self.executor is not None:
+            # shutdown(wait=True) blocks until running batches finish
+            executor, self.executor = self.executor, None
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, executor.shutdown, True)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def atag(self, sent, beam_size=None, timeout=None):
+        """
+        Returns
+        -------
+        sequence : Sequence
+            Same with Tagger.tag(sent, beam_size)
+
+        Raises
+        ------
+        Overloaded
+            If the pending queue stays full until timeout
+        asyncio.TimeoutError
+            If tagging is not finished until timeout
+        """
+        if self.executor is None:
+            await self.start()
+        if beam_size is None:
+            beam_size = self.beam_size
+        if timeout is None:
+            timeout = self.timeout
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        future = loop.create_future()
+        self.metrics['requests'] += 1
+        try:
+            await asyncio.wait_for(self.queue.put((sent, beam_size, future)), timeout)
+        except asyncio.TimeoutError:
+            self.metrics['overloaded'] += 1
+            raise Overloaded('Pending queue is full ({} requests)'.format(self.max_pending))
+        try:
+            return await asyncio.wait_for(future, max(0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            self.metrics['timeouts'] += 1
+            raise
+
+    async def atag_many(self, sents, beam_size=None, timeout=None):
+        return await asyncio.gather(*[self.atag(sent, beam_size, timeout) for sent in sents])
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                remain = deadline - loop.time()
+                if remain <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remain))
+                except asyncio.TimeoutError:
+                    break
+
+            # requests timed-out in queue are not dispatched
+            batch = [item for item in batch if not item[2].done()]
+            by_beam_size = defaultdict(list)
+            for item in batch:
+                by_beam_size[item[1]].append(item)
+            for beam_size, items in by_beam_size.items():
+                await self._inflight.acquire()
+                asyncio.ensure_future(self._dispatch(items, beam_size))
+
+    async def _dispatch(self, items, beam_size):
+        loop = asyncio.get_running_loop()
+        try:
+            self.metrics['batches'] += 1
+            self.metrics['batched_requests'] += len(items)
+            sents = [sent for sent, _, _ in items]
+            executor = self.executor
+            try:
+                results = await loop.run_in_executor(executor, _tag_batch, sents, beam_size)
+            except BrokenProcessPool as e:
+                # a worker died (e.g. killed by OOM). Following batches use a new pool
+                results = [e] * len(items)
+                self._restart_executor(executor)
+            except Exception as e:
+                results = [e] * len(items)
+            for (_, _, future), result in zip(items, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self._inflight.release()
+
+    def _restart_executor(self, broken):
+        # other batches dispatched to the same broken pool may have restarted it already
+        if self.executor is not broken:
+            return
+        self.metrics['pool_restarts'] += 1
+        self.executor = self._new_executor()
+        broken.shutdown(wait=False)
+
+    def stats(self):
+        stats = dict(self.metrics)
+        stats['pending'] = self.queue.qsize() if self.queue is not None else 0
+        stats['mean_batch_size'] = (self.metrics['batched_requests'] / self.metrics['batches']
+            if self.metrics['batches'] > 0 else 0)
+        return stats
+
+
+status_reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+async def handle_request(batch_tagger, method, path, body):
+    """
+    Returns
+    -------
+    status : int
+    response : dict
+    """
+    if path == '/health':
+        return 200, {'status': 'ok'}
+    if path == '/metrics':
+        return 200, batch_tagger.stats()
+    if path != '/tag':
+        return 404, {'error': 'Unknown path {}'.format(path)}
+    if method != 'POST':
+        return 405, {'error': 'Use POST method'}
+
+    try:
+        request = json.loads(body.decode('utf-8'))
+        beam_size = int(request.get('beam_size', batch_tagger.beam_size))
+        if not (1 <= beam_size <= batch_tagger.max_beam_size):
+            raise ValueError('beam_size must be in [1, {}]'.format(batch_tagger.max_beam_size))
+        timeout = request.get('timeout', None)
+        timeout = None if timeout is None else float(timeout)
+        if 'sentences' in request:
+            sents = [str(sent) for sent in request['sentences']]
+        else:
+            sents = [str(request['sentence'])]
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return 400, {'error': 'Invalid request: {}'.format(e)}
+
+    t = time.perf_counter()
+    try:
+        sequences = await batch_tagger.atag_many(sents, beam_size, timeout)
+    except Overloaded as e:
+        return 503, {'error': str(e)}
+    except asyncio.TimeoutError:
+        return 504, {'error': 'Timeout'}
+    except Exception as e:
+        return 500, {'error': repr(e)}
+
+    response = {'results': [sequence_to_dict(seq) for seq in sequences],
+                'elapsed_ms': (time.perf_counter() - t) * 1000}
+    if 'sentence' in request and 'sentences' not in request:
+        response = dict(response['results'][0], elapsed_ms=response['elapsed_ms'])
+    return 200, response
+
+def _response(status, response, keep_alive):
+    payload = json.dumps(response, ensure_ascii=False).encode('utf-8')
+    return ('HTTP/1.1 {} {}\r\nContent-Type: application/json; charset=utf-8\r\n'
+        'Content-Length: {}\r\nConnection: {}\r\n\r\n').format(
+        status, status_reasons.get(status, ''), len(payload),
+        'keep-alive' if keep_alive else 'close').encode('latin-1') + payload
+
+async def handle_connection(batch_tagger, reader, writer, max_body_bytes=1048576):
+    """
+    Minimal HTTP/1.1 handler with keep-alive.
+    Request with body larger than `max_body_bytes` is rejected with 413 without reading the body
+    """
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            try:
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+            except ValueError:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                key, _, value = line.decode('latin-1').partition(':')
+                headers[key.strip().lower()] = value.strip()
+            try:
+                length = int(headers.get('content-length', 0) or 0)
+            except ValueError:
+                length = -1
+            # the unread body remains in the stream, so the connection is closed after these errors
+            if length < 0:
+                writer.write(_response(400, {'error': 'Invalid Content-Length'}, False))
+                await writer.drain()
+                break
+            if length > max_body_bytes:
+                writer.write(_response(413, {'error': 'Request body is larger than {} bytes'.format(
+                    max_body_bytes)}, False))
+                await writer.drain()
+                break
+            body = await reader.readexactly(length) if length > 0 else b''
+
+            status, response = await handle_request(batch_tagger, method.upper(), path.split('?')[0], body)
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            writer.write(_response(status, response, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(batch_tagger, host='127.0.0.1', port=8080, unix_path=None, max_body_bytes=1048576):
+    """
+    Starts HTTP server on TCP (host, port) or Unix domain socket (unix_path), and serves forever
+    """
+    await batch_tagger.start()
+    handler = lambda reader, writer: handle_connection(batch_tagger, reader, writer, max_body_bytes)
+    if unix_path is not None:
+        server = await asyncio.start_unix_server(handler, path=unix_path)
+    else:
+        server = await asyncio.start_server(handler, host=host, port=port)
+    async with server:
+        try:
+            await server.serve_forever()
+        finally:
+            await batch_tagger.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Lattice tagger HTTP service')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--unix', type=str, default=None, help='Unix domain socket path')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-delay', type=float, default=0.005, help='seconds')
+    parser.add_argument('--max-pending', type=int, default=1024)
+    parser.add_argument('--timeout', type=float, default=5.0, help='seconds')
+    parser.add_argument('--beam-size', type=int, default=5)
+    parser.add_argument('--max-beam-size', type=int, default=50)
+    parser.add_argument('--max-body-bytes', type=int, default=1048576)
+    parser.add_argument('--production', action='store_true',
+        help='freeze loaded objects and pause GC while tagging micro-batches')
+    args = parser.parse_args()
+
+    batch_tagger = AsyncBatchTagger(num_workers=args.workers, max_batch_size=args.max_batch_size,
+        max_delay=args.max_delay, max_pending=args.max_pending, timeout=args.timeout,
+        beam_size=args.beam_size, max_beam_size=args.max_beam_size, production=args.production)
+    try:
+        asyncio.run(serve(batch_tagger, args.host, args.port, args.unix, args.max_body_bytes))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
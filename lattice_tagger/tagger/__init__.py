@@ -1 +1,8 @@
 from .tagger import Tagger
+from .incremental import IncrementalDocument
+from .cache import ResultCache
+from .segment import SegmentScorer
+from .segment import segment
+from .spans import SymbolTable
+from .spans import TaggedSpans
+from .spans import SpanBatch
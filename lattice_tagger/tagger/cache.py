@@ -0,0 +1,169 @@
+from collections import OrderedDict
+import sys
+import threading
+
+from ..beam import Sequence
+
+
+class ResultCache:
+    """
+    LRU cache of tagged sentences.
+
+    Cached Sequence is never returned itself; `get` returns a copy of it, and `put` stores
+    a copy, so callers can modify the returned Sequence. Words are immutable namedtuples
+    and they are shared between the copies.
+
+    Cached results depend on the state of tagger (dictionary, score functions and decoding
+    options). `validate(state)` clears the cache when the state differs from that of
+    the cached results.
+
+    It is thread-safe; `Tagger.atag` runs `tag` on a thread pool. Entries are accessed
+    under a lock, and copies of Sequence are made outside of it.
+
+    Arguments
+    ---------
+    max_size : int
+        Maximum number of cached sentences
+    max_bytes : int or None
+        Memory budget of cached results. Size of an entry is estimated from its key,
+        word list and Word tuples. Strings shared with the dictionary are not counted
+
+    Usage
+    -----
+        >>> cache = ResultCache(max_size=10000, max_bytes=64 * 1024 ** 2)
+        >>> cache.put(('너무너무너무는 아이오아이의 노래입니다', 5), sequence)
+        >>> cache.get(('너무너무너무는 아이오아이의 노래입니다', 5))
+        >>> cache.stats
+        $ {'hits': 1, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'size': 1, 'bytes': 2518}
+    """
+
+    def __init__(self, max_size=10000, max_bytes=None):
+        if max_size < 1:
+            raise ValueError('max_size must be positive')
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError('max_bytes must be positive or None')
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._state = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getstate__(self):
+        # lock is not picklable
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    @property
+    def hit_rate(self):
+        num_requests = self.hits + self.misses
+        return self.hits / num_requests if num_requests > 0 else 0.0
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'size': len(self._entries),
+                'bytes': self._bytes
+            }
+
+    def clear(self):
+        """It removes all entries. Hit statistics are kept"""
+        with self._lock:
+            self._clear()
+        return self
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.invalidations = 0
+        return self
+
+    def validate(self, state):
+        """
+        It clears the cache if state differs from the state of cached results.
+        State must be comparable with `==`
+        """
+        with self._lock:
+            if state != self._state:
+                if self._entries:
+                    self.invalidations += 1
+                    self._clear()
+                self._state = state
+        return self
+
+    def get(self, key):
+        """
+        Returns
+        -------
+        sequence : Sequence or None
+            Copy of cached Sequence, or None if key is not cached
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return _copy(entry[0])
+
+    def put(self, key, sequence):
+        nbytes = _estimate_bytes(key, sequence)
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            return self
+        entry = (_copy(sequence), nbytes)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = entry
+            self._bytes += nbytes
+            while (len(self._entries) > self.max_size
+                   or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self.evictions += 1
+        return self
+
+
+def _copy(sequence):
+    return Sequence(list(sequence.sequences), sequence.score, sequence.num_unk)
+
+def _estimate_bytes(key, sequence):
+    words = sequence.sequences
+    nbytes = sys.getsizeof(key) + sys.getsizeof(words) + sys.getsizeof(sequence)
+    nbytes += sum(sys.getsizeof(k) for k in key)
+    if words:
+        # Words of a sentence have the same tuple size
+        nbytes += len(words) * sys.getsizeof(words[0])
+    return nbytes
@@ -0,0 +1,176 @@
+from ..beam import beam_search
+from ..beam import Lattice
+from ..dictionary import Word
+from ..dictionary import presegmented_lookup
+from ..dictionary import split_eojeols
+
+
+_tuple_new = tuple.__new__
+
+def _shift_words(words, offset):
+    if offset == 0:
+        return words
+    return [_tuple_new(Word, (w[0], w[1], w[2], w[3], w[4], w[5], w[6] + offset, w[7] + offset, w[8], w[9]))
+            for w in words]
+
+
+class IncrementalDocument:
+    """
+    Document which keeps its lattice and decoder state between edits.
+
+    Eojeols are looked up independently, so only the changed eojeols are looked up again
+    (looked-up eojeols are cached). Beam states which end before the first changed eojeol
+    do not depend on the edit, thus decoding resumes from there. Typing at the end of
+    a long document costs only the lookup and decoding of the last eojeols.
+
+    Coarse-to-fine pruning and the budget of adaptive beam depend on the whole sentence.
+    If either is enabled in tagger, the lattice is decoded from the beginning after each edit
+    (lookups are still cached).
+
+    Arguments
+    ---------
+    tagger : Tagger
+    text : str
+        Initial text. It is not normalized; offsets of words are those of `text` without white spaces
+    beam_size : int
+    max_cache_size : int
+        Maximum number of cached eojeol lookup results
+
+    Usage
+    -----
+        >>> doc = IncrementalDocument(tagger, '너무너무너무는 아이오아이의')
+        >>> doc.tag()
+        >>> doc.edit(14, 14, ' 노래입니다')     # insert
+        >>> doc.edit(0, 7, '아주')              # replace text[0:7]
+        >>> doc.set_text('아주 아이오아이의 노래였습니다')
+        >>> sequence = doc.tag()
+        >>> doc.stats
+        $ {'edits': 4, 'looked_up_eojeols': 5, 'cached_eojeols': 2, 'decoded_chars': 27, 'reused_chars': 0}
+    """
+
+    def __init__(self, tagger, text='', beam_size=5, max_cache_size=100000):
+        self.tagger = tagger
+        self.beam_size = beam_size
+        self.max_cache_size = max_cache_size
+        self.stats = {'edits': 0, 'looked_up_eojeols': 0, 'cached_eojeols': 0,
+                      'decoded_chars': 0, 'reused_chars': 0}
+        self._cache = {}
+        self._reset()
+        self.set_text(text)
+
+    def _reset(self):
+        self.text = ''
+        self.eojeols = []
+        self.eojeol_words = []
+        self.chars = ''
+        self.bindex = []
+        self.lattice = None
+        self.beam = None
+        self._decoded = None
+        # the first end point of which beam is invalid. None if decoded result is valid
+        self._dirty = 0
+        self._version = self._state_version()
+
+    def _state_version(self):
+        # cached words depend on dictionary and compiled static weights, and decoder states
+        # also depend on score functions, pruning and beam options
+        return self.tagger._cache_state()
+
+    def _resumable(self):
+        tagger = self.tagger
+        policy = tagger.beam_policy
+        return tagger.pruner is None and (policy is None or policy['budget'] is None)
+
+    def edit(self, begin, end, replacement):
+        """
+        Replaces text[begin:end] with replacement. Offsets are those of text with white spaces
+        """
+        if not (0 <= begin <= end <= len(self.text)):
+            raise ValueError('Invalid edit range ({}, {})'.format(begin, end))
+        return self.set_text(self.text[:begin] + replacement + self.text[end:])
+
+    def set_text(self, text):
+        """
+        Changes the whole text. Unchanged eojeols at the front keep their lattice and beam states
+        """
+        version = self._state_version()
+        if version != self._version:
+            self._cache.clear()
+            self._reset()
+
+        eojeols = split_eojeols(text)
+        n_common = 0
+        for old, new in zip(self.eojeols, eojeols):
+            if old != new:
+                break
+            n_common += 1
+        begin = sum(len(eojeol) for eojeol in eojeols[:n_common])
+
+        eojeol_words = self.eojeol_words[:n_common]
+        offset = begin
+        for eojeol in eojeols[n_common:]:
+            eojeol_words.append(_shift_words(self._lookup(eojeol), offset))
+            offset += len(eojeol)
+
+        chars = ''.join(eojeols)
+        bindex = self.bindex[:begin] + [[] for _ in range(begin, len(chars))]
+        for words in eojeol_words[n_common:]:
+            for word in words:
+                bindex[word.b].append(word)
+
+        self.text = text
+        self.eojeols = eojeols
+        self.eojeol_words = eojeol_words
+        self.chars = chars
+        self.bindex = bindex
+        self._dirty = begin if self._dirty is None else min(self._dirty, begin)
+        self.stats['edits'] += 1
+        return self
+
+    def _lookup(self, eojeol):
+        words = self._cache.get(eojeol)
+        if words is not None:
+            self.stats['cached_eojeols'] += 1
+            return words
+        words = presegmented_lookup(eojeol, self.tagger.eojeol_lookup, 0)
+        if len(self._cache) >= self.max_cache_size:
+            self._cache.clear()
+        self._cache[eojeol] = words
+        self.stats['looked_up_eojeols'] += 1
+        return words
+
+    def tag(self):
+        """
+        Returns
+        -------
+        sequence : Sequence
+            Same with `tagger.tag(text, beam_size)`
+        """
+        if self._state_version() != self._version:
+            self.set_text(self.text)
+
+        begin = self._dirty
+        if begin is None:
+            return self._decoded
+
+        if not self._resumable():
+            self._decoded = self.tagger._decode_lattice(self.bindex, self.chars, self.beam_size)[0]
+            self.stats['decoded_chars'] += len(self.chars)
+            self._dirty = None
+            return self._decoded
+
+        if self.lattice is None or self.beam is None:
+            begin = 0
+            self.lattice = Lattice(self.bindex, self.chars, node_weights=self.tagger.node_weights)
+            self.beam = self.tagger._new_beam(self.beam_size)
+        else:
+            self.lattice.rebuild(self.bindex, self.chars, begin)
+            del self.beam.beam[begin + 1:]
+
+        matures = beam_search(self.bindex, self.chars, self.tagger.dynamic_funcs,
+            beam_size=self.beam_size, lattice=self.lattice, beam=self.beam)
+        self.stats['decoded_chars'] += len(self.chars) - begin
+        self.stats['reused_chars'] += begin
+        self._decoded = matures[0]
+        self._dirty = None
+        return self._decoded
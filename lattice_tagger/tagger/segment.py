@@ -0,0 +1,204 @@
+"""
+Segmentation-only decoding
+
+`segment` finds morpheme boundaries and coarse tags without trigram features. It scores
+the lattice of `sentence_lookup_as_begin_index` with deterministic heuristics of
+`RegularizationScore` (prefer long dictionary words, penalize unknown and one-syllable nouns)
+and a few tag-bigram rules (Noun + Josa, predicate + Eomi), and finds the best path by
+first-order Viterbi whose state is (end point, last tag). It is used by indexing
+pipelines which need only offsets.
+
+Usage
+-----
+    >>> words, bindex = sentence_lookup_as_begin_index(sent, eojeol_lookup)
+    >>> segment(bindex, sent)
+    $ [(0, 6, 'Noun'), (6, 7, 'Josa'), (7, 12, 'Noun'), (12, 13, 'Josa'), (13, 15, 'Noun'), (15, 18, 'Adjective')]
+"""
+
+from ..beam.beam import default_max_unknown_len
+from ..dictionary import char_class
+from ..dictionary import split_eojeols
+from ..tagset import *
+
+
+nominal_tags = {Noun, Pronoun, Number}
+predicate_tags = {Verb, Adjective}
+
+
+class SegmentScorer:
+    """
+    Deterministic scorer of segmentation
+
+    Arguments
+    ---------
+    known_preference : float
+        Score per character of dictionary words. Longer words are preferred
+    unknown_penalty : float
+        Score per character of unknown words (plus 0.1 character per word)
+    syllable_penalty : float
+        Score of one-syllable Noun
+    word_penalty : float
+        Score of each word. Negative value prefers the path of less words (longest match)
+    josa_bonus : float
+        Score of Josa following Noun, Pronoun or Number
+    predicate_bonus : float
+        Score of lemmatized predicate (Verb or Adjective + Eomi) which ends at the end of eojeol
+    misplaced_penalty : float
+        Score of Josa or Eomi which begins a sentence or follows Josa or Eomi
+    """
+
+    def __init__(self, known_preference=0.2, unknown_penalty=-0.1, syllable_penalty=-0.2,
+        word_penalty=-0.5, josa_bonus=0.3, predicate_bonus=0.0, misplaced_penalty=-1.0):
+
+        self.word_penalty = word_penalty
+        self.known_preference = known_preference
+        self.unknown_penalty = unknown_penalty
+        self.syllable_penalty = syllable_penalty
+        self.josa_bonus = josa_bonus
+        self.predicate_bonus = predicate_bonus
+        self.misplaced_penalty = misplaced_penalty
+
+    def unary(self, tag0, tag1, length, ends_eojeol=False):
+        if tag0 == Unk:
+            return self.word_penalty + self.unknown_penalty * (length + 0.1)
+        score = self.word_penalty + self.known_preference * length
+        if length == 1 and tag0 == Noun:
+            score += self.syllable_penalty
+        # eomi ends eojeol
+        if ends_eojeol and tag1 == Eomi and tag0 in predicate_tags:
+            score += self.predicate_bonus
+        return score
+
+    def transition(self, prev_tag, tag):
+        if tag == Josa:
+            if prev_tag in nominal_tags:
+                return self.josa_bonus
+            if prev_tag == BOS or prev_tag == Josa or prev_tag == Eomi:
+                return self.misplaced_penalty
+        elif tag == Eomi:
+            if prev_tag == BOS or prev_tag == Josa or prev_tag == Eomi:
+                return self.misplaced_penalty
+        return 0.0
+
+
+default_scorer = SegmentScorer()
+
+
+def segment(bindex, sent, scorer=None, max_unknown_len=None):
+    """
+    Arguments
+    ---------
+    bindex : list of list of Word
+        Lattice of `sentence_lookup_as_begin_index(sent, ...)`. bindex[b] is the list of words
+        beginning at b. Offsets of words may be relative to eojeol; end of word is b + word.e - word.b
+    sent : str
+        Sentence. Unknown words do not cross white spaces
+    scorer : SegmentScorer or None
+        Default is `SegmentScorer()`
+    max_unknown_len : dict or None
+        Maximum length of unknown word of each character class. Default is `default_max_unknown_len`
+
+    Returns
+    -------
+    segments : list of (int, int, str)
+        (begin, end, tag) of words in the best path. Offsets are those of sentence without
+        white spaces, same with `Word.b` and `Word.e`. Tag of a conjugated word is its stem tag
+    """
+    if scorer is None:
+        scorer = default_scorer
+    if max_unknown_len is None:
+        max_unknown_len = default_max_unknown_len
+
+    chars = sent.replace(' ', '')
+    n = len(chars)
+    if n == 0:
+        return []
+
+    # eojeol end of each character. Unknown words end at or before it.
+    # Eojeols are split by ' ' only, same with chars; other white spaces are characters
+    eojeol_end = [0] * n
+    offset = 0
+    for eojeol in split_eojeols(sent):
+        end = offset + len(eojeol)
+        for i in range(offset, end):
+            eojeol_end[i] = end
+        offset = end
+    classes = [char_class(c) for c in chars]
+
+    # best[p] : last tag -> (score, b, tag of the word ending at p, previous tag)
+    best = [{} for _ in range(n + 1)]
+    best[0][BOS] = (0.0, -1, BOS, None)
+    unary = scorer.unary
+    transition = scorer.transition
+    unary_cache = {}
+    transition_cache = {}
+
+    for b in range(n):
+        best_b = best[b]
+        if not best_b:
+            continue
+        states = list(best_b.items())
+
+        # candidates are (e, tag0, last tag, unary score)
+        candidates = []
+        spans = set()
+        for word in (bindex[b] if b < len(bindex) else ()):
+            length = word.e - word.b
+            e = b + length
+            key = (word.tag0, word.tag1, length, e == eojeol_end[b])
+            score_word = unary_cache.get(key)
+            if score_word is None:
+                score_word = unary(*key)
+                unary_cache[key] = score_word
+            last_tag = word.tag1 if word.tag1 is not None else word.tag0
+            candidates.append((e, word.tag0, last_tag, score_word))
+            spans.add(e)
+
+        # unknown words of one character class in the eojeol. One character is always generated
+        cls = classes[b]
+        max_e = min(eojeol_end[b], b + max_unknown_len.get(cls, 8))
+        for e in range(b + 1, max_e + 1):
+            if e - b > 1 and classes[e - 1] != cls:
+                break
+            if e not in spans:
+                candidates.append((e, Unk, Unk, unary(Unk, None, e - b)))
+
+        for e, tag0, last_tag, score_word in candidates:
+            best_e = best[e]
+            current = best_e.get(last_tag)
+            for prev_tag, state in states:
+                trans = transition_cache.get((prev_tag, tag0))
+                if trans is None:
+                    trans = transition(prev_tag, tag0)
+                    transition_cache[(prev_tag, tag0)] = trans
+                score = state[0] + score_word + trans
+                if current is None or score > current[0]:
+                    current = (score, b, tag0, prev_tag)
+            best_e[last_tag] = current
+
+    # the last character is always covered by one-character unknown word, unless words of bindex
+    # end beyond the sentence
+    if not best[n]:
+        return [(0, n, Unk)]
+
+    # back-tracking
+    last_tag, (score, b, tag0, prev_tag) = max(best[n].items(), key=lambda item: item[1][0])
+    segments = []
+    e = n
+    while b >= 0:
+        segments.append((b, e, tag0))
+        e = b
+        score, b, tag0, prev_tag = best[e][prev_tag]
+    segments.reverse()
+    return segments
+
+def to_original_offsets(segments, sent):
+    """
+    It converts offsets of sentence without white spaces to those of sent
+
+        >>> to_original_offsets([(0, 2, 'Noun'), (2, 3, 'Josa')], ' 노래를')
+        $ [(1, 3, 'Noun'), (3, 4, 'Josa')]
+    """
+    positions = [i for i, c in enumerate(sent) if c != ' ']
+    positions.append(len(sent))
+    return [(positions[b], positions[e - 1] + 1, tag) for b, e, tag in segments]
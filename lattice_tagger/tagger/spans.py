@@ -0,0 +1,395 @@
+"""
+Compact tagging results
+
+`TaggedSpans` keeps the morphemes of a tagged sentence as parallel arrays of
+begin / end offsets and interned morpheme / tag ids, instead of a list of Word namedtuples.
+Conjugated words (Verb + Eomi) are split into two morphemes like `flatten_words`,
+and BOS and EOS are not stored. `SpanBatch` concatenates the arrays of many sentences into
+one columnar buffer, with the row offsets of each sentence (CSR layout). Its columns map directly
+to NumPy arrays and to Arrow list arrays (`pyarrow.ListArray.from_arrays(offsets, values)`).
+`to_numpy()` returns copies; `to_numpy(copy=False)` returns views of the columns, and the batch
+cannot grow while the views are alive.
+
+Usage
+-----
+    >>> spans = tagger.tag_spans('너무너무너무는 아이오아이의 노래입니다')
+    >>> spans.to_list()
+    $ [(0, 6, '너무너무너무', 'Noun'), (6, 7, '는', 'Josa'), (7, 12, '아이오아이', 'Noun'),
+       (12, 13, '의', 'Josa'), (13, 15, '노래', 'Noun'), (15, 16, '이', 'Adjective'), (16, 18, 'ㅂ니다', 'Eomi')]
+    >>> spans.to_numpy()['begin']
+    $ array([ 0,  6,  7, 12, 13, 15, 16], dtype=int32)
+
+    >>> batch = tagger.tag_spans_batch(sents)
+    >>> batch.to_numpy().keys()
+    $ dict_keys(['offsets', 'score', 'begin', 'end', 'morph', 'tag', 'word', 'symbols'])
+    >>> batch.save('spans.npz')
+"""
+
+from array import array
+import json
+import threading
+
+from ..tagset import *
+
+
+# array typecode of offsets and ids. It is C int, which is int32 of NumPy on supported platforms
+_typecode = 'i'
+
+# tags have the same ids in every SymbolTable
+_tags = [BOS, EOS, Unk, Noun, Pronoun, Number, Josa, Adjective, Verb, Eomi, Adverb,
+    Determiner, Exclamation, Foreign, Punctuation, Symbol]
+
+
+class SymbolTable:
+    """
+    Interns morphemes and tags into int ids. Ids are never removed, so ids of
+    results stay valid while the table grows with unknown words. Results keep a reference
+    to their table, so replacing a grown table by a new one does not invalidate them.
+    `intern` is thread-safe.
+
+        >>> symbols = SymbolTable()
+        >>> symbols.intern('아이오아이')
+        $ 16
+        >>> symbols[16]
+        $ '아이오아이'
+    """
+
+    def __init__(self, symbols=None):
+        self.symbols = []
+        self.index = {}
+        self._lock = threading.Lock()
+        for symbol in (_tags if symbols is None else symbols):
+            self.intern(symbol)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def intern(self, symbol):
+        idx = self.index.get(symbol)
+        if idx is None:
+            # two threads may miss the same new symbol. Only one of them appends it
+            with self._lock:
+                idx = self.index.get(symbol)
+                if idx is None:
+                    idx = len(self.symbols)
+                    self.symbols.append(symbol)
+                    self.index[symbol] = idx
+        return idx
+
+    def __getitem__(self, idx):
+        return self.symbols[idx]
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+
+def _extend_columns(sequence, symbols, begin, end, morph, tag, word):
+    """
+    It appends morphemes of Sequence to the columns and returns the number of morphemes.
+    Offsets of conjugated words are split like `flatten_words`
+    """
+    intern = symbols.intern
+    num_morphs = 0
+    for i, w in enumerate(sequence.sequences):
+        if w.tag0 == BOS or w.tag0 == EOS:
+            continue
+        if w.tag1 is None:
+            begin.append(w.b)
+            end.append(w.e)
+            morph.append(intern(w.morph0))
+            tag.append(intern(w.tag0))
+            word.append(i - 1)
+            num_morphs += 1
+            continue
+        m = min(w.e, w.b + len(w.morph0))
+        begin.append(w.b)
+        begin.append(m)
+        end.append(m)
+        end.append(w.e)
+        morph.append(intern(w.morph0))
+        morph.append(intern(w.morph1))
+        tag.append(intern(w.tag0))
+        tag.append(intern(w.tag1))
+        word.append(i - 1)
+        word.append(i - 1)
+        num_morphs += 2
+    return num_morphs
+
+def _to_numpy(column, dtype, copy):
+    import numpy as np
+    values = np.frombuffer(column, dtype=dtype)
+    return values.copy() if copy else values
+
+def _to_original_offsets(begin, end, sent):
+    positions = [i for i, c in enumerate(sent) if c != ' ']
+    positions.append(len(sent))
+    for i in range(len(begin)):
+        b, e = begin[i], end[i]
+        begin[i] = positions[b]
+        end[i] = positions[e - 1] + 1 if e > b else positions[b]
+
+
+class TaggedSpans:
+    """
+    Morphemes of a tagged sentence as parallel arrays
+
+    Attributes
+    ----------
+    begin, end : array.array of int
+        Offsets of morphemes. Those of sentence without white spaces, same with `Word.b`
+        and `Word.e`, unless `with_spaces=True` is given to `Tagger.tag_spans`
+    morph, tag : array.array of int
+        Ids of morphemes and tags in `symbols`
+    word : array.array of int
+        Index of the word (lattice node) of each morpheme. Two morphemes of a conjugated
+        word have the same index
+    score : float
+    symbols : SymbolTable
+
+    Usage
+    -----
+        >>> spans = TaggedSpans.from_sequence(tagger.tag(sent), SymbolTable())
+        >>> len(spans)
+        $ 7
+        >>> spans[5]
+        $ (15, 16, '이', 'Adjective')
+        >>> spans.to_json()
+        $ '{"score": 13.39, "spans": [[0, 6, "너무너무너무", "Noun"], ...]}'
+    """
+
+    __slots__ = ('begin', 'end', 'morph', 'tag', 'word', 'score', 'symbols')
+
+    def __init__(self, begin, end, morph, tag, word, score, symbols):
+        self.begin = begin
+        self.end = end
+        self.morph = morph
+        self.tag = tag
+        self.word = word
+        self.score = score
+        self.symbols = symbols
+
+    @classmethod
+    def from_sequence(cls, sequence, symbols, sent=None):
+        """
+        Arguments
+        ---------
+        sequence : Sequence
+        symbols : SymbolTable
+        sent : str or None
+            If given, offsets are converted to those of sent
+        """
+        begin, end, morph, tag, word = (array(_typecode) for _ in range(5))
+        _extend_columns(sequence, symbols, begin, end, morph, tag, word)
+        if sent is not None:
+            _to_original_offsets(begin, end, sent)
+        return cls(begin, end, morph, tag, word, float(sequence.score), symbols)
+
+    def __len__(self):
+        return len(self.begin)
+
+    def __getitem__(self, i):
+        symbols = self.symbols.symbols
+        return (self.begin[i], self.end[i], symbols[self.morph[i]], symbols[self.tag[i]])
+
+    def __iter__(self):
+        symbols = self.symbols.symbols
+        for b, e, m, t in zip(self.begin, self.end, self.morph, self.tag):
+            yield (b, e, symbols[m], symbols[t])
+
+    def to_list(self):
+        """list of (begin, end, morph, tag)"""
+        return list(self)
+
+    def to_dict(self):
+        return {'score': self.score, 'spans': [list(span) for span in self]}
+
+    def to_json(self, **kwargs):
+        """Keyword arguments are given to `json.dumps`"""
+        kwargs.setdefault('ensure_ascii', False)
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_numpy(self, copy=True):
+        """
+        It returns dict of int32 arrays 'begin', 'end', 'morph', 'tag' and 'word'.
+        Ids are decoded by `symbols`. If copy is False, arrays are views of the columns
+        """
+        import numpy as np
+        return {name: _to_numpy(getattr(self, name), np.intc, copy)
+            for name in ('begin', 'end', 'morph', 'tag', 'word')}
+
+    @property
+    def nbytes(self):
+        return sum(column.itemsize * len(column) for column in
+            (self.begin, self.end, self.morph, self.tag, self.word))
+
+    def __repr__(self):
+        spans = ' '.join('{}/{}[{}:{}]'.format(m, t, b, e) for b, e, m, t in self)
+        return 'TaggedSpans({}, score={})'.format(spans, self.score)
+
+
+class SpanBatch:
+    """
+    Columnar buffer of many tagged sentences. Morphemes of sentence i are the rows
+    offsets[i]:offsets[i+1] of the columns.
+
+    Arguments
+    ---------
+    symbols : SymbolTable or None
+        Shared by all sentences. Default is a new SymbolTable
+
+    Usage
+    -----
+        >>> batch = SpanBatch(tagger.symbols)
+        >>> for sent in sents:
+        >>>     batch.append_sequence(tagger.tag(sent))
+        >>> len(batch), batch.num_morphs
+        $ (1000, 11830)
+        >>> batch[0]
+        $ TaggedSpans(너무너무너무/Noun[0:6] 는/Josa[6:7] ..., score=13.39)
+
+        >>> columns = batch.to_numpy()
+        >>> morphs = columns['symbols'][columns['morph'][columns['offsets'][0]: columns['offsets'][1]]]
+
+    With pyarrow, the columns are converted without copy
+
+        >>> offsets = pa.array(columns['offsets'])
+        >>> pa.ListArray.from_arrays(offsets, pa.array(columns['begin']))
+    """
+
+    def __init__(self, symbols=None):
+        self.symbols = SymbolTable() if symbols is None else symbols
+        self.offsets = array(_typecode, [0])
+        self.scores = array('d')
+        self.begin = array(_typecode)
+        self.end = array(_typecode)
+        self.morph = array(_typecode)
+        self.tag = array(_typecode)
+        self.word = array(_typecode)
+
+    def __len__(self):
+        return len(self.scores)
+
+    @property
+    def num_morphs(self):
+        return len(self.begin)
+
+    def append_sequence(self, sequence, sent=None):
+        """
+        It appends morphemes of Sequence without creating TaggedSpans.
+        If sent is given, offsets are converted to those of sent
+        """
+        self._check_resizable()
+        if sent is not None:
+            self.append(TaggedSpans.from_sequence(sequence, self.symbols, sent))
+            return self
+        _extend_columns(sequence, self.symbols, self.begin, self.end, self.morph, self.tag, self.word)
+        self.offsets.append(len(self.begin))
+        self.scores.append(float(sequence.score))
+        return self
+
+    def append(self, spans):
+        self._check_resizable()
+        if spans.symbols is self.symbols:
+            self.morph.extend(spans.morph)
+            self.tag.extend(spans.tag)
+        else:
+            symbols = spans.symbols.symbols
+            intern = self.symbols.intern
+            self.morph.extend(intern(symbols[m]) for m in spans.morph)
+            self.tag.extend(intern(symbols[t]) for t in spans.tag)
+        self.begin.extend(spans.begin)
+        self.end.extend(spans.end)
+        self.word.extend(spans.word)
+        self.offsets.append(len(self.begin))
+        self.scores.append(spans.score)
+        return self
+
+    def _check_resizable(self):
+        # array.array can not be resized while it exports buffer. Fail before any column changes
+        try:
+            self.offsets.append(self.offsets[-1])
+        except BufferError:
+            raise BufferError('SpanBatch is exported by to_numpy(copy=False). '
+                'Release the arrays before appending, or use to_numpy()') from None
+        self.offsets.pop()
+
+    def extend(self, spans_list):
+        for spans in spans_list:
+            self.append(spans)
+        return self
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not (0 <= i < len(self)):
+            raise IndexError('index {} is out of range'.format(i))
+        b, e = self.offsets[i], self.offsets[i + 1]
+        return TaggedSpans(self.begin[b:e], self.end[b:e], self.morph[b:e], self.tag[b:e],
+            self.word[b:e], self.scores[i], self.symbols)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_list(self):
+        return [spans.to_list() for spans in self]
+
+    def to_numpy(self, copy=True):
+        """
+        Arguments
+        ---------
+        copy : Boolean
+            If False, arrays except 'symbols' are views of the columns without copy.
+            Columns cannot be resized while a view exists, so `append` and `append_sequence`
+            raise BufferError until the views are released. Use it for the final export
+
+        Returns
+        -------
+        columns : dict of numpy.ndarray
+            'offsets' (num sents + 1, int32), 'score' (num sents, float64),
+            'begin', 'end', 'morph', 'tag', 'word' (num morphemes, int32)
+            and 'symbols' (str array) which decodes ids of 'morph' and 'tag'
+        """
+        import numpy as np
+        columns = {
+            'offsets': _to_numpy(self.offsets, np.intc, copy),
+            'score': _to_numpy(self.scores, np.float64, copy)
+        }
+        for name in ('begin', 'end', 'morph', 'tag', 'word'):
+            columns[name] = _to_numpy(getattr(self, name), np.intc, copy)
+        columns['symbols'] = np.array(self.symbols.symbols, dtype=str)
+        return columns
+
+    def save(self, path):
+        """It saves columns as .npz file. Load it with `SpanBatch.load`"""
+        import numpy as np
+        np.savez(path, **self.to_numpy(copy=False))
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+        with np.load(path, allow_pickle=False) as columns:
+            batch = cls(SymbolTable(columns['symbols'].tolist()))
+            batch.offsets = array(_typecode, columns['offsets'].astype(np.intc).tobytes())
+            batch.scores = array('d', columns['score'].astype(np.float64).tobytes())
+            for name in ('begin', 'end', 'morph', 'tag', 'word'):
+                setattr(batch, name, array(_typecode, columns[name].astype(np.intc).tobytes()))
+        return batch
+
+    @property
+    def nbytes(self):
+        return sum(column.itemsize * len(column) for column in
+            (self.offsets, self.scores, self.begin, self.end, self.morph, self.tag, self.word))
+
+    def __repr__(self):
+        return 'SpanBatch(sents={}, morphs={}, symbols={})'.format(
+            len(self), self.num_morphs, len(self.symbols))
@@ -1,10 +1,29 @@
+import functools
+import time
+
 from ..beam import beam_search
+from ..beam import AdaptiveBeam
+from ..beam import Beam
 from ..beam import BeamScoreFunctions
+from ..beam import CoarseToFinePruner
+from ..beam import Lattice
 from ..beam import RegularizationScore
 from ..beam import SimpleTrigramFeatureScore
 from ..dictionary import BaseMorphemeDictionary
+from ..dictionary import presegmented_lookup
 from ..dictionary import sentence_lookup_as_begin_index
+from ..dictionary import split_eojeols
 from ..dictionary import LRLookup, WordLookup, MorphemeLookup
+from ..gc_tuning import gc_paused
+from ..instrumentation import instrumentation
+from ..normalizer import default_normalizer
+from ..utils import IdentityKey
+from .cache import ResultCache
+from .segment import segment
+from .segment import to_original_offsets
+from .spans import SpanBatch
+from .spans import SymbolTable
+from .spans import TaggedSpans
 
 
 class Tagger:
@@ -45,7 +64,8 @@ class Tagger:
     """
 
     def __init__(self, dictionary='base', lookup='subword_lookup',
-        encoder=None, score_funcs=None):
+        encoder=None, score_funcs=None, compile_static=True, normalizer=None,
+        prune_threshold=None, cache_size=None):
 
         # set dictionary
         # TODO
@@ -61,18 +81,369 @@ class Tagger:
 
         self.eojeol_lookup = eojeol_lookup
 
+        # set normalizer. It is used when tag(sent, ensure_normalize=False)
+        if normalizer is None:
+            normalizer = default_normalizer
+        self.normalizer = normalizer
+
         # set score functions
         # TODO
         self.score_funcs = score_funcs
+        self.node_weights = None
+        self.dynamic_funcs = score_funcs
+        if compile_static and score_funcs is not None:
+            self.compile_static_weights()
+
+        # coarse-to-fine pruning. None means all lattice nodes are decoded
+        self.pruner = None
+        if prune_threshold is not None:
+            self.set_pruning(prune_threshold)
+
+        # adaptive beam policy. None means fixed beam_size
+        self.beam_policy = None
+        self.beam_stats = {}
+
+        # LRU cache of tagged sentences. None means every sentence is tagged
+        self.result_cache = None
+        if cache_size is not None:
+            self.set_result_cache(cache_size)
+
+        # eojeol to begin index of looked-up words, used by `segment`
+        self.segment_cache_size = 100000
+        self._segment_cache = {}
+        self._segment_version = None
+
+        # interned morphemes and tags of `tag_spans` results
+        self.symbols = SymbolTable()
+
+    def compile_static_weights(self):
+        """
+        Static score functions (RegularizationScore, MorphemePreferenceScore, WordPreferenceScore)
+        are compiled into node weights which lookup attaches to each Word.
+        Call it again after modifying the preferences of the score functions.
+        """
+        self.node_weights, self.dynamic_funcs = self.score_funcs.split_static()
+        self.eojeol_lookup.node_weights = self.node_weights
+        return self
+
+    def set_pruning(self, threshold=2.0):
+        """
+        Enables coarse-to-fine pruning. Before trigram decoding, a unigram / tag-bigram pass
+        removes lattice nodes of which best coarse path score is lower than
+        (best coarse path score - threshold). Set threshold None to disable it.
+
+            >>> tagger.set_pruning(threshold=2)
+            >>> tagger.tag(sent)
+            >>> tagger.pruner.stats
+            $ {'sentences': 1, 'nodes': 112, 'pruned_nodes': 87}
+        """
+        if threshold is None or self.score_funcs is None:
+            self.pruner = None
+        else:
+            self.pruner = CoarseToFinePruner.from_score_functions(self.score_funcs, threshold)
+        return self
+
+    def set_adaptive_beam(self, margin=3.0, min_beam_size=1, budget=None):
+        """
+        Enables adaptive beam. At each end point, candidates within `margin` from the best are kept,
+        at least `min_beam_size` and at most `beam_size` of `tag`. If `budget` is given,
+        the total number of kept candidates of a sentence is bounded by it. See `AdaptiveBeam`.
+        Set margin None to use fixed beam again. Pruning statistics are accumulated in `beam_stats`
+
+            >>> tagger.set_adaptive_beam(margin=3, min_beam_size=2)
+            >>> tagger.tag(sent, beam_size=10)
+            >>> tagger.beam_stats
+            $ {'candidates': 2214, 'kept': 83, 'margin_pruned': 1911, 'width_pruned': 220, 'budget_pruned': 0}
+        """
+        if margin is None:
+            self.beam_policy = None
+        else:
+            if margin < 0 or min_beam_size < 1:
+                raise ValueError('margin must be non-negative and min_beam_size must be positive')
+            self.beam_policy = {'margin': margin, 'min_k': min_beam_size, 'budget': budget}
+        self.beam_stats = {}
+        return self
+
+    def set_result_cache(self, max_size=10000, max_bytes=None):
+        """
+        Enables the cache of tagged sentences for repetitive inputs. The key is
+        (normalized sentence, beam_size), and the least recently used sentence is evicted
+        when the number of sentences exceeds `max_size` or the estimated size exceeds
+        `max_bytes`. Set max_size None to disable it.
+
+        The cache is cleared when dictionary is modified, static weights are compiled again,
+        or encoder, coefficients, pruning or beam options are replaced. After modifying
+        coefficients in place, call `tagger.result_cache.clear()`.
+        `tag` returns a copy of cached Sequence.
+
+            >>> tagger.set_result_cache(max_size=10000, max_bytes=64 * 1024 ** 2)
+            >>> tagger.tag(sent)
+            >>> tagger.tag(sent)  # no lookup and decoding
+            >>> tagger.result_cache.stats
+            $ {'hits': 1, 'misses': 1, 'evictions': 0, 'invalidations': 0, 'size': 1, 'bytes': 2518}
+        """
+        if max_size is None:
+            self.result_cache = None
+        else:
+            self.result_cache = ResultCache(max_size, max_bytes)
+        return self
+
+    def _cache_state(self):
+        """Everything which changes the result of `tag` for the same input"""
+        funcs = []
+        if self.dynamic_funcs is not None:
+            for func in self.dynamic_funcs.funcs:
+                coefficients = getattr(func, 'coefficients', None)
+                funcs.append((IdentityKey(func), IdentityKey(getattr(func, 'encoder', None)),
+                    IdentityKey(coefficients), getattr(func, 'scale', None),
+                    getattr(func, 'num_features', None)))
+        pruner = None
+        if self.pruner is not None:
+            pruner = (IdentityKey(self.pruner), self.pruner.threshold)
+        beam_policy = None
+        if self.beam_policy is not None:
+            beam_policy = tuple(sorted(self.beam_policy.items()))
+        return (self.dictionary.version, IdentityKey(self.node_weights), IdentityKey(self.dynamic_funcs),
+            tuple(funcs), pruner, beam_policy)
+
+    def _new_beam(self, beam_size):
+        """Empty beam of `tag`. AdaptiveBeam if adaptive beam is enabled"""
+        if self.beam_policy is None:
+            return Beam(k=beam_size)
+        min_k = min(self.beam_policy['min_k'], beam_size)
+        return AdaptiveBeam(k=beam_size, margin=self.beam_policy['margin'],
+            min_k=min_k, budget=self.beam_policy['budget'])
+
+    def _decode(self, bindex, chars, beam, debug, lattice):
+        matures = beam_search(bindex, chars, self.dynamic_funcs, beam_size=beam.k, debug=debug,
+            lattice=lattice, node_weights=self.node_weights, beam=beam)
+        for name, value in beam.stats.items():
+            self.beam_stats[name] = self.beam_stats.get(name, 0) + value
+        return matures
+
+    def _decode_lattice(self, bindex, chars, beam_size, debug=False, inst=None):
+        """
+        Lattice construction, coarse-to-fine pruning and decoding of `tag`
+
+        Returns
+        -------
+        sequence : Sequence
+            The best sequence
+        lattice : Lattice
+            Decoded lattice. It is the pruned one if pruning is enabled and a path survives
+        beam : Beam
+            Beam of decoding
+        """
+        lattice = Lattice(bindex, chars, node_weights=self.node_weights)
+        if self.pruner is not None:
+            num_pruned = self.pruner.stats['pruned_nodes']
+            pruned = self.pruner.prune(lattice)
+            if inst is not None:
+                inst.incr('coarse_pruned_nodes', self.pruner.stats['pruned_nodes'] - num_pruned)
+            beam = self._new_beam(beam_size)
+            matures = self._decode(bindex, chars, beam, debug, pruned)
+            if matures:
+                return matures[0], pruned, beam
+            # the coarse model ignores some constraints of beam search. If no path survives, decode all nodes
+        beam = self._new_beam(beam_size)
+        matures = self._decode(bindex, chars, beam, debug, lattice)
+        return matures[0], lattice, beam
+
+    def tag_lattice(self, sent, beam_size=5, ensure_normalize=True, debug=False):
+        """
+        Same decoding with `tag` without result cache, but it returns the lattice and beam too.
+        Use it to inspect decoding, for example memory profiling of the working set
+
+            >>> sequence, lattice, beam = tagger.tag_lattice('너무너무너무는 아이오아이의 노래입니다')
+
+        Returns
+        -------
+        sequence : Sequence
+            Same with `tag(sent, beam_size)`
+        lattice : Lattice
+            Decoded lattice. It is the pruned one if pruning is enabled
+        beam : Beam
+            Beam of decoding
+        """
+        if not ensure_normalize:
+            sent = self.normalizer(sent)
+        chars = sent.replace(' ', '')
+        _, bindex = sentence_lookup_as_begin_index(sent, self.eojeol_lookup)
+        return self._decode_lattice(bindex, chars, beam_size, debug)
 
     def tag(self, sent, beam_size=5, ensure_normalize=True, debug=False):
+        inst = instrumentation if instrumentation.enabled else None
+        t_normalized = None
+        if inst is not None:
+            t = time.perf_counter()
+
         if not ensure_normalize:
-            # TODO normalize
-            sent = sent
+            sent = self.normalizer(sent)
+
+        if inst is not None:
+            t_normalized = time.perf_counter()
+            inst.add_time('normalization', t_normalized - t)
 
+        cache = self.result_cache if not debug else None
+        if cache is not None:
+            cache.validate(self._cache_state())
+            key = (sent, beam_size)
+            sequence = cache.get(key)
+            if inst is not None:
+                inst.incr('result_cache_hits' if sequence is not None else 'result_cache_misses')
+            if sequence is not None:
+                return sequence
+            sequence = self._tag(sent, beam_size, debug, inst, t_normalized)
+            cache.put(key, sequence)
+            return sequence
+        return self._tag(sent, beam_size, debug, inst, t_normalized)
+
+    def _tag(self, sent, beam_size, debug, inst, t_normalized):
         chars = sent.replace(' ', '')
         words, bindex = sentence_lookup_as_begin_index(sent, self.eojeol_lookup)
-        matures = beam_search(bindex, chars, self.score_funcs,
-            beam_size=beam_size, debug=debug)
 
-        return matures[0]
+        if inst is not None:
+            inst.add_time('sentence_lookup', time.perf_counter() - t_normalized)
+            inst.incr('sentences')
+            inst.incr('lattice_nodes', max(0, len(words) - 2))
+
+        return self._decode_lattice(bindex, chars, beam_size, debug, inst)[0]
+
+    def tag_spans(self, sent, beam_size=5, ensure_normalize=True, with_spaces=False, symbols=None):
+        """
+        It returns the best path as TaggedSpans, parallel arrays of offsets and interned ids of
+        morphemes, instead of Sequence. Ids are those of `tagger.symbols`, which grows with
+        every new morpheme (e.g. unknown words) of tagged sentences. In a long-running process,
+        pass a `symbols` table or assign `tagger.symbols = SymbolTable()` to release it;
+        spans keep the table of their ids
+
+            >>> spans = tagger.tag_spans('너무너무너무는 아이오아이의 노래입니다')
+            >>> spans.to_list()
+            $ [(0, 6, '너무너무너무', 'Noun'), (6, 7, '는', 'Josa'), ..., (16, 18, 'ㅂ니다', 'Eomi')]
+            >>> spans.to_numpy()['tag']
+            $ array([3, 6, 3, 6, 3, 7, 9], dtype=int32)
+
+        Arguments
+        ---------
+        with_spaces : Boolean
+            If True, offsets are those of (normalized) sent. Otherwise, they are those of
+            sent without white spaces, same with `Word.b` and `Word.e`
+        symbols : SymbolTable or None
+            If None, `tagger.symbols` is used
+        """
+        if not ensure_normalize:
+            sent = self.normalizer(sent)
+        if symbols is None:
+            symbols = self.symbols
+        sequence = self.tag(sent, beam_size)
+        return TaggedSpans.from_sequence(sequence, symbols, sent if with_spaces else None)
+
+    def tag_spans_batch(self, sents, beam_size=5, ensure_normalize=True, with_spaces=False,
+        pause_gc=False, symbols=None):
+        """
+        It tags sentences into one columnar SpanBatch for batch jobs. See `tag_batch` for pause_gc.
+        Each batch has its own SymbolTable unless `symbols` is given, so the symbols of batch jobs
+        do not accumulate in the tagger. To share ids across batches, pass `tagger.symbols`
+
+            >>> batch = tagger.tag_spans_batch(sents)
+            >>> batch.save('spans.npz')
+        """
+        batch = SpanBatch(symbols)
+        if not ensure_normalize:
+            sents = [self.normalizer(sent) for sent in sents]
+        for sent, sequence in zip(sents, self.tag_batch(sents, beam_size, pause_gc=pause_gc)):
+            batch.append_sequence(sequence, sent if with_spaces else None)
+        return batch
+
+    def segment(self, sent, ensure_normalize=True, with_spaces=False, scorer=None):
+        """
+        Segmentation-only mode. It finds word boundaries and coarse tags on the same lattice
+        with `tag`, but with deterministic heuristics (`SegmentScorer`) and first-order Viterbi
+        instead of score functions and beam search. Use it when only offsets are needed,
+        for example indexing.
+
+            >>> tagger.segment('너무너무너무는 아이오아이의 노래입니다')
+            $ [(0, 6, 'Noun'), (6, 7, 'Josa'), (7, 12, 'Noun'), (12, 13, 'Josa'), (13, 15, 'Noun'), (15, 18, 'Adjective')]
+            >>> tagger.segment('너무너무너무는 아이오아이의', with_spaces=True)
+            $ [(0, 6, 'Noun'), (6, 7, 'Josa'), (8, 13, 'Noun'), (13, 14, 'Josa')]
+
+        Arguments
+        ---------
+        with_spaces : Boolean
+            If True, offsets are those of (normalized) sent. Otherwise, they are those of
+            sent without white spaces, same with `Word.b` and `Word.e`
+        scorer : SegmentScorer or None
+
+        Returns
+        -------
+        segments : list of (int, int, str)
+            (begin, end, tag). Tag of a conjugated word is its stem tag
+        """
+        if not ensure_normalize:
+            sent = self.normalizer(sent)
+        segments = segment(self._segment_bindex(sent), sent, scorer)
+        if with_spaces:
+            segments = to_original_offsets(segments, sent)
+        return segments
+
+    def _segment_bindex(self, sent):
+        """
+        Same lattice with `sentence_lookup_as_begin_index` except that offsets of words are
+        those in eojeol. Looked-up eojeols are cached until dictionary changes
+        """
+        version = (self.dictionary.version, IdentityKey(self.node_weights))
+        if version != self._segment_version:
+            self._segment_cache = {}
+            self._segment_version = version
+        cache = self._segment_cache
+        bindex = []
+        for eojeol in split_eojeols(sent):
+            eojeol_bindex = cache.get(eojeol)
+            if eojeol_bindex is None:
+                eojeol_bindex = [[] for _ in eojeol]
+                for word in presegmented_lookup(eojeol, self.eojeol_lookup, 0):
+                    eojeol_bindex[word.b].append(word)
+                if len(cache) >= self.segment_cache_size:
+                    cache.clear()
+                cache[eojeol] = eojeol_bindex
+            bindex += eojeol_bindex
+        return bindex
+
+    def tag_batch(self, sents, beam_size=5, ensure_normalize=True, pause_gc=False):
+        """
+        It tags sentences and returns the list of Sequence. If pause_gc is True,
+        cyclic GC is disabled while tagging the batch, so no collection pause happens
+        in the middle of the batch. Tagging does not create reference cycles,
+        thus memory is freed by reference counting during the pause.
+
+            >>> production_mode()   # from lattice_tagger import production_mode
+            >>> sequences = tagger.tag_batch(sents, pause_gc=True)
+        """
+        if not pause_gc:
+            return [self.tag(sent, beam_size, ensure_normalize) for sent in sents]
+        with gc_paused():
+            return [self.tag(sent, beam_size, ensure_normalize) for sent in sents]
+
+    def document(self, text='', beam_size=5):
+        """
+        It returns IncrementalDocument which re-tags only the edited region of text
+
+            >>> doc = tagger.document('너무너무너무는 아이오아이의')
+            >>> doc.edit(14, 14, ' 노래입니다')
+            >>> sequence = doc.tag()
+        """
+        from .incremental import IncrementalDocument
+        return IncrementalDocument(self, text, beam_size)
+
+    async def atag(self, sent, beam_size=5, ensure_normalize=True, executor=None):
+        """
+        Tags sentence in executor (default thread pool) without blocking event loop.
+        For micro-batching over process pool, use `lattice_tagger.service.AsyncBatchTagger`
+
+            >>> sequence = await tagger.atag('너무너무너무는 아이오아이의 노래입니다')
+        """
+        # asyncio is imported only by async callers
+        import asyncio
+        loop = asyncio.get_running_loop()
+        func = functools.partial(self.tag, sent, beam_size, ensure_normalize)
+        return await loop.run_in_executor(executor, func)
@@ -13,3 +13,7 @@ BOS = 'BOS'
 EOS = 'EOS'
 
 Unk = 'Unknown'
+
+Foreign = 'Foreign'
+Punctuation = 'Punctuation'
+Symbol = 'Symbol'
@@ -1,6 +1,11 @@
+import importlib
 import json
+import mmap
 import os
-import psutil
+import random
+import sys
+import types
+import zlib
 
 
 installpath = os.path.dirname(os.path.realpath(__file__))
@@ -25,10 +30,75 @@ def left_space_tag(sent):
     return chars, tags
 
 def get_process_memory():
-    """It returns the memory usage of current process"""
+    """
+    It returns the memory usage (RSS, GB) of current process.
+    psutil is optional. Without it, /proc/self/statm (Linux) or peak RSS of resource module is used
+    """
+    try:
+        import psutil
+        process = psutil.Process(os.getpid())
+        return process.memory_info().rss / (1024 ** 3)
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 ** 3)
+    except (OSError, ValueError, IndexError):
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1024 ** 3) if sys.platform == 'darwin' else peak / (1024 ** 2)
+
+
+class IdentityKey:
+    """
+    Hashable key which is equal only to the key of the same object. Unlike `id(obj)`, it keeps
+    a reference to obj, so the id can not be reused by another object while the key is alive.
+    Use it in cache versions which must change when an attribute is replaced by another object.
+
+        >>> IdentityKey(weights) == IdentityKey(weights)
+        $ True
+        >>> IdentityKey(weights) == IdentityKey(copy.copy(weights))
+        $ False
+    """
+
+    __slots__ = ('obj',)
 
-    process = psutil.Process(os.getpid())
-    return process.memory_info().rss / (1024 ** 3)
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __eq__(self, other):
+        return isinstance(other, IdentityKey) and self.obj is other.obj
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return id(self.obj)
+
+    def __repr__(self):
+        return 'IdentityKey({})'.format(type(self.obj).__name__)
+
+
+class LazyModule(types.ModuleType):
+    """
+    Module proxy which imports the module at the first attribute access.
+    After loading, attributes of the module are copied into the proxy, so the following
+    accesses are as fast as those of the module itself.
+
+        >>> np = LazyModule('numpy')   # numpy is not imported yet
+        >>> np.zeros(3)                # numpy is imported here
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
 
 
 class WordMorphemePairs:
@@ -68,7 +138,7 @@ class WordMorphemePairs:
                     char_str, morph_str, eojeols, morphs = wrapup(eojeols, morphs)
                     if char_str:
                         yield char_str, morph_str
-                    n_sents += 1
+                        n_sents += 1
                     continue
 
                 # cumulate eojeol & morphs to buffer
@@ -84,16 +154,220 @@ class WordMorphemePairs:
 
             if eojeols:
                 yield wrapup(eojeols, morphs)[:2]
+                n_sents += 1
         self.len = n_sents
 
     def __len__(self):
+        """
+        It counts sentences by scanning the file. Use IndexedWordMorphemePairs for constant-time len.
+        Like `__iter__`, blocks which have no valid pair (non-empty eojeol and morph column
+        of at least 3 characters) are not counted
+        """
         if self.len > 0:
             return self.len
+        n_sents = 0
+        has_pair = False
         with open(self.path, encoding='utf-8') as f:
-            for i, line in enumerate(f):
-                if self.num_sents > 0 and self.len > self.num_sents:
+            for line in f:
+                if self.num_sents > 0 and n_sents >= self.num_sents:
                     break
-                if line.strip():
-                    continue
-                self.len += 1
+                if not line.strip():
+                    if has_pair:
+                        n_sents += 1
+                    has_pair = False
+                elif not has_pair:
+                    columns = line.rstrip('\r\n').split(self.sep)
+                    has_pair = (len(columns) > self.col and bool(columns[0].strip())
+                                and len(columns[self.col].strip()) >= 3)
+        if has_pair and not (self.num_sents > 0 and n_sents >= self.num_sents):
+            n_sents += 1
+        self.len = n_sents
+        return self.len
+
+
+class IndexedWordMorphemePairs:
+    """
+    Random access reader of word-morpheme pairs file. The format is same with WordMorphemePairs.
+    Byte offsets of sentences are indexed once and cached in a sidecar file (`filepath + '.idx.npy'`),
+    and sentences are read through mmap. The sidecar is rebuilt when the size or
+    modification time of the corpus file changes.
+
+    Arguments
+    ---------
+    filepath : str
+    morph_column : int
+    sep : str
+    num_sents : int
+        If positive, only the first num_sents sentences are used
+    index_path : str or None
+        Sidecar index path. Default is `filepath + '.idx.npy'`
+    rebuild : Boolean
+        If True, index is rebuilt even if sidecar is valid
+
+    Usage
+    -----
+        >>> pairs = IndexedWordMorphemePairs('../data/train.txt')
+        >>> len(pairs)              # constant time
+        >>> word_text, morph_text = pairs[1234]
+        >>> for word_text, morph_text in pairs.shuffled(seed=0):
+        >>>     # do something
+
+        >>> ranges = pairs.shard_ranges(4)
+        $ [(0, 2512), (2512, 5020), (5020, 7531), (7531, 10000)]
+        >>> for word_text, morph_text in pairs.iter_range(*ranges[0]):
+        >>>     # do something in worker 0
+    """
+
+    def __init__(self, filepath, morph_column=1, sep='\t', num_sents=-1, index_path=None, rebuild=False):
+        self.path = filepath
+        self.col = morph_column
+        self.sep = sep
+        self.num_sents = num_sents
+        self.index_path = index_path if index_path is not None else filepath + '.idx.npy'
+        self._mm = None
+        self._file = None
+        self.offsets = self._load_index(rebuild)
+        self.len = len(self.offsets) if num_sents <= 0 else min(num_sents, len(self.offsets))
+
+    def _signature(self):
+        stat = os.stat(self.path)
+        return [stat.st_size, stat.st_mtime_ns, self.col, zlib.crc32(self.sep.encode('utf-8'))]
+
+    def _load_index(self, rebuild):
+        import numpy as np
+        signature = self._signature()
+        if (not rebuild) and os.path.exists(self.index_path):
+            try:
+                index = np.load(self.index_path, mmap_mode='r')
+                if index.ndim == 2 and index.shape[0] > 0 and list(index[0]) == signature:
+                    return index[1:]
+            except (OSError, ValueError):
+                pass
+        offsets = self._build_index()
+        index = np.zeros((len(offsets) + 1, 4), dtype=np.uint64)
+        index[0] = signature
+        if offsets:
+            index[1:, :2] = offsets
+        try:
+            # writes to temporal file and renames it, not to leave broken index
+            tmp_path = self.index_path + '.tmp.npy'
+            np.save(tmp_path, index)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # read-only directory. Index is used only in memory
+            pass
+        return index[1:]
+
+    def _build_index(self):
+        """It returns list of (begin, end) byte offsets of sentences which have at least one pair"""
+        sep = self.sep.encode('utf-8')
+        col = self.col
+        offsets = []
+        begin = -1
+        has_pair = False
+        position = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    if has_pair:
+                        offsets.append((begin, position))
+                    begin = -1
+                    has_pair = False
+                else:
+                    if begin < 0:
+                        begin = position
+                    if not has_pair:
+                        columns = line.rstrip(b'\r\n').split(sep)
+                        has_pair = (len(columns) > col and bool(columns[0].strip())
+                                    and len(columns[col].decode('utf-8').strip()) >= 3)
+                position += len(line)
+        if has_pair:
+            offsets.append((begin, position))
+        return offsets
+
+    def _buffer(self):
+        if self._mm is None:
+            self._file = open(self.path, 'rb')
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mm
+
+    def _parse(self, b, e):
+        eojeols = []
+        morphs = []
+        for line in self._buffer()[b:e].decode('utf-8').split('\n'):
+            columns = line.rstrip('\r').split(self.sep)
+            if len(columns) <= self.col:
+                continue
+            eojeol = columns[0]
+            morph = columns[self.col]
+            if eojeol.strip() and len(morph.strip()) >= 3:
+                eojeols.append(eojeol)
+                morphs.append(morph)
+        return '  '.join(eojeols), '  '.join(morphs)
+
+    def __len__(self):
         return self.len
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.len))]
+        if index < 0:
+            index += self.len
+        if not (0 <= index < self.len):
+            raise IndexError('index {} is out of range'.format(index))
+        b, e = self.offsets[index, :2]
+        return self._parse(int(b), int(e))
+
+    def __iter__(self):
+        return self.iter_range(0, self.len)
+
+    def iter_range(self, begin, end):
+        """Iterates sentences from begin to end (exclusive) in file order"""
+        for i in range(max(0, begin), min(end, self.len)):
+            yield self[i]
+
+    def shuffled(self, seed=None):
+        """Iterates all sentences in random order"""
+        order = list(range(self.len))
+        random.Random(seed).shuffle(order)
+        for i in order:
+            yield self[i]
+
+    def shard_ranges(self, num_shards):
+        """
+        It splits sentences into num_shards contiguous ranges which have similar number of bytes
+
+        Returns
+        -------
+        ranges : list of (int, int)
+            (begin, end) sentence indices of each shard
+        """
+        import numpy as np
+        if num_shards <= 0:
+            raise ValueError('num_shards must be positive integer')
+        if self.len == 0:
+            return [(0, 0)] * num_shards
+        sizes = np.asarray(self.offsets[:self.len, 1], dtype=np.float64) - np.asarray(self.offsets[:self.len, 0], dtype=np.float64)
+        cumulative = np.cumsum(sizes)
+        targets = cumulative[-1] * np.arange(1, num_shards) / num_shards
+        cuts = [0] + [int(c) for c in np.searchsorted(cumulative, targets, side='right')] + [self.len]
+        return [(cuts[i], cuts[i + 1]) for i in range(num_shards)]
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = None
+            self._file = None
+
+    def __getstate__(self):
+        # mmap is not picklable. Worker processes re-open the file
+        state = dict(self.__dict__)
+        state['_mm'] = None
+        state['_file'] = None
+        state['offsets'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.offsets = self._load_index(False)
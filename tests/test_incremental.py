@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from benchmarks.bench_tagging import prepare_model
+from benchmarks.corpus import SyntheticCorpus
+from lattice_tagger.dictionary import BaseMorphemeDictionary
+from lattice_tagger.tagger import IncrementalDocument
+from lattice_tagger.tagger import Tagger
+
+
+@pytest.fixture(scope='module')
+def model():
+    corpus = SyntheticCorpus(seed=0)
+    encoder, score_funcs = prepare_model(corpus, num_train_sents=300)
+    return BaseMorphemeDictionary(), encoder, score_funcs, corpus
+
+def _random_edit(rng, text, eojeols):
+    begin = rng.randint(0, len(text))
+    end = min(len(text), begin + rng.randint(0, 6))
+    replacement = rng.choice(['', ' ', '\t', ' ' + rng.choice(eojeols), rng.choice(eojeols)[:2]])
+    return begin, end, replacement
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'beam_margin': 0},
+    {'beam_margin': 3, 'budget': 40},
+    {'prune_threshold': 0},
+    {'prune_threshold': 2},
+])
+def test_edits_equal_tag(model, options):
+    dictionary, encoder, score_funcs, corpus = model
+    tagger = Tagger(dictionary, encoder=encoder, score_funcs=score_funcs,
+        prune_threshold=options.get('prune_threshold'))
+    if 'beam_margin' in options:
+        tagger.set_adaptive_beam(margin=options['beam_margin'], budget=options.get('budget'))
+
+    rng = random.Random(0)
+    sents = corpus.sentences(20, num_eojeols=6)
+    eojeols = [eojeol for sent in sents for eojeol in sent.split()]
+    beam_size = 10
+    for sent in sents[:10]:
+        doc = IncrementalDocument(tagger, sent, beam_size=beam_size)
+        for _ in range(8):
+            doc.edit(*_random_edit(rng, doc.text, eojeols))
+            sequence = doc.tag()
+            expected = tagger.tag(doc.text, beam_size=beam_size)
+            assert sequence.sequences == expected.sequences
+            assert sequence.score == pytest.approx(expected.score)
+
+def test_whitespace_other_than_space(model):
+    dictionary, encoder, score_funcs, _ = model
+    tagger = Tagger(dictionary, encoder=encoder, score_funcs=score_funcs)
+    text = '노래를\t했다 아이'
+    sequence = IncrementalDocument(tagger, text).tag()
+    expected = tagger.tag(text)
+    assert sequence.sequences[-1].e == len(text.replace(' ', ''))
+    assert sequence.sequences == expected.sequences
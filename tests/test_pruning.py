@@ -0,0 +1,75 @@
+import pytest
+
+from benchmarks.bench_tagging import prepare_model
+from benchmarks.corpus import SyntheticCorpus
+from lattice_tagger.beam import CoarseToFinePruner
+from lattice_tagger.beam import Lattice
+from lattice_tagger.dictionary import BaseMorphemeDictionary
+from lattice_tagger.dictionary import sentence_lookup_as_begin_index
+from lattice_tagger.tagger import Tagger
+
+
+@pytest.fixture(scope='module')
+def model():
+    corpus = SyntheticCorpus(seed=0)
+    encoder, score_funcs = prepare_model(corpus, num_train_sents=300)
+    sents = corpus.sentences(30, num_eojeols=6)
+    dictionary = BaseMorphemeDictionary()
+    return Tagger(dictionary, encoder=encoder, score_funcs=score_funcs), (dictionary, encoder, score_funcs), sents
+
+def _lattice(tagger, sent):
+    _, bindex = sentence_lookup_as_begin_index(sent, tagger.eojeol_lookup)
+    return Lattice(bindex, sent.replace(' ', ''), node_weights=tagger.node_weights)
+
+def _nodes(lattice):
+    nodes = set()
+    for e in range(1, len(lattice.known)):
+        nodes.update(word for _, words in lattice.known[e] for word in words)
+        nodes.update(word for _, word in lattice.unknown[e])
+    return nodes
+
+def _reachable_nodes(pruner, lattice):
+    # nodes on no complete path (e.g. an unknown word after an unknown word) have -inf max-marginal
+    _, known, unknown = pruner.max_marginals(lattice)
+    nodes = set()
+    for e in range(1, len(lattice.known)):
+        for (_, words), marginals in zip(lattice.known[e], known[e]):
+            nodes.update(word for word, m in zip(words, marginals) if m > float('-inf'))
+        nodes.update(word for (_, word), m in zip(lattice.unknown[e], unknown[e]) if m > float('-inf'))
+    return nodes
+
+def test_large_threshold_keeps_best_path(model):
+    tagger, (dictionary, encoder, score_funcs), sents = model
+    pruner = CoarseToFinePruner.from_score_functions(tagger.score_funcs, threshold=1e6)
+    for sent in sents:
+        lattice = _lattice(tagger, sent)
+        pruned = pruner.prune(lattice)
+        assert _nodes(pruned) == _reachable_nodes(pruner, lattice)
+        best = tagger.tag(sent, beam_size=10).sequences[1:-1]
+        assert set(best) <= _nodes(pruned)
+
+    pruning_tagger = Tagger(dictionary, encoder=encoder, score_funcs=score_funcs, prune_threshold=1e6)
+    for sent in sents:
+        assert pruning_tagger.tag(sent, beam_size=10).sequences == tagger.tag(sent, beam_size=10).sequences
+
+def test_small_threshold_removes_nodes(model):
+    tagger, _, sents = model
+    pruner = CoarseToFinePruner.from_score_functions(tagger.score_funcs, threshold=0)
+    for sent in sents:
+        lattice = _lattice(tagger, sent)
+        pruned = pruner.prune(lattice)
+        assert _nodes(pruned)
+        assert _nodes(pruned) <= _nodes(lattice)
+    assert 0 < pruner.stats['pruned_nodes'] < pruner.stats['nodes']
+
+def test_cache_is_bounded(model):
+    tagger, _, sents = model
+    bounded = CoarseToFinePruner.from_score_functions(tagger.score_funcs, threshold=1, cache_size=20)
+    unbounded = CoarseToFinePruner.from_score_functions(tagger.score_funcs, threshold=1, cache_size=0)
+    max_nodes = 0
+    for sent in sents:
+        lattice = _lattice(tagger, sent)
+        max_nodes = max(max_nodes, len(_nodes(lattice)))
+        assert _nodes(bounded.prune(lattice)) == _nodes(unbounded.prune(lattice))
+        assert len(bounded._unary_cache) < bounded.cache_size + max_nodes
+    assert len(unbounded._unary_cache) > bounded.cache_size + max_nodes
@@ -0,0 +1,35 @@
+import pickle
+import threading
+
+from lattice_tagger.tagger import SymbolTable
+
+
+def test_concurrent_intern():
+    symbols = SymbolTable()
+    words = ['word{}'.format(i) for i in range(2000)]
+    ids = [None] * 8
+    barrier = threading.Barrier(len(ids))
+
+    def intern_all(t):
+        barrier.wait()
+        ids[t] = [symbols.intern(word) for word in (words if t % 2 == 0 else reversed(words))]
+
+    threads = [threading.Thread(target=intern_all, args=(t,)) for t in range(len(ids))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(symbols) == len(SymbolTable()) + len(words)
+    for word in words:
+        assert symbols[symbols.intern(word)] == word
+    expected = [symbols.intern(word) for word in words]
+    for t, ids_t in enumerate(ids):
+        assert ids_t == (expected if t % 2 == 0 else expected[::-1])
+
+def test_pickle():
+    symbols = SymbolTable()
+    idx = symbols.intern('아이오아이')
+    loaded = pickle.loads(pickle.dumps(symbols))
+    assert loaded.intern('아이오아이') == idx
+    assert loaded.intern('노래') == idx + 1
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from lattice_tagger.dictionary import analyze_morphology
+from lattice_tagger.dictionary import BaseMorphemeDictionary
+from lattice_tagger.dictionary import DemoMorphemeDictionary
+from lattice_tagger.dictionary import EomiIndex
+from lattice_tagger.tagset import Noun
+
+
+class _Everything:
+    """Stem dictionary which has every string"""
+
+    def __contains__(self, stem):
+        return True
+
+
+@pytest.fixture(scope='module', params=[DemoMorphemeDictionary, BaseMorphemeDictionary])
+def dictionary(request):
+    return request.param()
+
+@pytest.fixture(scope='module')
+def words(dictionary):
+    """Conjugated words with and without rules, with noun prefixes and noises"""
+    rng = random.Random(0)
+    stems = sorted(dictionary.verbs | dictionary.adjectives)
+    stems = rng.sample(stems, min(500, len(stems)))
+    eomis = sorted(dictionary.eomis)
+    nouns = sorted(dictionary.tag_to_morphs.get(Noun, ())) or stems
+    words = {stem + eomi for stem in stems[:100] for eomi in rng.sample(eomis, min(20, len(eomis)))}
+    rules = sorted(dictionary.rules.items())
+    # every three syllables rule, because they are rare. Like get_lemma_candidates, eomi of
+    # three syllables conjugation 'abc' is eomi beginning + 'c' + the rest of word
+    rules = rng.sample(rules, min(300, len(rules))) + [rule for rule in rules if len(rule[0]) == 3]
+    for surface, canons in rules:
+        for stem_end, eomi_begin in canons:
+            eomi_begin += surface[2:]
+            stems_ = [stem for stem in stems if stem.endswith(stem_end)] or [stem_end]
+            eomis_ = [eomi for eomi in eomis if eomi.startswith(eomi_begin)] or [eomi_begin]
+            for _ in range(5):
+                stem, eomi = rng.choice(stems_), rng.choice(eomis_)
+                words.add(stem[:len(stem) - len(stem_end)] + surface + eomi[len(eomi_begin):])
+    words = sorted(words)
+    words += [rng.choice(nouns) + word for word in rng.sample(words, min(300, len(words)))]
+    chars = sorted(set(''.join(words)))
+    words += [''.join(rng.choice(chars) for _ in range(rng.randint(1, 6))) for _ in range(300)]
+    return words
+
+def test_analyze_equals_analyze_morphology(dictionary, words):
+    index = EomiIndex(dictionary.eomis, dictionary.rules)
+    verbs, adjectives = dictionary.verbs, dictionary.adjectives
+    num_analyzed = 0
+    for word in words:
+        expected = analyze_morphology(word, verbs, adjectives, dictionary.eomis, dictionary.rules)
+        assert index.analyze(word, verbs, adjectives) == expected, word
+        num_analyzed += bool(expected)
+    assert num_analyzed > 0
+
+def test_max_begin_is_consistent_with_every_suffix(dictionary, words):
+    index = EomiIndex(dictionary.eomis, dictionary.rules)
+    everything = _Everything()
+    for word in words:
+        begins = [i for i in range(len(word)) if analyze_morphology(
+            word[i:], everything, everything, dictionary.eomis, dictionary.rules)]
+        expected = max(begins) if begins else -1
+        assert index.max_begin(word) == expected, word
+        assert index(word) == (expected >= 0)